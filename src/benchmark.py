@@ -0,0 +1,314 @@
+"""
+Benchmarks of the ranking, DataFrame and rendering stages on synthetic medal tables
+
+The tables go from the size of the real one (about 90 NOCs) up to 10^5 countries, and the batched
+Majority Judgment engine is run on 10^4 tables at once. Before timing, the NumPy engine is checked
+against mjtracker when it is installed, and against a plain Python Majority Judgment otherwise.
+
+    python benchmark.py --save-baseline          # write the baseline of this machine
+    python benchmark.py                          # compare with it, exit 1 on a regression
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import GRADES
+from pipeline import create_mj_dataframe, create_rank_comparison
+from plot_merit_profil import plot_merit_profiles_in_number
+from ranking_functions import (
+    apply_majority_judgment, majority_judgment_ranks, rank_by_total_medals, rank_lexicographically
+)
+from table_function import create_ranking_comparison_table
+
+PATH = os.path.dirname(os.path.abspath(__file__)) + '/../data'
+BASELINE_PATH = f'{PATH}/benchmark_baseline.json'
+SIZES = [90, 1000, 10_000, 100_000]
+
+
+def synthetic_medal_table(nb_countries: int, seed: int = 0) -> DataFrame:
+    """
+    Medal table shaped like the scraped one: a few countries win most medals, many win one or two
+
+    Parameters
+    ----------
+    nb_countries : int
+       Number of countries
+    seed : int
+       Seed of the random generator
+    Returns
+    -------
+       DataFrame with Country, Gold, Silver, Bronze and Total, sorted by total amount of medals
+    """
+    rng = np.random.default_rng(seed)
+    total = np.maximum(1, rng.lognormal(mean=1.2, sigma=1.2, size=nb_countries).astype(np.int64))
+    medals = rng.multinomial(total, [0.32, 0.33, 0.35])
+    df = pd.DataFrame({
+        "Country": [f"C{i:06d}" for i in range(nb_countries)],
+        "Gold": medals[:, 0],
+        "Silver": medals[:, 1],
+        "Bronze": medals[:, 2],
+        "Total": total,
+    })
+    return df.sort_values(by="Total", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def synthetic_batch(nb_tables: int, nb_countries: int = 90, seed: int = 0) -> np.ndarray:
+    """Merit profiles of nb_tables medal tables, of shape (nb_tables, nb_countries, 4), chocolate last"""
+    rng = np.random.default_rng(seed)
+    medals = rng.integers(0, 40, size=(nb_tables, nb_countries, 3))
+    total = medals.sum(axis=-1)
+    return np.concatenate([medals, (total.max(axis=-1, keepdims=True) - total)[..., None]], axis=-1)
+
+
+def _median_values(profile) -> list:
+    """Successive majority values of a profile (best grade first), removing the median ballot each time"""
+    nb_grades = len(profile)
+    ballots = sorted(nb_grades - 1 - grade for grade, count in enumerate(profile) for _ in range(count))
+    values = []
+    while ballots:
+        values.append(ballots.pop((len(ballots) - 1) // 2))
+    return values
+
+
+def reference_majority_judgment(counts) -> tuple:
+    """
+    Majority Judgment by the definition, slow but independent of the NumPy engine
+
+    Returns
+    -------
+       (majority grade, 0 the best one; rank, starting at 0 and shared by identical profiles)
+    """
+    values = [_median_values(profile) for profile in counts]
+    order = sorted(range(len(values)), key=lambda i: values[i], reverse=True)
+    rank = [0] * len(values)
+    for position, i in enumerate(order):
+        previous = order[position - 1]
+        rank[i] = rank[previous] if position and values[previous] == values[i] else position
+    majority_grade = [len(counts[i]) - 1 - values[i][0] if values[i] else 0 for i in range(len(values))]
+    return majority_grade, rank
+
+
+def check_correctness(sizes=(90, 1000), nb_tables: int = 200) -> list:
+    """
+    Compare the NumPy engine with mjtracker, or with reference_majority_judgment without it
+
+    Returns
+    -------
+       One message per mismatch, empty when everything agrees
+    """
+    try:
+        import mjtracker  # noqa: F401
+        reference = "mjtracker"
+    except ImportError:
+        reference = "reference"
+
+    errors = []
+    for size in sizes:
+        df = synthetic_medal_table(size, seed=size)
+        df_mj = create_mj_dataframe(df, "2024-08-11 00:00")
+        ranked = apply_majority_judgment(df_mj)
+        if reference == "mjtracker":
+            expected = apply_majority_judgment(df_mj, use_mjtracker=True).set_index("candidat").loc[ranked["candidat"]]
+            expected_rank = expected["rang"].to_numpy()
+            expected_grade = expected["mention_majoritaire"].to_numpy()
+        else:
+            counts = df_mj[[f"intention_mention_{i}" for i in range(1, len(GRADES) + 1)]].to_numpy(dtype=int)
+            grade, expected_rank = reference_majority_judgment(counts.tolist())
+            expected_grade = np.asarray(GRADES, dtype=object)[grade]
+        if not np.array_equal(ranked["rang"].to_numpy(), np.asarray(expected_rank)):
+            errors.append(f"apply_majority_judgment[{size}]: ranks differ from {reference}")
+        if not np.array_equal(ranked["mention_majoritaire"].to_numpy(), np.asarray(expected_grade)):
+            errors.append(f"apply_majority_judgment[{size}]: majority grades differ from {reference}")
+
+        lexico = rank_lexicographically(df.copy())
+        medals = list(lexico[["Gold", "Silver", "Bronze"]].itertuples(index=False, name=None))
+        if medals != sorted(medals, reverse=True):
+            errors.append(f"rank_lexicographically[{size}]: medals are not in decreasing order")
+        total = rank_by_total_medals(df.copy())
+        expected_total = (total["Total"].to_numpy()[None, :] > total["Total"].to_numpy()[:, None]).sum(axis=1) + 1
+        if not np.array_equal(total["Rank_Total"].to_numpy(), expected_total):
+            errors.append(f"rank_by_total_medals[{size}]: ranks differ from the count of better totals")
+
+    # a batch must rank each of its tables as if it were alone
+    counts = synthetic_batch(nb_tables, seed=1)
+    majority_grade, rank, _ = majority_judgment_ranks(counts)
+    for t in range(0, nb_tables, max(1, nb_tables // 20)):
+        grade, expected_rank = reference_majority_judgment(counts[t].tolist())
+        if list(rank[t]) != expected_rank or list(majority_grade[t]) != grade:
+            errors.append(f"majority_judgment_ranks[batch]: table {t} differs from the reference")
+    return errors
+
+
+def measure(run, repeat: int = 5, min_seconds: float = 0.2) -> dict:
+    """
+    Time a benchmark: one warm-up call, then at least repeat calls and min_seconds of calls
+
+    Returns
+    -------
+       Number of calls, then the min, median and mean duration of a call, in seconds
+    """
+    run()
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < repeat or time.perf_counter() - started < min_seconds:
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    return {
+        "calls": len(durations),
+        "min_seconds": min(durations),
+        "median_seconds": statistics.median(durations),
+        "mean_seconds": statistics.fmean(durations),
+    }
+
+
+def build_cases(sizes=SIZES, batch_tables: int = 10_000, batch_countries: int = 90,
+                max_render_size: int = 10_000) -> dict:
+    """
+    Benchmarks by name, each one a function without argument
+
+    Parameters
+    ----------
+    sizes : list
+       Numbers of countries of the synthetic medal tables
+    batch_tables : int
+       Number of tables of the batched Majority Judgment benchmark, 0 to skip it
+    batch_countries : int
+       Number of countries of each table of the batch
+    max_render_size : int
+       Largest table given to the plot and the comparison table, nobody reads a larger figure
+    """
+    cases = {}
+    for size in sizes:
+        df = synthetic_medal_table(size, seed=size)
+        df_mj = create_mj_dataframe(df, "2024-08-11 00:00")
+        df_mj_ranked = apply_majority_judgment(df_mj)
+
+        cases[f"rank_by_total_medals[{size}]"] = lambda df=df: rank_by_total_medals(df.copy())
+        cases[f"rank_lexicographically[{size}]"] = lambda df=df: rank_lexicographically(df.copy())
+        cases[f"create_mj_dataframe[{size}]"] = lambda df=df: create_mj_dataframe(df, "2024-08-11 00:00")
+        cases[f"apply_majority_judgment[{size}]"] = lambda df_mj=df_mj: apply_majority_judgment(df_mj)
+        if size > max_render_size:
+            continue
+        rank_comparison = create_rank_comparison(df, df_mj_ranked)
+        cases[f"create_ranking_comparison_table[{size}]"] = (
+            lambda rank_comparison=rank_comparison: create_ranking_comparison_table(rank_comparison)
+        )
+        cases[f"plot_merit_profiles_in_number[{size}]"] = lambda df_mj_ranked=df_mj_ranked: (
+            plot_merit_profiles_in_number(df=df_mj_ranked, grades=list(GRADES), auto_text=True,
+                                          source="Synthetic", date="2024-08-11 00:00", show_no_opinion=False)
+        )
+
+    if batch_tables:
+        counts = synthetic_batch(batch_tables, batch_countries)
+        cases[f"majority_judgment_ranks[{batch_tables}x{batch_countries}]"] = lambda: majority_judgment_ranks(counts)
+    return cases
+
+
+def run_benchmarks(cases: dict, repeat: int = 5, min_seconds: float = 0.2, verbose: bool = True) -> dict:
+    """Measure every case, returns the results with the versions and the machine they were measured on"""
+    results = {}
+    for name, run in cases.items():
+        results[name] = measure(run, repeat, min_seconds)
+        if verbose:
+            print(f"{name:<55} {1000 * results[name]['median_seconds']:>11.3f} ms  ({results[name]['calls']} calls)")
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.25) -> list:
+    """
+    Benchmarks whose fastest call is more than tolerance slower than the baseline
+
+    The fastest call is compared rather than the median, it is the least sensitive to the other
+    processes of the machine.
+
+    Returns
+    -------
+       (name, baseline duration, duration, ratio) of every regression, the benchmarks missing from
+       either side are ignored
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        ratio = result["min_seconds"] / reference["min_seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, reference["min_seconds"], result["min_seconds"], ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ranking, DataFrame and rendering stages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="numbers of countries")
+    parser.add_argument("--batch-tables", type=int, default=10_000, help="0 to skip the batch benchmark")
+    parser.add_argument("--batch-countries", type=int, default=90)
+    parser.add_argument("--max-render-size", type=int, default=10_000,
+                        help="largest table given to the plot and the comparison table")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="minimum time spent on each benchmark")
+    parser.add_argument("--filter", default=None, help="only run the benchmarks whose name contains this")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown flagged as a regression")
+    parser.add_argument("--skip-check", action="store_true", help="do not check the results before timing")
+    args = parser.parse_args(argv)
+
+    if not args.skip_check:
+        errors = check_correctness()
+        if errors:
+            print("\n".join(errors), file=sys.stderr)
+            return 1
+        print("Majority Judgment results checked")
+
+    cases = build_cases(args.sizes, args.batch_tables, args.batch_countries, args.max_render_size)
+    if args.filter:
+        cases = {name: run for name, run in cases.items() if args.filter in name}
+    report = run_benchmarks(cases, args.repeat, args.min_seconds)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine", {}).get("platform") != report["machine"]["platform"]:
+        print("The baseline was measured on another platform, the comparison is only indicative")
+    regressions = compare(report, baseline, args.tolerance)
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: {1000 * before:.3f} ms -> {1000 * after:.3f} ms (x{ratio:.2f})")
+    if not regressions:
+        print(f"No regression above {100 * args.tolerance:.0f} % against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+# Constants
+GOLD_MEDAL = "\U0001F947"
+SILVER_MEDAL = "\U0001F948"
+BRONZE_MEDAL = "\U0001F949"
+CHOCOLATE = "\U0001F36B"
+MIN_MEDALS = 20
+
+# grades of the merit profiles, from the best one to the worst one
+GRADES = [f"Gold {GOLD_MEDAL}", f"Silver {SILVER_MEDAL}", f"Bronze {BRONZE_MEDAL}", f"No Medal {CHOCOLATE}"]
+
+STORE_NAME = 'snapshots.sqlite'
+
+URL = "https://olympics.com/OG2024/data/CIS_MedalNOCs~lang=ENG~comp=OG2024.json"
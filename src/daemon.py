@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import random
+
+import tracing
+from export_engine import ExportEngine
+from main import export_figures
+from pipeline import MedalSnapshot, MIN_MEDALS, rank_snapshot, suffix_to_fin_enquete, verify_medal_sum
+from scraper import (
+    URL, CACHE_PATH, PATH, fetch_medal_table, medal_table_hash, get_time_suffix, save_medal_data
+)
+
+
+class MedalDaemon:
+    """
+    Poll the medal source and re-rank only when the medal table changes
+
+    The last ranked result is kept in memory and stays available while the source is down.
+
+    Parameters
+    ----------
+    interval : float
+       Seconds between two polls
+    jitter : float
+       Relative random spread applied to every delay, 0.1 means +/- 10 %
+    max_backoff : float
+       Upper bound, in seconds, of the delay after consecutive failures
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    url : str
+       URL of the CIS_MedalNOCs endpoint
+    cache_dir : str
+       Directory of the HTTP cache
+    data_dir : str
+       Directory where the CSV files are written, None to write nothing
+    on_change : callable
+       Called with the new RankedResult after each change, exports the figures by default
+    metrics_path : str
+       Prometheus textfile rewritten after every poll with the stage metrics, None to trace nothing
+    """
+
+    def __init__(
+        self,
+        interval: float = 300.0,
+        jitter: float = 0.1,
+        max_backoff: float = 3600.0,
+        min_medals: int = MIN_MEDALS,
+        url: str = URL,
+        cache_dir: str = CACHE_PATH,
+        data_dir: str = PATH,
+        on_change=None,
+        metrics_path: str = None,
+    ):
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.min_medals = min_medals
+        self.url = url
+        self.cache_dir = cache_dir
+        self.data_dir = data_dir
+        self.on_change = on_change if on_change is not None else self._export
+        self.metrics_path = metrics_path
+        if metrics_path is not None:
+            tracing.enable()
+        self.engine = None
+        self.state = None
+        self.content_hash = None
+        self.failures = 0
+        self.last_error = None
+        self._stop = asyncio.Event()
+
+    def _export(self, result):
+        # one warm renderer for the whole life of the daemon
+        if self.engine is None:
+            self.engine = ExportEngine()
+        export_figures(result, engine=self.engine)
+
+    def _fetch(self):
+        df = fetch_medal_table(self.url, self.cache_dir)
+        return df, get_time_suffix()
+
+    async def poll_once(self) -> bool:
+        """Fetch the medal table once, returns True when the ranking was updated"""
+        try:
+            df, suffix = await asyncio.to_thread(self._fetch)
+            if not verify_medal_sum(df):
+                raise ValueError("Warning: Medal sum verification failed")
+        except Exception as err:
+            self.failures += 1
+            self.last_error = err
+            print(f"Poll failed ({self.failures} in a row), keeping the last ranking: {err}")
+            return False
+
+        self.failures = 0
+        self.last_error = None
+        content_hash = medal_table_hash(df)
+        if content_hash == self.content_hash:
+            return False
+
+        snapshot = MedalSnapshot(df=df, fin_enquete=suffix_to_fin_enquete(suffix))
+        result = await asyncio.to_thread(rank_snapshot, snapshot, self.min_medals)
+        if self.data_dir is not None:
+            await asyncio.to_thread(save_medal_data, df, suffix, self.data_dir)
+        await asyncio.to_thread(self.on_change, result)
+
+        # only remember the table once everything went through, so that a failed export is retried
+        self.state = result
+        self.content_hash = content_hash
+        print(f"Ranking updated at {snapshot.fin_enquete}")
+        return True
+
+    def next_delay(self) -> float:
+        # the exponent is clamped, a float interval times 2 ** 1024 would overflow
+        delay = min(self.max_backoff, self.interval * 2 ** min(self.failures, 32))
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def run(self):
+        self._stop.clear()
+        try:
+            while not self._stop.is_set():
+                try:
+                    await self.poll_once()
+                except Exception as err:
+                    # ranking or export failed: keep serving the previous state and retry later
+                    self.failures += 1
+                    self.last_error = err
+                    print(f"Update failed, keeping the last ranking: {err}")
+                if self.metrics_path is not None:
+                    tracing.write_prometheus(self.metrics_path)
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.next_delay())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # also on Ctrl+C, which cancels the task, so that the Kaleido server does not outlive the daemon
+            if self.engine is not None:
+                self.engine.stop()
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll the Olympic medal table and re-rank on changes")
+    parser.add_argument("--interval", type=float, default=300.0, help="seconds between two polls")
+    parser.add_argument("--jitter", type=float, default=0.1, help="relative random spread of the delay")
+    parser.add_argument("--max-backoff", type=float, default=3600.0, help="maximum delay after failures")
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--metrics", default=None, help="Prometheus textfile of the stage metrics")
+    args = parser.parse_args()
+
+    daemon = MedalDaemon(
+        interval=args.interval,
+        jitter=args.jitter,
+        max_backoff=args.max_backoff,
+        min_medals=args.min_medals,
+        url=args.url,
+        metrics_path=args.metrics,
+    )
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if daemon.engine is not None:
+            daemon.engine.stop()
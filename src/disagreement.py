@@ -0,0 +1,230 @@
+import argparse
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import MIN_MEDALS
+from threshold_sweep import METHODS, ThresholdSweep, sweep_thresholds
+
+METHOD_PAIRS = list(combinations(METHODS, 2))
+METRIC_COLUMNS = [
+    "min_medals", "methods", "countries", "kendall_tau", "discordant_pairs", "spearman", "footrule",
+    "footrule_norm",
+]
+SWAP_COLUMNS = ["methods", "winner", "loser", "snapshots", "first_seen", "last_seen"]
+# upper bound on the number of (threshold, country, country) cells compared at once
+_MAX_CELLS = 1 << 24
+
+
+def dominance(ranks) -> np.ndarray:
+    """
+    Pairwise-dominance matrices of rank vectors
+
+    Parameters
+    ----------
+    ranks : array-like of int
+       Ranks starting at 1, 0 for the countries left out, of shape (..., n_countries)
+    Returns
+    -------
+       Boolean array of shape (..., n_countries, n_countries), True where both countries are ranked and
+       the country of the row has a better rank than the one of the column
+    """
+    ranks = np.asarray(ranks)
+    ranked = ranks > 0
+    beats = ranks[..., :, np.newaxis] < ranks[..., np.newaxis, :]
+    return beats & ranked[..., :, np.newaxis] & ranked[..., np.newaxis, :]
+
+
+def _average_ranks(wins: np.ndarray, ranked: np.ndarray) -> np.ndarray:
+    # ranks starting at 1, countries tied sharing the average of their positions
+    losses = wins.sum(axis=-2)
+    ties = ranked.sum(axis=-1, keepdims=True) - wins.sum(axis=-1) - losses
+    return np.where(ranked, 1 + losses + (ties - 1) / 2, 0.0)
+
+
+def _pair_metrics(wins_a: np.ndarray, wins_b: np.ndarray, ranked: np.ndarray) -> dict:
+    """Agreement of two methods, for every threshold, from their dominance matrices"""
+    # sign[t, i, j] is 1 when i beats j, -1 when j beats i and 0 for ties and countries left out
+    sign_a = wins_a.astype(np.int8) - np.swapaxes(wins_a, -1, -2)
+    sign_b = wins_b.astype(np.int8) - np.swapaxes(wins_b, -1, -2)
+    product = (sign_a * sign_b).sum(axis=(-1, -2), dtype=np.int64)
+    untied_a = np.abs(sign_a).sum(axis=(-1, -2), dtype=np.int64)
+    untied_b = np.abs(sign_b).sum(axis=(-1, -2), dtype=np.int64)
+    discordant = (wins_a & np.swapaxes(wins_b, -1, -2)).sum(axis=(-1, -2))
+
+    nb_countries = ranked.sum(axis=-1)
+    rank_a = _average_ranks(wins_a, ranked)
+    rank_b = _average_ranks(wins_b, ranked)
+    mean = (nb_countries + 1) / 2
+    centered_a = np.where(ranked, rank_a - mean[:, np.newaxis], 0)
+    centered_b = np.where(ranked, rank_b - mean[:, np.newaxis], 0)
+    footrule = np.abs(rank_a - rank_b).sum(axis=-1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "countries": nb_countries,
+            "kendall_tau": product / np.sqrt(untied_a * untied_b),
+            "discordant_pairs": discordant,
+            "spearman": (centered_a * centered_b).sum(axis=-1)
+            / np.sqrt((centered_a ** 2).sum(axis=-1) * (centered_b ** 2).sum(axis=-1)),
+            "footrule": footrule,
+            # the greatest footrule distance between two rankings of n countries is floor(n^2 / 2)
+            "footrule_norm": footrule / (nb_countries ** 2 // 2),
+        }
+
+
+def sweep_disagreement(sweep: ThresholdSweep) -> DataFrame:
+    """
+    Kendall tau-b, Spearman and footrule agreement of every pair of methods, for every threshold
+
+    Parameters
+    ----------
+    sweep : ThresholdSweep
+       Ranks of a medal table for every minimum number of medals, see sweep_thresholds
+    Returns
+    -------
+       One row per threshold and pair of methods (e.g. "mj/lexico"), with the number of ranked countries,
+       kendall_tau, the number of discordant (swapped) pairs, spearman (on average ranks), the footrule
+       distance and the footrule distance divided by its maximum. The correlations are NaN below two
+       countries or when a method ties every country.
+    """
+    nb_thresholds, nb_countries = sweep.ranks["mj"].shape
+    chunk = max(1, _MAX_CELLS // max(1, nb_countries * nb_countries))
+    rows = {methods: [] for methods in METHOD_PAIRS}
+    for start in range(0, nb_thresholds, chunk):
+        stop = start + chunk
+        ranked = sweep.ranks["mj"][start:stop] > 0
+        wins = {method: dominance(ranks[start:stop]) for method, ranks in sweep.ranks.items()}
+        for methods in METHOD_PAIRS:
+            rows[methods].append(_pair_metrics(wins[methods[0]], wins[methods[1]], ranked))
+
+    metrics = pd.concat(
+        [
+            pd.DataFrame({
+                key: np.concatenate([chunk_metrics[key] for chunk_metrics in chunks])
+                for key in chunks[0]
+            }).assign(min_medals=sweep.thresholds, methods="/".join(methods))
+            for methods, chunks in rows.items()
+        ],
+        ignore_index=True,
+    ) if nb_thresholds else pd.DataFrame(columns=METRIC_COLUMNS)
+    return metrics[METRIC_COLUMNS].sort_values(["min_medals", "methods"], kind="stable", ignore_index=True)
+
+
+def _threshold_index(sweep: ThresholdSweep, min_medals: int) -> int:
+    if min_medals not in sweep.thresholds:
+        raise KeyError(f"No sweep result for min_medals={min_medals}")
+    return min_medals - int(sweep.thresholds[0])
+
+
+def dominance_matrix(sweep: ThresholdSweep, min_medals: int = MIN_MEDALS, method: str = "mj") -> DataFrame:
+    """Which ranked country beats which under one method and one threshold, rows beating columns"""
+    ranks = sweep.ranks[method][_threshold_index(sweep, min_medals)]
+    ranked = ranks > 0
+    return pd.DataFrame(dominance(ranks[ranked]), index=sweep.countries[ranked], columns=sweep.countries[ranked])
+
+
+def swapped_pairs(sweep: ThresholdSweep, min_medals: int = MIN_MEDALS, methods: tuple = ("mj", "lexico")) -> list:
+    """(winner, loser) of every pair of countries ordered one way by methods[0] and the other way by methods[1]"""
+    t = _threshold_index(sweep, min_medals)
+    wins_a = dominance(sweep.ranks[methods[0]][t])
+    wins_b = dominance(sweep.ranks[methods[1]][t])
+    winners, losers = np.nonzero(wins_a & wins_b.T)
+    return list(zip(sweep.countries[winners], sweep.countries[losers]))
+
+
+def disagreement_timeline(snapshots: list, min_medals: int = MIN_MEDALS, top: int = 20) -> tuple:
+    """
+    Disagreement of the three methods through every snapshot and threshold, and the pairs that swap most
+
+    Parameters
+    ----------
+    snapshots : list
+       (timestamp, medal table) of every snapshot, see timeline_render.load_snapshots
+    min_medals : int
+       Threshold of the swapped pairs
+    top : int
+       Number of swapped pairs kept per pair of methods, None for all of them
+    Returns
+    -------
+    metrics : DataFrame
+       The rows of sweep_disagreement of every snapshot, with their timestamp
+    swaps : DataFrame
+       Pairs of countries ranked in opposite orders by two methods with min_medals, the number of
+       snapshots where they were, and the first and last of them; the winner is the country ahead
+       with the first method
+    """
+    metrics, swaps = [], {}
+    for timestamp, df in snapshots:
+        sweep = sweep_thresholds(df)
+        metrics.append(sweep_disagreement(sweep).assign(timestamp=timestamp))
+        if min_medals not in sweep.thresholds:
+            continue
+        for methods in METHOD_PAIRS:
+            for winner, loser in swapped_pairs(sweep, min_medals, methods):
+                key = ("/".join(methods), winner, loser)
+                count, first_seen, _ = swaps.get(key, (0, timestamp, None))
+                swaps[key] = (count + 1, first_seen, timestamp)
+
+    metrics = pd.concat(metrics, ignore_index=True) if metrics else pd.DataFrame(columns=METRIC_COLUMNS)
+    metrics = metrics[["timestamp"] + METRIC_COLUMNS]
+    swaps = pd.DataFrame(
+        [key + value for key, value in swaps.items()], columns=SWAP_COLUMNS,
+    ).sort_values(["methods", "snapshots", "last_seen"], ascending=[True, False, False], kind="stable")
+    if top is not None:
+        swaps = swaps.groupby("methods", sort=False).head(top)
+    return metrics, swaps.reset_index(drop=True)
+
+
+def disagreement_figure(metrics: DataFrame, min_medals: int = MIN_MEDALS):
+    """Kendall tau of every pair of methods through the snapshots, with the number of swapped pairs on hover"""
+    import plotly.express as px
+
+    df = metrics[metrics["min_medals"] == min_medals]
+    fig = px.line(
+        df,
+        x="timestamp",
+        y="kendall_tau",
+        color="methods",
+        markers=True,
+        hover_data=["countries", "discordant_pairs", "spearman", "footrule"],
+    )
+    fig.update_layout(
+        title=f"<b>Agreement between the rankings</b><br><i>Kendall tau, countries with at least {min_medals} medals</i>",
+        title_x=0.5,
+        font_family="arial",
+        xaxis_title="",
+        yaxis_title="Kendall tau",
+        legend_title_text=None,
+        legend=dict(orientation="h", xanchor="center", x=0.5, y=-0.15),
+        paper_bgcolor="rgba(0,0,0,0)",
+        width=1000,
+        height=500,
+    )
+    return fig
+
+
+if __name__ == "__main__":
+    from replay import PATH
+    from timeline_render import load_snapshots
+
+    parser = argparse.ArgumentParser(description="Disagreement of the MJ, lexicographic and total rankings over time")
+    parser.add_argument("--data-dir", default=PATH)
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--top", type=int, default=10, help="swapped pairs printed per pair of methods")
+    parser.add_argument("--csv", default=None, help="write the metrics of every snapshot and threshold to this file")
+    parser.add_argument("--output", default=None, help="write the timeline figure to this .html file")
+    args = parser.parse_args()
+
+    timeline, swapped = disagreement_timeline(load_snapshots(args.data_dir), args.min_medals, args.top)
+    if args.csv:
+        timeline.to_csv(args.csv, index=False)
+    if args.output:
+        disagreement_figure(timeline, args.min_medals).write_html(args.output)
+
+    last = timeline[timeline["min_medals"] == args.min_medals].groupby("methods").tail(1)
+    print(last.to_string(index=False))
+    print()
+    print(swapped.to_string(index=False))
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+
+import plotly.express as px
+import plotly.io as pio
+
+OUTPATH = os.path.dirname(os.path.abspath(__file__)) + '/../figures'
+MANIFEST_NAME = ".export_manifest.json"
+# seconds given to the warm-up render, Kaleido waits forever when its Chrome process is gone
+WARMUP_TIMEOUT = 60.0
+
+
+class ExportEngine:
+    """
+    Headless batch export of plotly figures, with one warm Kaleido renderer
+
+    Every output is written only when the hash of its figure spec and format changed since the
+    last export (or when the file is missing). The engine never opens a browser.
+
+    Parameters
+    ----------
+    n : int
+       Number of Kaleido tabs rendering concurrently
+    manifest_path : str
+       JSON file keeping the spec hash of every written output, None to always write every output
+    """
+
+    def __init__(self, n: int = 4, manifest_path: str = f"{OUTPATH}/{MANIFEST_NAME}"):
+        self.n = n
+        self.manifest_path = manifest_path
+        self.manifest = self._load_manifest()
+        self._started = False
+
+    def _load_manifest(self) -> dict:
+        if self.manifest_path is None:
+            return {}
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        if self.manifest_path is None:
+            return
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        with open(self.manifest_path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def start(self, timeout: float = WARMUP_TIMEOUT):
+        """
+        Start the persistent renderer, and render the warm-up figure once
+
+        Raises a RuntimeError when Chrome cannot be found, or when the warm-up render fails or
+        does not finish within timeout seconds, after stopping the renderer.
+        """
+        if self._started:
+            return
+        import kaleido
+
+        _check_chrome()
+        if hasattr(kaleido, "start_sync_server"):
+            kaleido.start_sync_server(n=self.n, silence_warnings=True)
+
+        # fake plot to hack an artefact that disappear when done before the main one.
+        warm_up = {}
+
+        def render():
+            try:
+                pio.to_image(px.scatter(x=[0, 1, 2, 3, 4], y=[0, 1, 4, 9, 16]), format="pdf")
+            except BaseException as err:
+                warm_up["error"] = err
+
+        thread = threading.Thread(target=render, name="kaleido-warm-up", daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive() or "error" in warm_up:
+            _stop_server()
+            reason = f"did not answer within {timeout:.0f} s" if thread.is_alive() else repr(warm_up["error"])
+            raise RuntimeError(f"The Kaleido renderer could not start: {reason}") from warm_up.get("error")
+        self._started = True
+
+    def stop(self):
+        if not self._started:
+            return
+        _stop_server()
+        self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @staticmethod
+    def spec_hash(fig, fmt: str) -> str:
+        return hashlib.sha256(f"{fmt}\n{fig.to_json()}".encode()).hexdigest()
+
+    def export(self, figures: dict, formats=("pdf", "png")) -> list:
+        """
+        Render every figure in every format, concurrently
+
+        Parameters
+        ----------
+        figures : dict
+           Output path without extension -> figure
+        formats : tuple
+           Image formats to write for every figure
+        Returns
+        -------
+           Paths of the files actually written, unchanged outputs are skipped
+        """
+        self.start()
+
+        jobs = []
+        for basename, fig in figures.items():
+            for fmt in formats:
+                path = f"{basename}.{fmt}"
+                spec_hash = self.spec_hash(fig, fmt)
+                if self.manifest.get(path) == spec_hash and os.path.exists(path):
+                    continue
+                jobs.append((path, fmt, fig, spec_hash))
+
+        if not jobs:
+            return []
+
+        import kaleido
+
+        if hasattr(kaleido, "write_fig_from_object_sync"):
+            kaleido.write_fig_from_object_sync(
+                [{"fig": fig, "path": path, "opts": {"format": fmt}} for path, fmt, fig, _ in jobs],
+                cancel_on_error=True,
+            )
+        else:
+            # Kaleido < 1 keeps its own renderer alive in-process but renders one image at a time
+            for path, fmt, fig, _ in jobs:
+                fig.write_image(path, format=fmt)
+
+        for path, _, _, spec_hash in jobs:
+            self.manifest[path] = spec_hash
+        self._save_manifest()
+        return [path for path, _, _, _ in jobs]
+
+
+def _check_chrome():
+    # Kaleido 1 renders with Chrome, without it its server thread dies and every render waits forever
+    try:
+        from choreographer.browsers.chromium import Chromium
+    except ImportError:
+        return
+    if Chromium.find_browser(skip_local=False) is None:
+        raise RuntimeError("Kaleido needs Chrome to export the figures, install it with kaleido_get_chrome")
+
+
+def _stop_server(timeout: float = 10.0):
+    import kaleido
+
+    if not hasattr(kaleido, "stop_sync_server"):
+        return
+    # stopping joins the server thread, which may be stuck on a dead Chrome
+    thread = threading.Thread(target=kaleido.stop_sync_server, kwargs={"silence_warnings": True}, daemon=True)
+    thread.start()
+    thread.join(timeout)
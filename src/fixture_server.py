@@ -0,0 +1,103 @@
+"""
+Local HTTP server of recorded CIS_MedalNOCs payloads, to run the scraper and sources.py end to end
+
+directory/<code>.json is served for every path ending with comp=<code>.json, e.g.
+/OG2024/data/CIS_MedalNOCs~lang=ENG~comp=OG2024.json, with an ETag, gzip when it is accepted, and
+optionally some latency and failures to exercise the retries.
+
+    python fixture_server.py fixtures --port 8001
+    python sources.py OG2024 PG2024 --base-url http://127.0.0.1:8001
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_COMPETITION = re.compile(r"comp=([A-Za-z0-9_-]+)\.json$")
+
+
+def make_handler(directory: str, delay: float = 0.0, fail_first: int = 0):
+    """
+    Handler serving the payloads of a directory
+
+    Parameters
+    ----------
+    directory : str
+       Directory of the <code>.json payloads
+    delay : float
+       Seconds waited before every answer
+    fail_first : int
+       Number of 503 answers sent for each payload before serving it
+    """
+    failures = {}
+    lock = threading.Lock()
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            match = _COMPETITION.search(self.path.split("?")[0])
+            path = os.path.join(directory, f"{match[1]}.json") if match else None
+            if path is None or not os.path.isfile(path):
+                return self._send(404, b"")
+            time.sleep(delay)
+            with lock:
+                failures[path] = failures.get(path, 0) + 1
+                failing = failures[path] <= fail_first
+            if failing:
+                return self._send(503, b"", {"Retry-After": "0"})
+
+            with open(path, "rb") as f:
+                body = f.read()
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", {"ETag": etag})
+            headers = {"ETag": etag, "Content-Type": "application/json"}
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
+            self._send(200, body, headers)
+
+        def _send(self, status: int, body: bytes, headers: dict = None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def serve_fixtures(directory: str, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0,
+                   fail_first: int = 0) -> ThreadingHTTPServer:
+    """Start the fixture server in a background thread, its base URL is http://host:server.server_port"""
+    server = ThreadingHTTPServer((host, port), make_handler(directory, delay, fail_first))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded CIS_MedalNOCs payloads")
+    parser.add_argument("directory", help="directory of the <code>.json payloads, see sources.py --record")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds waited before every answer")
+    parser.add_argument("--fail-first", type=int, default=0, help="503 answers sent before each payload")
+    args = parser.parse_args()
+
+    fixture_server = serve_fixtures(args.directory, args.host, args.port, args.delay, args.fail_first)
+    print(f"Serving {args.directory} on http://{args.host}:{fixture_server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fixture_server.shutdown()
@@ -1,54 +1,56 @@
+# IOC code of every National Olympic (and Paralympic) Committee -> ISO 3166-1 alpha-2 code of its flag
+IOC_TO_ISO = {
+    "AFG": "AF", "ALB": "AL", "ALG": "DZ", "AND": "AD", "ANG": "AO", "ANT": "AG", "ARG": "AR", "ARM": "AM",
+    "ARU": "AW", "ASA": "AS", "AUS": "AU", "AUT": "AT", "AZE": "AZ", "BAH": "BS", "BAN": "BD", "BAR": "BB",
+    "BDI": "BI", "BEL": "BE", "BEN": "BJ", "BER": "BM", "BHU": "BT", "BIH": "BA", "BIZ": "BZ", "BLR": "BY",
+    "BOL": "BO", "BOT": "BW", "BRA": "BR", "BRN": "BH", "BRU": "BN", "BUL": "BG", "BUR": "BF", "CAF": "CF",
+    "CAM": "KH", "CAN": "CA", "CAY": "KY", "CGO": "CG", "CHA": "TD", "CHI": "CL", "CHN": "CN", "CIV": "CI",
+    "CMR": "CM", "COD": "CD", "COK": "CK", "COL": "CO", "COM": "KM", "CPV": "CV", "CRC": "CR", "CRO": "HR",
+    "CUB": "CU", "CYP": "CY", "CZE": "CZ", "DEN": "DK", "DJI": "DJ", "DMA": "DM", "DOM": "DO", "ECU": "EC",
+    "EGY": "EG", "ERI": "ER", "ESA": "SV", "ESP": "ES", "EST": "EE", "ETH": "ET", "FIJ": "FJ", "FIN": "FI",
+    "FRA": "FR", "FSM": "FM", "GAB": "GA", "GAM": "GM", "GBR": "GB", "GBS": "GW", "GEO": "GE", "GEQ": "GQ",
+    "GER": "DE", "GHA": "GH", "GRE": "GR", "GRN": "GD", "GUA": "GT", "GUI": "GN", "GUM": "GU", "GUY": "GY",
+    "HAI": "HT", "HKG": "HK", "HON": "HN", "HUN": "HU", "INA": "ID", "IND": "IN", "IRI": "IR", "IRL": "IE",
+    "IRQ": "IQ", "ISL": "IS", "ISR": "IL", "ISV": "VI", "ITA": "IT", "IVB": "VG", "JAM": "JM", "JOR": "JO",
+    "JPN": "JP", "KAZ": "KZ", "KEN": "KE", "KGZ": "KG", "KIR": "KI", "KOR": "KR", "KOS": "XK", "KSA": "SA",
+    "KUW": "KW", "LAO": "LA", "LAT": "LV", "LBA": "LY", "LBN": "LB", "LBR": "LR", "LCA": "LC", "LES": "LS",
+    "LIE": "LI", "LTU": "LT", "LUX": "LU", "MAD": "MG", "MAR": "MA", "MAS": "MY", "MAW": "MW", "MDA": "MD",
+    "MDV": "MV", "MEX": "MX", "MGL": "MN", "MHL": "MH", "MKD": "MK", "MLI": "ML", "MLT": "MT", "MNE": "ME",
+    "MON": "MC", "MOZ": "MZ", "MRI": "MU", "MTN": "MR", "MYA": "MM", "NAM": "NA", "NCA": "NI", "NED": "NL",
+    "NEP": "NP", "NGR": "NG", "NIG": "NE", "NOR": "NO", "NRU": "NR", "NZL": "NZ", "OMA": "OM", "PAK": "PK",
+    "PAN": "PA", "PAR": "PY", "PER": "PE", "PHI": "PH", "PLE": "PS", "PLW": "PW", "PNG": "PG", "POL": "PL",
+    "POR": "PT", "PRK": "KP", "PUR": "PR", "QAT": "QA", "ROU": "RO", "RSA": "ZA", "RUS": "RU", "RWA": "RW",
+    "SAM": "WS", "SEN": "SN", "SEY": "SC", "SGP": "SG", "SKN": "KN", "SLE": "SL", "SLO": "SI", "SMR": "SM",
+    "SOL": "SB", "SOM": "SO", "SRB": "RS", "SRI": "LK", "SSD": "SS", "STP": "ST", "SUD": "SD", "SUI": "CH",
+    "SUR": "SR", "SVK": "SK", "SWE": "SE", "SWZ": "SZ", "SYR": "SY", "TAN": "TZ", "TGA": "TO", "THA": "TH",
+    "TJK": "TJ", "TKM": "TM", "TLS": "TL", "TOG": "TG", "TPE": "TW", "TTO": "TT", "TUN": "TN", "TUR": "TR",
+    "TUV": "TV", "UAE": "AE", "UGA": "UG", "UKR": "UA", "URU": "UY", "USA": "US", "UZB": "UZ", "VAN": "VU",
+    "VEN": "VE", "VIE": "VN", "VIN": "VC", "YEM": "YE", "ZAM": "ZM", "ZIM": "ZW",
+    # codes of the former mapping, kept so that older CSV files keep their flags
+    "IRN": "IR", "SAF": "ZA",
+}
 
-def country_acronym_to_flag(acronym):
-    # Mapping of non-standard acronyms to standard ones
-    mapping = {
-        "CHN": "CN",
-        "KOR": "KR",
-        "GBR": "GB",
-        "USA": "US",
-        "SUI": "CH",
-        "ESP": "ES",
-        "GER": "DE",
-        "NED": "NL",
-        "NZL": "NZ",
-        "RUS": "RU",
-        "SRB": "RS",
-        "MEX": "MX",
-        "NOR": "NO",
-        "DEN": "DK",
-        "FIN": "FI",
-        "ARG": "AR",
-        "COL": "CO",
-        "TUR": "TR",
-        "POR": "PT",
-        "CZE": "CZ",
-        "AUT": "AT",
-        "GRE": "GR",
-        "BEL": "BE",
-        "IRN": "IR",
-        "IRL": "IE",
-        "EGY": "EG",
-        "SAF": "ZA",
-        "VIE": "VN",
-        "THA": "TH",
-        "POL": "PL",
-        "SWE": "SE",
-        "HUN": "HU",
-        "BRA": "BR",
-        "CAN": "CA",
-        "JPN": "JP",
-        "ITA": "IT",
-        "FRA": "FR",
-        "AUS": "AU",
-        "ROU": "RO",
-        "ISR": "IL",
-        "HKG": "HK",
-        "GEO": "GE",
-        "UKR": "UA",
-        "CRO": "HR",
-        "PHI": "PH",
-        "UZB": "UZ",
-    }
-    # Convert the acronym using the mapping dictionary
-    standard_acronym = mapping.get(acronym, acronym)
-    return ''.join(chr(ord(char) + 127397) for char in standard_acronym.upper())
+# teams competing without a national flag: neutral athletes, refugee teams, independent athletes
+NEUTRAL_TEAMS = {"AIN", "EOR", "IOA", "NPA", "OAR", "ROC", "RPC", "RPT"}
+
+# offset from "A" to the regional indicator symbol "A"
+_REGIONAL_INDICATOR_OFFSET = 127397
+
+
+def iso_to_flag(iso: str) -> str:
+    """Flag emoji of an ISO 3166-1 alpha-2 code"""
+    return ''.join(chr(ord(char) + _REGIONAL_INDICATOR_OFFSET) for char in iso.upper())
+
+
+_FLAGS = {code: iso_to_flag(iso) for code, iso in IOC_TO_ISO.items()}
+
+
+def country_acronym_to_flag(acronym) -> str:
+    """Flag emoji of an IOC code, empty for the neutral teams and the unknown codes"""
+    return _FLAGS.get(acronym, "")
+
+
+def country_label(acronym) -> str:
+    """Display label of a NOC, e.g. "USA 🇺🇸", the code alone when it has no flag"""
+    flag = _FLAGS.get(acronym)
+    return f"{acronym} {flag}" if flag else str(acronym)
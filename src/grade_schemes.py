@@ -0,0 +1,204 @@
+import argparse
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import GOLD_MEDAL, SILVER_MEDAL, BRONZE_MEDAL, CHOCOLATE, MIN_MEDALS
+from ranking_functions import majority_judgment_ranks
+
+MEDALS = ("Gold", "Silver", "Bronze")
+
+
+@dataclass(frozen=True)
+class GradeScheme:
+    """
+    How a medal table is turned into merit profiles
+
+    Parameters
+    ----------
+    name : str
+       Name of the scheme in the reports
+    grades : tuple
+       Labels of the grades, from the best one to the worst one, the filler grades last
+    weights : tuple
+       One row per grade but the filler ones, one integer per feature: the number of ballots of that
+       grade given by each medal (or other feature) of a country
+    features : tuple
+       Columns of the medal table read by the scheme
+    filler : str
+       "max" to fill every country with the last grade up to the best number of ballots of the table.
+       Otherwise the name of a column holding the number of ballots of each country (e.g. events
+       entered): the second to last grade fills each country up to that number, and the last grade fills
+       every country up to the largest one, since Majority Judgment needs equal numbers of ballots.
+    """
+    name: str
+    grades: tuple
+    weights: tuple
+    features: tuple = MEDALS
+    filler: str = "max"
+
+    def __post_init__(self):
+        weights = np.asarray(self.weights)
+        if weights.shape != (len(self.grades) - self.nb_filler_grades, len(self.features)):
+            raise ValueError(f"{self.name}: weights must have one row per grade but the filler ones and one "
+                             f"column per feature, got shape {weights.shape}")
+        if not np.issubdtype(weights.dtype, np.integer) or (weights < 0).any():
+            raise ValueError(f"{self.name}: weights must be non-negative integers")
+
+    @property
+    def nb_filler_grades(self) -> int:
+        return 1 if self.filler == "max" else 2
+
+
+def default_scheme() -> GradeScheme:
+    """The scheme of create_mj_dataframe: one grade per medal, chocolate up to the best total"""
+    return GradeScheme(
+        name="default",
+        grades=(f"Gold {GOLD_MEDAL}", f"Silver {SILVER_MEDAL}", f"Bronze {BRONZE_MEDAL}", f"No Medal {CHOCOLATE}"),
+        weights=((1, 0, 0), (0, 1, 0), (0, 0, 1)),
+    )
+
+
+def merged_scheme() -> GradeScheme:
+    """Silver and bronze medals merged into one grade"""
+    return GradeScheme(
+        name="silver+bronze",
+        grades=(f"Gold {GOLD_MEDAL}", f"Podium {SILVER_MEDAL}{BRONZE_MEDAL}", f"No Medal {CHOCOLATE}"),
+        weights=((1, 0, 0), (0, 1, 1)),
+    )
+
+
+def weighted_scheme(gold: int, silver: int, bronze: int) -> GradeScheme:
+    """Each medal repeated as many times as its weight, the chocolate filling up to the best weighted total"""
+    scheme = default_scheme()
+    return GradeScheme(
+        name=f"weights {gold}/{silver}/{bronze}",
+        grades=scheme.grades,
+        weights=((gold, 0, 0), (0, silver, 0), (0, 0, bronze)),
+    )
+
+
+def entries_scheme(column: str = "Entries") -> GradeScheme:
+    """Chocolate for every event entered without a medal, read from a column of the medal table"""
+    scheme = default_scheme()
+    return GradeScheme(name=f"chocolate from {column}", grades=scheme.grades + ("Not entered",),
+                       weights=scheme.weights, filler=column)
+
+
+def scheme_grid(max_weight: int = 5) -> list:
+    """The default and merged schemes, then every weighted scheme where a medal weighs at least the next one"""
+    schemes = [default_scheme(), merged_scheme()]
+    for gold, silver, bronze in itertools.product(range(1, max_weight + 1), repeat=3):
+        if gold >= silver >= bronze and (gold, silver, bronze) != (1, 1, 1):
+            schemes.append(weighted_scheme(gold, silver, bronze))
+    return schemes
+
+
+@dataclass(frozen=True)
+class SchemeEvaluation:
+    """MJ ranks (starting at 1) and majority grades of the same countries under several schemes"""
+    schemes: list
+    countries: np.ndarray
+    ranks: np.ndarray
+    majority_grades: np.ndarray
+
+    def to_frame(self) -> DataFrame:
+        """(scheme x country) rank matrix"""
+        return pd.DataFrame(self.ranks, index=pd.Index([s.name for s in self.schemes], name="scheme"),
+                            columns=self.countries)
+
+    def robustness(self, reference: int = 0) -> DataFrame:
+        """
+        How much the rank of each country depends on the scheme
+
+        Parameters
+        ----------
+        reference : int
+           Index of the scheme the other ones are compared with, the first one by default
+        Returns
+        -------
+           One row per country with its reference rank, the best, worst and median rank over the schemes,
+           and the share of the schemes that keep the reference rank, most robust countries first
+        """
+        reference_rank = self.ranks[reference]
+        report = pd.DataFrame({
+            "Country": self.countries,
+            "Rank_MJ": reference_rank,
+            "best_rank": self.ranks.min(axis=0),
+            "worst_rank": self.ranks.max(axis=0),
+            "median_rank": np.median(self.ranks, axis=0),
+            "same_rank_share": (self.ranks == reference_rank).mean(axis=0),
+        })
+        report["robust"] = report["best_rank"] == report["worst_rank"]
+        return report.sort_values(["Rank_MJ", "Country"], ignore_index=True)
+
+
+def evaluate_schemes(df: DataFrame, schemes: list, min_medals: int = MIN_MEDALS) -> SchemeEvaluation:
+    """
+    Rank the same medal table under many grade schemes in one vectorized call
+
+    Schemes with fewer grades are padded with empty grades after their fillers, which does not change
+    the Majority Judgment order, so every scheme goes into a single batch.
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table with Country, Total and the features of every scheme
+    schemes : list
+       GradeScheme to compare
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    Returns
+    -------
+       The SchemeEvaluation of the table
+    """
+    df = df[df["Total"] >= min_medals]
+    features = list(dict.fromkeys(feature for scheme in schemes for feature in scheme.features))
+    values = df[features].to_numpy(dtype=np.int64)
+    nb_grades = max(len(scheme.grades) for scheme in schemes)
+
+    # weights[s, g, f]: ballots of grade g given by one unit of feature f under scheme s
+    weights = np.zeros((len(schemes), nb_grades, len(features)), dtype=np.int64)
+    for s, scheme in enumerate(schemes):
+        columns = [features.index(feature) for feature in scheme.features]
+        weights[s, :len(scheme.weights)][:, columns] = scheme.weights
+    counts = np.einsum("nf,sgf->sng", values, weights)
+
+    graded = counts.sum(axis=-1)
+    for s, scheme in enumerate(schemes):
+        filler_grade = len(scheme.weights)
+        if scheme.filler == "max":
+            counts[s, :, filler_grade] = graded[s].max(initial=0) - graded[s]
+            continue
+        ballots = df[scheme.filler].to_numpy(dtype=np.int64)
+        if (ballots < graded[s]).any():
+            raise ValueError(f"{scheme.name}: some countries have more graded medals than {scheme.filler}")
+        counts[s, :, filler_grade] = ballots - graded[s]
+        counts[s, :, filler_grade + 1] = ballots.max(initial=0) - ballots
+
+    majority_grade, rank, _ = majority_judgment_ranks(counts)
+    labels = np.array([list(scheme.grades) + [None] * (nb_grades - len(scheme.grades)) for scheme in schemes],
+                      dtype=object)
+    return SchemeEvaluation(
+        schemes=list(schemes),
+        countries=df["Country"].to_numpy(),
+        ranks=rank + 1,
+        majority_grades=np.take_along_axis(labels, majority_grade, axis=1),
+    )
+
+
+if __name__ == "__main__":
+    from replay import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Compare the MJ ranking under many medal-to-grade schemes")
+    parser.add_argument("csv", help="medal table snapshot")
+    parser.add_argument("--max-weight", type=int, default=5, help="largest medal weight of the weighted schemes")
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    args = parser.parse_args()
+
+    evaluation = evaluate_schemes(load_snapshot(args.csv), scheme_grid(args.max_weight), args.min_medals)
+    print(f"{len(evaluation.schemes)} schemes")
+    print(evaluation.robustness().to_string(index=False))
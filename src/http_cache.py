@@ -0,0 +1,29 @@
+import hashlib
+import json
+import os
+
+CACHE_PATH = os.path.dirname(os.path.abspath(__file__)) + '/../data/.http_cache'
+
+
+def cache_files(cache_dir: str, url: str):
+    """(metadata, body) files of a URL in the HTTP cache"""
+    key = hashlib.sha1(url.encode()).hexdigest()[:16]
+    return f"{cache_dir}/{key}.meta.json", f"{cache_dir}/{key}.body.json"
+
+
+def read_cache_meta(cache_dir: str, url: str) -> dict:
+    meta_file, _ = cache_files(cache_dir, url)
+    try:
+        with open(meta_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache_meta(cache_dir: str, url: str, meta: dict):
+    meta_file, _ = cache_files(cache_dir, url)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(meta_file + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_file + ".tmp", meta_file)
+
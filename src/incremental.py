@@ -0,0 +1,237 @@
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from flag_utils import country_label
+from constants import GRADES, MIN_MEDALS
+from noc_registry import REGISTRY
+from ranking_functions import majority_judgment_keys
+
+METHODS = ["mj", "lexico", "total"]
+MEDALS = ["Gold", "Silver", "Bronze"]
+
+
+@dataclass(frozen=True)
+class RankChange:
+    """New rank (starting at 1) of a country with one method, None when it is not ranked"""
+    org: str
+    method: str
+    old_rank: int
+    new_rank: int
+
+
+class IncrementalRanker:
+    """
+    MJ, lexicographic and total ranks kept up to date from medal deltas
+
+    One sorted index per method is kept. A delta only moves the countries it touches in each index,
+    and only the ranks between their old and new positions are computed again. The chocolate grade
+    of every ranked country depends on the best total, so the MJ index is rebuilt when it moves.
+    Countries with equal medals keep the order in which they were first seen in the lexicographic
+    ranking, as rank_lexicographically keeps the order of the table.
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table with org (or Country), Gold, Silver and Bronze columns, and noc_id when the ids are known
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    """
+
+    def __init__(self, df: DataFrame, min_medals: int = MIN_MEDALS):
+        self.min_medals = min_medals
+        org = df["org"] if "org" in df.columns else df["Country"].str.split(" ").str[0]
+        self.orgs = [str(code) for code in org]
+        self.countries = (
+            list(df["Country"]) if "Country" in df.columns else [country_label(code) for code in self.orgs]
+        )
+        self.noc_ids = list(df["noc_id"]) if "noc_id" in df.columns else list(REGISTRY.ids(self.orgs))
+        self.index = {code: i for i, code in enumerate(self.orgs)}
+        self.medals = df[MEDALS].to_numpy(dtype=np.int64).copy()
+        self._mj_keys = {}
+        self._sorted = {}
+        self._ranks = {}
+
+        ranked = [i for i in range(len(self.orgs)) if self._is_ranked(i)]
+        self._sorted["total"] = sorted(self._entry("total", i) for i in ranked)
+        self._sorted["lexico"] = sorted(self._entry("lexico", i) for i in ranked)
+        self._rebuild_mj()
+        for method in METHODS:
+            self._ranks[method] = {}
+            self._refresh_ranks(method, 0, len(self._sorted[method]) - 1)
+
+    def _is_ranked(self, i: int) -> bool:
+        return int(self.medals[i].sum()) >= self.min_medals
+
+    def _max_total(self) -> int:
+        total_index = self._sorted["total"]
+        return -total_index[0][0] if total_index else 0
+
+    def _key(self, method: str, i: int) -> tuple:
+        # the smaller the key, the better the country
+        gold, silver, bronze = (int(count) for count in self.medals[i])
+        if method == "total":
+            return (-(gold + silver + bronze),)
+        if method == "lexico":
+            return -gold, -silver, -bronze
+        return tuple(-int(k) for k in self._mj_keys[i])
+
+    def _entry(self, method: str, i: int) -> tuple:
+        return self._key(method, i) + (i,)
+
+    def _compute_mj_keys(self, countries: list):
+        if not countries:
+            return
+        medals = self.medals[countries]
+        chocolate = self._max_total() - medals.sum(axis=1)
+        keys = majority_judgment_keys(np.column_stack([medals, chocolate]))
+        for i, key in zip(countries, keys):
+            self._mj_keys[i] = key
+
+    def _rebuild_mj(self):
+        ranked = [entry[-1] for entry in self._sorted["total"]]
+        self._mj_keys = {}
+        self._compute_mj_keys(ranked)
+        self._sorted["mj"] = sorted(self._entry("mj", i) for i in ranked)
+
+    def _rank_at(self, method: str, position: int) -> int:
+        index = self._sorted[method]
+        if method == "lexico":
+            return position + 1
+        # equal keys share the best rank
+        return bisect_left(index, index[position][:-1]) + 1
+
+    def _refresh_ranks(self, method: str, lo: int, hi: int) -> dict:
+        """Compute the ranks between two positions of an index again, returns (old, new) of the ones that changed"""
+        index = self._sorted[method]
+        # countries after the window tied with its last one share a rank that may have moved
+        while 0 <= hi < len(index) - 1 and index[hi + 1][:-1] == index[hi][:-1]:
+            hi += 1
+        changed = {}
+        for position in range(max(0, lo), min(hi, len(index) - 1) + 1):
+            i = index[position][-1]
+            rank = self._rank_at(method, position)
+            previous = self._ranks[method].get(i)
+            if previous != rank:
+                changed[i] = previous, rank
+                self._ranks[method][i] = rank
+        return changed
+
+    def _add_country(self, org: str) -> int:
+        self.index[org] = len(self.orgs)
+        self.orgs.append(org)
+        self.countries.append(country_label(org))
+        self.noc_ids.append(REGISTRY.id(org))
+        self.medals = np.vstack([self.medals, np.zeros((1, 3), dtype=np.int64)])
+        return self.index[org]
+
+    def _insert(self, method: str, countries: list, positions: dict):
+        index = self._sorted[method]
+        for i in countries:
+            insort(index, self._entry(method, i))
+        positions[method] += [bisect_left(index, self._entry(method, i)) for i in countries]
+
+    def apply(self, deltas: dict) -> list:
+        """
+        Apply the medals won (or withdrawn) in one event and update the three rankings
+
+        Parameters
+        ----------
+        deltas : dict
+           (gold, silver, bronze) deltas per NOC code, e.g. {"FRA": (1, 0, 0)} for a gold medal to France
+        Returns
+        -------
+           The RankChange of every country whose rank moved, with any method
+        """
+        updates = {}
+        for org, delta in deltas.items():
+            delta = np.asarray(delta, dtype=np.int64)
+            if delta.shape != (3,):
+                raise ValueError(f"The delta of {org} must hold gold, silver and bronze counts, got {delta}")
+            current = self.medals[self.index[org]] if org in self.index else np.zeros(3, dtype=np.int64)
+            if (current + delta < 0).any():
+                raise ValueError(f"{org} cannot have a negative medal count")
+            updates[org] = delta
+        if not updates:
+            return []
+
+        old_max = self._max_total()
+        # countries seen for the first time were never indexed, even when min_medals is 0
+        was_ranked = {}
+        for org in updates:
+            if org in self.index:
+                was_ranked[self.index[org]] = self._is_ranked(self.index[org])
+            else:
+                was_ranked[self._add_country(org)] = False
+        touched = list(was_ranked)
+
+        positions = {method: [] for method in METHODS}
+        old_ranks = {method: {} for method in METHODS}
+        for i in touched:
+            if was_ranked[i]:
+                for method in METHODS:
+                    index = self._sorted[method]
+                    position = bisect_left(index, self._entry(method, i))
+                    del index[position]
+                    positions[method].append(position)
+                    old_ranks[method][i] = self._ranks[method].pop(i)
+            self.medals[i] += updates[self.orgs[i]]
+
+        now_ranked = [i for i in touched if self._is_ranked(i)]
+        for method in ["total", "lexico"]:
+            self._insert(method, now_ranked, positions)
+
+        if self._max_total() != old_max:
+            # every chocolate count moved: the MJ index is built again
+            self._rebuild_mj()
+            positions["mj"] = [0, len(self._sorted["mj"]) - 1]
+        else:
+            self._compute_mj_keys(now_ranked)
+            self._insert("mj", now_ranked, positions)
+
+        changes = []
+        for method in METHODS:
+            if not positions[method]:
+                continue
+            # positions were read while the index moved, each move shifts the others by one at most
+            lo, hi = min(positions[method]), max(positions[method]) + len(touched)
+            if sum(was_ranked.values()) != len(now_ranked):
+                # a country entered or left the ranking: everyone after it moved by one
+                hi = len(self._sorted[method]) - 1
+            for i, (old_rank, new_rank) in self._refresh_ranks(method, lo, hi).items():
+                old_rank = old_ranks[method].pop(i, old_rank)
+                if old_rank != new_rank:
+                    changes.append(RankChange(self.orgs[i], method, old_rank, new_rank))
+            # touched countries that left the ranking
+            for i, old_rank in old_ranks[method].items():
+                if i not in self._ranks[method]:
+                    changes.append(RankChange(self.orgs[i], method, old_rank, None))
+        return sorted(changes, key=lambda change: (METHODS.index(change.method), change.new_rank or 0))
+
+    def add_medal(self, org: str, medal: str, count: int = 1) -> list:
+        """apply() for one medal colour, e.g. add_medal("FRA", "Gold") for "+1 gold to FRA" """
+        delta = [0, 0, 0]
+        delta[[m.lower() for m in MEDALS].index(medal.lower())] = count
+        return self.apply({org: delta})
+
+    def ranking(self) -> DataFrame:
+        """Current ranks, in the columns of pipeline.create_rank_comparison, sorted by MJ rank"""
+        ranked = [entry[-1] for entry in self._sorted["mj"]]
+        medals = self.medals[ranked]
+        majority_grade = len(GRADES) - 1 - np.array([int(self._mj_keys[i][0]) for i in ranked], dtype=np.intp)
+        return pd.DataFrame({
+            "noc_id": np.array([self.noc_ids[i] for i in ranked], dtype=np.int32),
+            "mention_majoritaire": np.asarray(GRADES, dtype=object)[majority_grade],
+            "org": [self.orgs[i] for i in ranked],
+            "Country": [self.countries[i] for i in ranked],
+            "Rank_Total": [self._ranks["total"][i] for i in ranked],
+            "Rank_Lexico": [self._ranks["lexico"][i] for i in ranked],
+            "Total": medals.sum(axis=1),
+            "Gold": medals[:, 0],
+            "Silver": medals[:, 1],
+            "Bronze": medals[:, 2],
+            "Rank_MJ": [self._ranks["mj"][i] for i in ranked],
+        })
@@ -1,65 +1,20 @@
+import argparse
 import os
-import numpy as np
-import pandas as pd
+from functools import partial
+
 import plotly.express as px
 
+import tracing
+from export_engine import ExportEngine
+from pipeline import MedalPipeline, MIN_MEDALS
 from plot_merit_profil import plot_merit_profiles_in_number, get_grades
-from ranking_functions import apply_majority_judgment, rank_lexicographically, rank_by_total_medals
 from scraper import scrap_olympic_data
 from table_function import create_ranking_comparison_table
+from tracing import span
 
-# Constants
-GOLD_MEDAL = "\U0001F947"
-SILVER_MEDAL = "\U0001F948"
-BRONZE_MEDAL = "\U0001F949"
-CHOCOLATE = "\U0001F36B"
-PATH = os.path.dirname(os.path.abspath(__file__)) + '/../data'
 OUTPATH = os.path.dirname(os.path.abspath(__file__)) + '/../figures'
 
 
-def load_data():
-    df, suffix = scrap_olympic_data()
-    fin_enquete = f"{suffix[:4]}-{suffix[4:6]}-{suffix[6:8]} {suffix[9:11]}:00"
-    return df, fin_enquete
-
-
-def verify_medal_sum(df):
-    return (df["Gold"] + df["Silver"] + df["Bronze"] == df["Total"]).all()
-
-
-def filter_countries(df, min_medals):
-    return df[df["Total"] >= min_medals]
-
-
-def create_mj_dataframe(df, fin_enquete):
-    df_mj = pd.DataFrame()
-    df_mj["candidat"] = df["Country"]
-    df_mj["nombre_mentions"] = 4
-
-    mentions = [
-        ("Gold", GOLD_MEDAL),
-        ("Silver", SILVER_MEDAL),
-        ("Bronze", BRONZE_MEDAL),
-        ("No Medal", CHOCOLATE)
-    ]
-
-    for i, (mention, emoji) in enumerate(mentions, 1):
-        df_mj[f"mention_{i}"] = f"{mention} {emoji}"
-        df_mj[f"intention_mention_{i}"] = df[mention] if mention != "No Medal" else df["Total"].max() - df["Total"]
-
-    for i in range(5, 8):
-        df_mj[f"mention_{i}"] = np.nan
-        df_mj[f"intention_mention_{i}"] = np.nan
-
-    df_mj["nom_institut"] = "Olympics 2024"
-    df_mj["commanditaire"] = "Mieux Voter"
-    df_mj["debut_enquete"] = np.nan
-    df_mj["fin_enquete"] = fin_enquete
-    df_mj["id"] = 1
-
-    return df_mj
-
-
 def get_plot_info(df_mj_ranked):
     first_idx = df_mj_ranked.first_valid_index()
     source = df_mj_ranked["nom_institut"].loc[first_idx]
@@ -70,15 +25,16 @@ def get_plot_info(df_mj_ranked):
 
 
 def plot_merit_profiles(df_mj_ranked, source, date, grades):
-    fig = plot_merit_profiles_in_number(
-        df=df_mj_ranked,
-        grades=grades,
-        auto_text=True,
-        source=source,
-        date=date,
-        sponsor=None,
-        show_no_opinion=False,
-    )
+    with span("plot.merit_profile", rows=len(df_mj_ranked)):
+        fig = plot_merit_profiles_in_number(
+            df=df_mj_ranked,
+            grades=grades,
+            auto_text=True,
+            source=source,
+            date=date,
+            sponsor=None,
+            show_no_opinion=False,
+        )
     return fig
 
 
@@ -86,53 +42,99 @@ def save_plot(fig, filename):
     fig.write_image(filename, format='pdf')
 
 
-def main():
-    df, fin_enquete = load_data()
-
-    if not verify_medal_sum(df):
-        raise ValueError("Warning: Medal sum verification failed")
-
-    MIN_MEDALS = 20
-
-    df = filter_countries(df, MIN_MEDALS)
-    df_mj = create_mj_dataframe(df, fin_enquete)
-    df_mj_ranked = apply_majority_judgment(df_mj)
-
-    source, date, grades = get_plot_info(df_mj_ranked)
+def build_figures(result, outpath=OUTPATH) -> dict:
+    fin_enquete = result.snapshot.fin_enquete
+    if result.table is not None:
+        source, date, grades = result.table.source, result.table.fin_enquete, list(result.table.grades)
+    else:
+        source, date, grades = get_plot_info(result.df_mj_ranked)
+    merit_profile = plot_merit_profiles(result.df_mj_ranked, source, date, grades)
+    with span("plot.comparison_table", rows=len(result.rank_comparison)):
+        comparison_table = create_ranking_comparison_table(result.rank_comparison)
+    return {
+        f"{outpath}/mj_olympic_{fin_enquete}": merit_profile,
+        f"{outpath}/mj_olympic_table_{fin_enquete}": comparison_table,
+    }
+
+
+def export_figures(result, outpath=OUTPATH, engine=None):
+    """
+    Write the merit profile and the comparison table as PDF and PNG
+
+    With an ExportEngine the export is headless and batched, unchanged outputs are skipped.
+    Without one, the figures are also shown in the browser.
+    """
+    with span("plot.build_figures"):
+        figures = build_figures(result, outpath)
+    if engine is not None:
+        with span("export.figures") as export_span:
+            written = engine.export(figures, formats=("pdf", "png"))
+            if tracing.is_enabled():
+                export_span.set(files=len(written), bytes=_files_size(written))
+        return written
 
     # fake plot to hack an artefact that disappear when done before the main one.
     fig1 = px.scatter(x=[0, 1, 2, 3, 4], y=[0, 1, 4, 9, 16])
     fig1.show()
 
-    fig = plot_merit_profiles(df_mj_ranked, source, date, grades)
-    fig.show()
-
-    save_plot(fig, f"{OUTPATH}/mj_olympic_{fin_enquete}.pdf")
-    fig.write_image(f"{OUTPATH}/mj_olympic_{fin_enquete}.png", format='png')
-
-    df, _ = load_data()
-    df_mj = create_mj_dataframe(df, fin_enquete)
-    df_mj_ranked = apply_majority_judgment(df_mj)
-    df = rank_lexicographically(df)
-    df = rank_by_total_medals(df)
-
-    df_mj_ranked["rang"] = df_mj_ranked["rang"].apply(lambda x: x + 1)
-
-    rank_comparison = pd.merge(
-        left=df_mj_ranked[["candidat", "rang", "mention_majoritaire"]],
-        right=df[["Country", "Rank_Total", "Rank_Lexico", "Total", "Gold", "Silver", "Bronze"]],
-        left_on="candidat",
-        right_on="Country",
-    )
-
-    rank_comparison["Rank_MJ"] = rank_comparison["rang"]
-    rank_comparison = rank_comparison.drop(columns=["rang", "candidat"])
-
-    fig = create_ranking_comparison_table(rank_comparison)
-    fig.write_image(f"{OUTPATH}/mj_olympic_table_{fin_enquete}.png", format='png')
-    save_plot(fig, f"{OUTPATH}/mj_olympic_table_{fin_enquete}.pdf")
-    fig.show()
+    with span("export.figures") as export_span:
+        for basename, fig in figures.items():
+            fig.show()
+            save_plot(fig, f"{basename}.pdf")
+            fig.write_image(f"{basename}.png", format='png')
+        written = [f"{basename}.{fmt}" for basename in figures for fmt in ("pdf", "png")]
+        if tracing.is_enabled():
+            export_span.set(files=len(written), bytes=_files_size(written))
+    return written
+
+
+def _files_size(paths) -> int:
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def main(headless=False, trace_report=None, metrics=None):
+    """
+    Scrape, rank and export the figures
+
+    Parameters
+    ----------
+    headless : bool
+       Batch export the figures without a browser
+    trace_report : str
+       JSON file where the duration, rows and bytes of every stage are written
+    metrics : str
+       File where the stage metrics are written in the Prometheus text format
+    """
+    if trace_report or metrics:
+        tracing.enable()
+    try:
+        _run(headless)
+    finally:
+        if trace_report:
+            tracing.write_report(trace_report)
+        if metrics:
+            tracing.write_prometheus(metrics)
+
+
+def _run(headless):
+    # one scrape and one ranking, shared by the merit profile plot and the comparison table
+    pipeline = MedalPipeline(min_medals=MIN_MEDALS, fetch=partial(scrap_olympic_data, only_if_changed=True))
+    with span("pipeline.run"):
+        result = pipeline.result
+    if result is None:
+        print("No medal change since the last run, nothing to do.")
+        return
+    if headless:
+        with ExportEngine() as engine:
+            export_figures(result, engine=engine)
+    else:
+        export_figures(result)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Rank the Olympic medal table with Majority Judgment")
+    parser.add_argument("--headless", action="store_true", help="batch export the figures without a browser")
+    parser.add_argument("--trace-report", default=None, help="write the timing of every stage to this JSON file")
+    parser.add_argument("--metrics", default=None, help="write the stage metrics to this Prometheus textfile")
+    args = parser.parse_args()
+    main(headless=args.headless, trace_report=args.trace_report, metrics=args.metrics)
@@ -0,0 +1,123 @@
+"""
+Streaming parser of the CIS_MedalNOCs JSON
+
+The rows of the "medalNOC" array are decoded one at a time from chunks of the body, and only the
+requested sport and gender slices are kept, so that the memory used grows with the kept rows and
+not with the payload. Only the standard library is imported, for rank.py.
+"""
+import codecs
+import json
+import re
+from array import array
+
+MEDAL_KEY = "medalNOC"
+OVERALL_SPORTS = ("GLO",)
+OVERALL_GENDERS = ("TOT",)
+TEXT_FIELDS = ["org", "organisation.code", "organisation.description", "organisation.longDescription"]
+BREAKDOWN_FIELDS = ["sport", "gender"]
+COUNT_FIELDS = ["gold", "silver", "bronze", "sortRankTotal"]
+
+_SEPARATORS = re.compile(r"[\s,]*")
+# longest text kept between two chunks while looking for the key
+_KEY_TAIL = 256
+
+
+def iter_array_items(chunks, key: str = MEDAL_KEY):
+    """
+    Items of the array of a key of a JSON document, decoded while the chunks of the document arrive
+
+    Parameters
+    ----------
+    chunks : iterable of bytes
+       UTF-8 body of the document, e.g. response.iter_content()
+    key : str
+       Key of the array, the first one found in the document is read
+    Returns
+    -------
+       A generator of the decoded items, it stops reading the chunks at the end of the array
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    key_pattern = re.compile(rf'"{re.escape(key)}"\s*:\s*\[')
+    chunks = iter(chunks)
+    buffer, position, in_array, eof = "", 0, False, False
+
+    while True:
+        if not in_array:
+            match = key_pattern.search(buffer)
+            if match is not None:
+                buffer, position, in_array = buffer[match.end():], 0, True
+                continue
+            # the key may be split between this chunk and the next one
+            buffer = buffer[-_KEY_TAIL:]
+        else:
+            position = _SEPARATORS.match(buffer, position).end()
+            if position < len(buffer):
+                if buffer[position] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # a number at the very end of the buffer may go on in the next chunk
+                    if end < len(buffer) or eof or isinstance(item, (dict, list, str)):
+                        yield item
+                        position = end
+                        continue
+
+        if eof:
+            raise ValueError(f'No complete "{key}" array in the JSON document')
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            chunk = text_decoder.decode(b"", final=True)
+        else:
+            chunk = text_decoder.decode(chunk)
+        buffer, position = buffer[position:] + chunk, 0
+
+
+def select_medal_rows(rows, sports=OVERALL_SPORTS, genders=OVERALL_GENDERS):
+    """Rows of the requested sports and genders, None keeps every sport or every gender"""
+    sports = None if sports is None else frozenset(sports)
+    genders = None if genders is None else frozenset(genders)
+    for row in rows:
+        if (sports is None or row.get("sport") in sports) and (genders is None or row.get("gender") in genders):
+            yield row
+
+
+def iter_medal_rows(chunks, sports=OVERALL_SPORTS, genders=OVERALL_GENDERS):
+    """Rows of the requested slices of a streamed CIS_MedalNOCs body"""
+    return select_medal_rows(iter_array_items(chunks), sports, genders)
+
+
+def medal_columns(rows, breakdown: bool = False) -> dict:
+    """
+    Typed columns of medal rows, built row by row
+
+    Parameters
+    ----------
+    rows : iterable of dict
+       Rows of the "medalNOC" array, e.g. from iter_medal_rows
+    breakdown : bool
+       Also keep the sport and gender of every row
+    Returns
+    -------
+       Lists of str for the text fields, int64 arrays for the medal counts and sortRankTotal
+    """
+    text_fields = BREAKDOWN_FIELDS + TEXT_FIELDS if breakdown else TEXT_FIELDS
+    columns = {field: [] for field in text_fields}
+    columns.update({field: array("q") for field in COUNT_FIELDS})
+    for row in rows:
+        organisation = row.get("organisation") or {}
+        for field in text_fields:
+            if field.startswith("organisation."):
+                columns[field].append(organisation.get(field[len("organisation."):]))
+            elif field == "org":
+                columns[field].append(row.get("org") or organisation.get("code"))
+            else:
+                columns[field].append(row.get(field))
+        for field in COUNT_FIELDS:
+            columns[field].append(int(row.get(field) or 0))
+    return columns
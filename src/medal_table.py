@@ -0,0 +1,132 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import GRADES
+from noc_registry import REGISTRY
+from ranking_functions import majority_judgment_ranks
+
+# number of mention_* / intention_mention_* slots of the mjtracker surveys
+NB_MENTION_SLOTS = 7
+
+
+class MedalTable:
+    """
+    Merit profiles of the countries of one snapshot, as a count matrix
+
+    A compact replacement for the wide DataFrame of create_mj_dataframe: the grade labels, the source
+    and the date are stored once, the country names are interned, and the ranking and plotting code
+    read views of one int32 matrix. DataFrames are only built by to_frame and to_mj_dataframe.
+
+    Parameters
+    ----------
+    countries : array-like of str
+       Name of each country
+    counts : array-like of int
+       Merit profiles, of shape (n_countries, n_grades), grades from the best one to the worst one
+    grades : sequence of str
+       Label of each grade
+    fin_enquete : str
+       Date of the snapshot
+    source : str
+       Source of the medal table
+    noc_ids : array-like of int
+       Id of each country in the NOC registry, the key of the joins with the other rankings
+    """
+
+    __slots__ = (
+        "countries", "counts", "grades", "fin_enquete", "source", "noc_ids", "rank", "majority_grade", "_index"
+    )
+
+    def __init__(self, countries, counts, grades, fin_enquete: str = None, source: str = "Olympics 2024",
+                 noc_ids=None):
+        self.countries = np.array([sys.intern(str(country)) for country in countries], dtype=object)
+        self.counts = np.ascontiguousarray(counts, dtype=np.int32)
+        self.grades = tuple(grades)
+        if self.counts.shape != (len(self.countries), len(self.grades)):
+            raise ValueError(f"counts must have one row per country and one column per grade, "
+                             f"got shape {self.counts.shape}")
+        self.fin_enquete = fin_enquete
+        self.source = source
+        self.noc_ids = None if noc_ids is None else np.asarray(noc_ids, dtype=np.int32)
+        self.rank = None
+        self.majority_grade = None
+        self._index = None
+
+    @classmethod
+    def from_medals(cls, df: DataFrame, fin_enquete: str = None, source: str = "Olympics 2024") -> "MedalTable":
+        """Gold, Silver, Bronze and a chocolate grade filling every country up to the best total"""
+        medals = df[["Gold", "Silver", "Bronze"]].to_numpy()
+        counts = np.empty((len(medals), 4), dtype=np.int32)
+        counts[:, :3] = medals
+        total = medals.sum(axis=1)
+        counts[:, 3] = total.max(initial=0) - total
+        if "noc_id" in df.columns:
+            noc_ids = df["noc_id"].to_numpy()
+        else:
+            noc_ids = REGISTRY.ids(df["org"] if "org" in df.columns else df["Country"].str.split(" ").str[0])
+        return cls(df["Country"].to_numpy(), counts, GRADES, fin_enquete, source, noc_ids)
+
+    def __len__(self) -> int:
+        return len(self.countries)
+
+    def __repr__(self) -> str:
+        return f"MedalTable({len(self)} countries, {len(self.grades)} grades, {self.fin_enquete})"
+
+    def index(self, country: str) -> int:
+        """Row of a country"""
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.countries)}
+        return self._index[country]
+
+    def grade_counts(self, grade) -> np.ndarray:
+        """View of the counts of one grade, given by its label or its position"""
+        position = self.grades.index(grade) if isinstance(grade, str) else grade
+        return self.counts[:, position]
+
+    @property
+    def nb_votes(self) -> np.ndarray:
+        return self.counts.sum(axis=1)
+
+    def rank_majority_judgment(self) -> "MedalTable":
+        """Set rank (starting at 0, shared by identical profiles) and majority_grade (0 the best one)"""
+        self.majority_grade, self.rank, _ = majority_judgment_ranks(self.counts)
+        return self
+
+    def to_frame(self) -> DataFrame:
+        """One row per country, one column per grade, and the rank once computed"""
+        df = pd.DataFrame(self.counts, columns=list(self.grades))
+        df.insert(0, "candidat", self.countries)
+        if self.noc_ids is not None:
+            df.insert(0, "noc_id", self.noc_ids)
+        if self.rank is not None:
+            df["rang"] = self.rank
+            df["mention_majoritaire"] = np.asarray(self.grades, dtype=object)[self.majority_grade]
+        return df
+
+    def to_mj_dataframe(self) -> DataFrame:
+        """The wide survey DataFrame of create_mj_dataframe, as read by mjtracker and the plots"""
+        columns = {"candidat": self.countries, "nombre_mentions": len(self.grades)}
+        for i in range(1, max(NB_MENTION_SLOTS, len(self.grades)) + 1):
+            if i <= len(self.grades):
+                columns[f"mention_{i}"] = self.grades[i - 1]
+                columns[f"intention_mention_{i}"] = self.counts[:, i - 1].astype(np.int64)
+            else:
+                columns[f"mention_{i}"] = np.nan
+                columns[f"intention_mention_{i}"] = np.nan
+        columns.update({
+            "nom_institut": self.source,
+            "commanditaire": "Mieux Voter",
+            "debut_enquete": np.nan,
+            "fin_enquete": self.fin_enquete,
+            "id": 1,
+        })
+        if self.noc_ids is not None:
+            columns["noc_id"] = self.noc_ids
+        df_mj = pd.DataFrame(columns)
+        if self.rank is not None:
+            df_mj["rang"] = self.rank
+            df_mj["mention_majoritaire"] = np.asarray(self.grades, dtype=object)[self.majority_grade]
+        return df_mj
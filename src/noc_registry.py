@@ -0,0 +1,111 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from flag_utils import IOC_TO_ISO, NEUTRAL_TEAMS, country_acronym_to_flag, country_label
+
+
+class NocRegistry:
+    """
+    Integer id of every NOC code, with its flag and display label computed once
+
+    The known NOCs get the same ids in every process (sorted codes first), the other codes are added
+    when they are first seen. The ids are the keys of the joins between rankings and snapshots, the
+    flags and labels of a whole column are one take from the arrays of the registry.
+
+    Parameters
+    ----------
+    codes : iterable of str
+       Codes registered up front, in the order of their ids
+    """
+
+    def __init__(self, codes=()):
+        self._ids = {}
+        self._codes = []
+        self._flags = []
+        self._labels = []
+        self._arrays = None
+        self._lock = threading.Lock()
+        for code in codes:
+            self.id(code)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code) -> bool:
+        return code in self._ids
+
+    def id(self, code: str) -> int:
+        """Id of a code, registering it when it is new"""
+        noc_id = self._ids.get(code)
+        if noc_id is None:
+            with self._lock:
+                noc_id = self._ids.get(code)
+                if noc_id is None:
+                    noc_id = len(self._codes)
+                    self._codes.append(code)
+                    self._flags.append(country_acronym_to_flag(code))
+                    self._labels.append(country_label(code))
+                    self._ids[code] = noc_id
+                    self._arrays = None
+        return noc_id
+
+    def ids(self, codes) -> np.ndarray:
+        """int32 ids of a column of codes, each distinct code being looked up once"""
+        position, uniques = pd.factorize(pd.Series(codes, dtype=object).astype(str), sort=False)
+        unique_ids = np.array([self.id(code) for code in uniques], dtype=np.int32)
+        return unique_ids[position]
+
+    def _columns(self):
+        arrays = self._arrays
+        if arrays is None or len(arrays[0]) != len(self._codes):
+            with self._lock:
+                arrays = self._arrays = (
+                    np.array(self._codes, dtype=object),
+                    np.array(self._flags, dtype=object),
+                    np.array(self._labels, dtype=object),
+                )
+        return arrays
+
+    def codes(self, ids) -> np.ndarray:
+        return self._columns()[0][np.asarray(ids)]
+
+    def flags(self, ids) -> np.ndarray:
+        """Flag emoji of each id, empty for the neutral teams and the unknown codes"""
+        return self._columns()[1][np.asarray(ids)]
+
+    def labels(self, ids) -> np.ndarray:
+        """Display label of each id, e.g. "USA 🇺🇸\""""
+        return self._columns()[2][np.asarray(ids)]
+
+
+REGISTRY = NocRegistry(sorted(IOC_TO_ISO.keys() | NEUTRAL_TEAMS))
+
+
+def with_noc_ids(df: DataFrame, registry: NocRegistry = REGISTRY) -> DataFrame:
+    """
+    Add the noc_id column of a medal table, and its org and Country columns when they are missing
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table with org, or Country starting with the NOC code
+    registry : NocRegistry
+       Registry of the ids, the one of the process by default
+    Returns
+    -------
+       A copy of df with noc_id (int32, kept when df already has it), org and Country
+    """
+    df = df.copy()
+    if "noc_id" in df.columns:
+        ids = df["noc_id"].to_numpy()
+    else:
+        org = df["org"] if "org" in df.columns else df["Country"].astype(str).str.split(" ").str[0]
+        ids = df["noc_id"] = registry.ids(org)
+    if "org" not in df.columns:
+        df["org"] = registry.codes(ids)
+    if "Country" not in df.columns:
+        df["Country"] = registry.labels(ids)
+    return df
@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+
+import pandas as pd
+from pandas import DataFrame
+
+from constants import MIN_MEDALS
+from medal_table import MedalTable
+from noc_registry import with_noc_ids
+from ranking_functions import rank_lexicographically, rank_by_total_medals
+from tracing import span
+
+
+def suffix_to_fin_enquete(suffix: str) -> str:
+    return f"{suffix[:4]}-{suffix[4:6]}-{suffix[6:8]} {suffix[9:11]}:00"
+
+
+def verify_medal_sum(df):
+    return (df["Gold"] + df["Silver"] + df["Bronze"] == df["Total"]).all()
+
+
+def filter_countries(df, min_medals):
+    return df[df["Total"] >= min_medals]
+
+
+def create_mj_dataframe(df, fin_enquete):
+    """The medal table as an mjtracker survey, see MedalTable.to_mj_dataframe"""
+    return MedalTable.from_medals(df, fin_enquete).to_mj_dataframe()
+
+
+def create_rank_comparison(df, df_mj_ranked) -> DataFrame:
+    """
+    Gather the Majority Judgment, lexicographic and total medal ranks (all starting at 1) in one DataFrame
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table, as returned by scrap_olympic_data
+    df_mj_ranked : DataFrame
+       Output of apply_majority_judgment on the same countries
+    Returns
+    -------
+       DataFrame with noc_id, org, Country, Rank_MJ, Rank_Lexico, Rank_Total, mention_majoritaire and
+       the medal counts
+    """
+    df = rank_by_total_medals(rank_lexicographically(with_noc_ids(df)))
+
+    # the rankings are joined on the NOC ids, the mjtracker output only has the display labels
+    if "noc_id" in df_mj_ranked.columns:
+        keys = {"on": "noc_id"}
+        left = df_mj_ranked[["noc_id", "rang", "mention_majoritaire"]]
+    else:
+        keys = {"left_on": "candidat", "right_on": "Country"}
+        left = df_mj_ranked[["candidat", "rang", "mention_majoritaire"]]
+    rank_comparison = pd.merge(
+        left=left,
+        right=df[["noc_id", "org", "Country", "Rank_Total", "Rank_Lexico", "Total", "Gold", "Silver", "Bronze"]],
+        **keys,
+    )
+
+    rank_comparison["Rank_MJ"] = rank_comparison["rang"] + 1
+    return rank_comparison.drop(columns=["rang", "candidat"], errors="ignore")
+
+
+@dataclass(frozen=True)
+class MedalSnapshot:
+    """One parsed scrape of the medal table. Stages must not modify df, they work on copies."""
+    df: DataFrame
+    fin_enquete: str
+
+
+@dataclass(frozen=True)
+class RankedResult:
+    """Every ranking computed from one snapshot, shared by the figure and the table."""
+    snapshot: MedalSnapshot
+    df_mj_ranked: DataFrame
+    rank_comparison: DataFrame
+    table: MedalTable = None
+
+
+class MedalPipeline:
+    """
+    Fetch the medal table once and rank it once
+
+    Parameters
+    ----------
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    fetch : callable
+       Returns the medal table and the time suffix, scrap_olympic_data by default.
+       A None medal table means that nothing changed since the last run.
+    """
+
+    def __init__(self, min_medals: int = MIN_MEDALS, fetch=None):
+        if fetch is None:
+            from scraper import scrap_olympic_data as fetch
+        self.min_medals = min_medals
+        self.fetch = fetch
+        self._fetched = False
+        self._snapshot = None
+        self._result = None
+
+    @property
+    def snapshot(self) -> MedalSnapshot:
+        """The parsed medal table, or None when the source reported no change"""
+        if not self._fetched:
+            df, suffix = self.fetch()
+            self._fetched = True
+            if df is not None:
+                if not verify_medal_sum(df):
+                    raise ValueError("Warning: Medal sum verification failed")
+                self._snapshot = MedalSnapshot(df=df, fin_enquete=suffix_to_fin_enquete(suffix))
+        return self._snapshot
+
+    @property
+    def result(self) -> RankedResult:
+        """The rankings of the snapshot, or None when the source reported no change"""
+        if self._result is None and self.snapshot is not None:
+            self._result = rank_snapshot(self.snapshot, self.min_medals)
+        return self._result
+
+
+def rank_snapshot(snapshot: MedalSnapshot, min_medals: int = MIN_MEDALS) -> RankedResult:
+    with span("rank.snapshot", rows=len(snapshot.df)):
+        df = filter_countries(snapshot.df, min_medals)
+        table = MedalTable.from_medals(df, snapshot.fin_enquete).rank_majority_judgment()
+        df_mj_ranked = table.to_mj_dataframe()
+        return RankedResult(
+            snapshot=snapshot,
+            df_mj_ranked=df_mj_ranked,
+            rank_comparison=create_rank_comparison(df, df_mj_ranked),
+            table=table,
+        )
@@ -1,7 +1,20 @@
+import base64
+import os
+from functools import lru_cache
+
+import numpy as np
 from pandas import DataFrame
 import plotly.graph_objects as go
 import plotly.express as px
 
+from tracing import span
+
+LOGO_PATH = os.path.dirname(os.path.abspath(__file__)) + '/../icons/logo.png'
+
+
+# prebuilt figures, keyed by everything that does not change from one snapshot to the next
+_figure_templates = {}
+
 
 def plot_merit_profiles_in_number(
     df: DataFrame,
@@ -16,6 +29,14 @@ def plot_merit_profiles_in_number(
     df = df.copy()
 
     nb_grades = len(grades)
+    intentions_colheaders = get_intentions_colheaders(df, nb_grades)
+
+    # the figure is built once, then each snapshot only patches its values and labels
+    key = (tuple(grades), auto_text, font_size)
+    with span("plot.merit_profile.template", cache="hit" if key in _figure_templates else "miss"):
+        if key not in _figure_templates:
+            _figure_templates[key] = _build_figure_template(df, grades, auto_text, font_size).to_dict()
+        fig = go.Figure(_figure_templates[key], _validate=False)
 
     # compute the list sorted of candidat names to order y axis.
     candidat_list = list(df["candidat"])
@@ -24,6 +45,71 @@ def plot_merit_profiles_in_number(
     r_sorted_candidat_list = sorted_candidat_list.copy()
     r_sorted_candidat_list.reverse()
 
+    candidats = df["candidat"].to_numpy()
+    with span("plot.merit_profile.traces", rows=len(df)):
+        for trace, colheader in zip(fig.data, intentions_colheaders):
+            trace.x = df[colheader].to_numpy()
+            trace.y = candidats
+
+    # vertical line
+    sum_of_intentions = df[intentions_colheaders].sum(axis=1).max()
+    fig.layout.shapes[0].x0 = sum_of_intentions / 2
+    fig.layout.shapes[0].x1 = sum_of_intentions / 2
+
+    # xticks and y ticks
+    # Add sans opinion to y tick label # todo : it may be simplified !
+    if show_no_opinion and not np.isnan(df["sans_opinion"].unique()[0]):
+        df["candidat_sans_opinion"] = None
+        for ii, cell in enumerate(df["candidat"]):
+            df["candidat_sans_opinion"].iat[ii] = (
+                "<b>" + cell + "</b>" + "     <br><i>(sans opinion " + str(df["sans_opinion"].iloc[ii]) + "%)</i>     "
+            )
+        # compute the list sorted of candidat names to order y axis.
+        candidat_list = list(df["candidat_sans_opinion"])
+        rank_list = list(df["rang"] - 1)
+        sorted_candidat_list = [i[1] for i in sorted(zip(rank_list, candidat_list))]
+        r_sorted_candidat_no_opinion_list = sorted_candidat_list.copy()
+        r_sorted_candidat_no_opinion_list.reverse()
+        yticktext = r_sorted_candidat_no_opinion_list
+    else:
+        yticktext = ["<b>" + s + "</b>" + "     " for s in r_sorted_candidat_list]
+
+    fig.layout.yaxis.tickvals = [i for i in range(len(df))]
+    fig.layout.yaxis.ticktext = yticktext
+    fig.layout.yaxis.categoryarray = r_sorted_candidat_list
+
+    # Title and detailed
+
+    date_str = f"date: {date}, " if date is not None else ""
+    source_str = f"source: {source}" if source is not None else ""
+    source_str += ", " if sponsor is not None else ""
+    sponsor_str = f"commanditaire: {sponsor}" if sponsor is not None else ""
+    title = "<b>Ranking with Majority Judgement</b> <br>" + f"<i>{date_str}{source_str}{sponsor_str}</i>"
+    fig.layout.title.text = title
+
+    return fig
+
+
+def _build_figure_template(df: DataFrame, grades: list, auto_text: bool, font_size: int) -> go.Figure:
+    """
+    Build the parts of the merit profile figure that do not depend on the snapshot
+
+    Parameters
+    ----------
+    df : DataFrame
+       DataFrame containing the surveys, only used to lay the traces out
+    grades : list
+       Grades of the candidates
+    auto_text : bool
+       Show the values on the bars
+    font_size : int
+       Font size of the values
+    Returns
+    -------
+    The figure, to be patched with the values, tick labels and title of a snapshot
+    """
+    nb_grades = len(grades)
+
     # colors = color_palette(palette="coolwarm", n_colors=nb_grades)
     # Gold, Silver, Bronze, No Medal
     colors_olympics = [(255, 215, 0), (192, 192, 192), (205, 127, 50), (139, 69, 19)]
@@ -50,9 +136,8 @@ def plot_merit_profiles_in_number(
         )
     )
 
-    # vertical line
-    sum_of_intentions = df[get_intentions_colheaders(df, nb_grades)].sum(axis=1).max()
-    fig.add_vline(x=sum_of_intentions/2, line_width=2, line_color="black")
+    # vertical line, moved to the middle of the merit profiles for each snapshot
+    fig.add_vline(x=0, line_width=2, line_color="black")
 
     # Legend
     fig.update_layout(
@@ -67,24 +152,6 @@ def plot_merit_profiles_in_number(
     # no background
     fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)")
 
-    # xticks and y ticks
-    # Add sans opinion to y tick label # todo : it may be simplified !
-    if show_no_opinion and not np.isnan(df["sans_opinion"].unique()[0]):
-        df["candidat_sans_opinion"] = None
-        for ii, cell in enumerate(df["candidat"]):
-            df["candidat_sans_opinion"].iat[ii] = (
-                "<b>" + cell + "</b>" + "     <br><i>(sans opinion " + str(df["sans_opinion"].iloc[ii]) + "%)</i>     "
-            )
-        # compute the list sorted of candidat names to order y axis.
-        candidat_list = list(df["candidat_sans_opinion"])
-        rank_list = list(df["rang"] - 1)
-        sorted_candidat_list = [i[1] for i in sorted(zip(rank_list, candidat_list))]
-        r_sorted_candidat_no_opinion_list = sorted_candidat_list.copy()
-        r_sorted_candidat_no_opinion_list.reverse()
-        yticktext = r_sorted_candidat_no_opinion_list
-    else:
-        yticktext = ["<b>" + s + "</b>" + "     " for s in r_sorted_candidat_list]
-
     # xticks and y ticks
     fig.update_layout(
         xaxis=dict(
@@ -97,21 +164,11 @@ def plot_merit_profiles_in_number(
             ticklabelposition="outside left",
             ticksuffix="   ",
             tickmode="array",
-            tickvals=[i for i in range(len(df))],
-            ticktext=yticktext,
             categoryorder="array",
-            categoryarray=r_sorted_candidat_list,
         ),  # space
     )
 
-    # Title and detailed
-
-    date_str = f"date: {date}, " if date is not None else ""
-    source_str = f"source: {source}" if source is not None else ""
-    source_str += ", " if sponsor is not None else ""
-    sponsor_str = f"commanditaire: {sponsor}" if sponsor is not None else ""
-    title = "<b>Ranking with Majority Judgement</b> <br>" + f"<i>{date_str}{source_str}{sponsor_str}</i>"
-    fig.update_layout(title=title, title_x=0.5)
+    fig.update_layout(title_x=0.5)
 
     # font family
     fig.update_layout(font_family="arial")
@@ -124,6 +181,13 @@ def plot_merit_profiles_in_number(
     return fig
 
 
+@lru_cache(maxsize=None)
+def _logo_data_uri() -> str:
+    # the logo is embedded in the figure, so rendering never needs the network
+    with open(LOGO_PATH, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
+
+
 def _add_image_to_fig(
     fig: go.Figure, x: float, y: float, sizex: float, sizey: float, xanchor: str = "left"
 ) -> go.Figure:
@@ -150,7 +214,7 @@ def _add_image_to_fig(
     """
     fig.add_layout_image(
         dict(
-            source="https://raw.githubusercontent.com/MieuxVoter/majority-judgment-tracker/main/icons/logo.svg",
+            source=_logo_data_uri(),
             xref="paper",
             yref="paper",
             x=x,
@@ -0,0 +1,162 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import MIN_MEDALS
+from ranking_functions import majority_judgment_ranks, lexicographic_ranks, total_medal_ranks
+
+# number of medal events of the Paris 2024 Olympic Games
+TOTAL_EVENTS = 329
+METHODS = ["mj", "lexico", "total"]
+
+
+def default_strengths(df: DataFrame, smoothing: float = 0.5) -> np.ndarray:
+    """Chance of each country to win each medal of an event, proportional to the medals it already won"""
+    medals = df[["Gold", "Silver", "Bronze"]].to_numpy(dtype=float) + smoothing
+    return medals / medals.sum(axis=0)
+
+
+def _rank_scenarios(medals: np.ndarray, min_medals: int) -> list:
+    """MJ, lexicographic and total ranks (from 1, 0 when not ranked) of a batch of final medal tables"""
+    total = medals.sum(axis=-1)
+    ranked = total >= min_medals
+    # countries below the threshold are left out, by ranking them behind every ranked country
+    medals = np.where(ranked[..., np.newaxis], medals, 0)
+    total = np.where(ranked, total, 0)
+
+    chocolate = total.max(axis=-1, keepdims=True) - total
+    counts = np.concatenate([medals, chocolate[..., np.newaxis]], axis=-1)
+    _, mj_rank, _ = majority_judgment_ranks(counts)
+
+    ranks = [mj_rank + 1, lexicographic_ranks(medals), total_medal_ranks(medals)]
+    return [np.where(ranked, rank, 0) for rank in ranks]
+
+
+def _simulate_shard(
+    medals: np.ndarray,
+    strengths: np.ndarray,
+    remaining_events: int,
+    nb_scenarios: int,
+    min_medals: int,
+    seed: np.random.SeedSequence,
+    chunk_size: int,
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    nb_countries = len(medals)
+    histogram = np.zeros((len(METHODS), nb_countries, nb_countries + 1), dtype=np.int64)
+    offsets = np.arange(nb_countries) * (nb_countries + 1)
+
+    for start in range(0, nb_scenarios, chunk_size):
+        size = min(chunk_size, nb_scenarios - start)
+        # every remaining event hands out one medal of each colour
+        won = np.stack(
+            [rng.multinomial(remaining_events, strengths[:, medal], size=size) for medal in range(3)],
+            axis=-1,
+        )
+        for m, rank in enumerate(_rank_scenarios(medals + won, min_medals)):
+            histogram[m] += np.bincount(
+                (rank + offsets).ravel(), minlength=nb_countries * (nb_countries + 1)
+            ).reshape(nb_countries, nb_countries + 1)
+    return histogram
+
+
+def project_final_ranks(
+    df: DataFrame,
+    remaining_events: int = None,
+    nb_scenarios: int = 100_000,
+    strengths=None,
+    min_medals: int = MIN_MEDALS,
+    seed: int = None,
+    max_workers: int = None,
+    chunk_size: int = 5_000,
+) -> DataFrame:
+    """
+    Monte Carlo projection of the final MJ, lexicographic and total ranks
+
+    Each scenario hands out the gold, silver and bronze medals of every remaining event at random,
+    following the strength of each country. Medals of one colour are drawn independently of the other
+    colours, so a country may win two medals of the same event.
+
+    Parameters
+    ----------
+    df : DataFrame
+       Current medal table, with Country, Gold, Silver and Bronze columns
+    remaining_events : int
+       Number of events still to be decided, TOTAL_EVENTS minus the gold medals already won by default
+    nb_scenarios : int
+       Number of simulated ends of the Games
+    strengths : array-like
+       Chance of each country to win a medal, of shape (n_countries,) or (n_countries, 3) for one
+       column per medal colour. default_strengths by default
+    min_medals : int
+       Minimum number of final medals for a country to be ranked
+    seed : int
+       Seed of the random generator
+    max_workers : int
+       Number of processes, all the cores by default
+    chunk_size : int
+       Number of scenarios ranked at once by a process
+    Returns
+    -------
+       One row per country and method, with the probability of each final rank ("1", "2", ...)
+       and of not being ranked ("unranked")
+    """
+    medals = df[["Gold", "Silver", "Bronze"]].to_numpy(dtype=np.int64)
+    nb_countries = len(medals)
+    if remaining_events is None:
+        remaining_events = max(0, TOTAL_EVENTS - int(medals[:, 0].sum()))
+
+    strengths = default_strengths(df) if strengths is None else np.asarray(strengths, dtype=float)
+    if strengths.ndim == 1:
+        strengths = np.repeat(strengths[:, np.newaxis], 3, axis=1)
+    strengths = strengths / strengths.sum(axis=0)
+
+    max_workers = max_workers or os.cpu_count()
+    shards = [len(shard) for shard in np.array_split(np.arange(nb_scenarios), max_workers) if len(shard)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        histograms = executor.map(
+            _simulate_shard,
+            *zip(*[
+                (medals, strengths, remaining_events, shard, min_medals, shard_seed, chunk_size)
+                for shard, shard_seed in zip(shards, seeds)
+            ]),
+        )
+        histogram = sum(histograms)
+
+    probabilities = histogram / nb_scenarios
+    columns = ["unranked"] + [str(rank) for rank in range(1, nb_countries + 1)]
+    projection = pd.concat(
+        [
+            pd.DataFrame(probabilities[m], columns=columns).assign(Country=df["Country"].to_numpy(), method=method)
+            for m, method in enumerate(METHODS)
+        ],
+        ignore_index=True,
+    )
+    return projection[["Country", "method"] + columns[1:] + ["unranked"]]
+
+
+if __name__ == "__main__":
+    from replay import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Project the final MJ, lexicographic and total ranks")
+    parser.add_argument("csv", help="medal table snapshot to start from")
+    parser.add_argument("--remaining-events", type=int, default=None)
+    parser.add_argument("--scenarios", type=int, default=100_000)
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    table = load_snapshot(args.csv)
+    projection = project_final_ranks(
+        table, args.remaining_events, args.scenarios, min_medals=args.min_medals, seed=args.seed,
+        max_workers=args.workers,
+    )
+    first = projection.pivot(index="Country", columns="method", values="1")[METHODS]
+    print("Probability of finishing first:")
+    print(first[(first > 0).any(axis=1)].sort_values("mj", ascending=False).to_string())
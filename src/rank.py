@@ -0,0 +1,181 @@
+"""
+Print the current MJ, lexicographic and total ranks as JSON, for cron and sidecar jobs
+
+Only the standard library and NumPy are imported: the medal table is read from the snapshot store,
+the HTTP cache of the scraper or a CSV file, and never fetched. pandas, plotly and requests are
+not loaded: the target is a cold start under 0.5 s (about 0.3 s here), where importing main.py
+alone takes over 1 s. tests/test_rank_imports.py keeps plotly out of this path.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from constants import GRADES, MIN_MEDALS, STORE_NAME, URL
+from flag_utils import country_label
+from http_cache import CACHE_PATH, cache_files
+from medal_stream import iter_medal_rows
+from ranking_functions import majority_judgment_ranks, lexicographic_ranks, total_medal_ranks
+
+PATH = os.path.dirname(os.path.abspath(__file__)) + '/../data'
+STORE_PATH = f'{PATH}/{STORE_NAME}'
+
+
+def read_store(path: str = STORE_PATH, taken_at: str = None):
+    """
+    (taken_at, [(org, gold, silver, bronze), ...]) of one snapshot of the store, None when there is none
+
+    Parameters
+    ----------
+    path : str
+       SQLite file of the snapshot store
+    taken_at : str
+       Time of the snapshot, as stored (see store_timestamps), the last snapshot by default
+    """
+    if not os.path.exists(path):
+        return None
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if taken_at is None:
+            taken_at = connection.execute("SELECT MAX(taken_at) FROM snapshot").fetchone()[0]
+        elif connection.execute("SELECT 1 FROM snapshot WHERE taken_at = ?", (taken_at,)).fetchone() is None:
+            taken_at = None
+        if taken_at is None:
+            return None
+        medals = connection.execute(
+            "SELECT n.code, SUM(d.gold), SUM(d.silver), SUM(d.bronze) "
+            "FROM medal_delta d JOIN snapshot s USING (snapshot_id) JOIN noc n USING (noc_id) "
+            "WHERE s.taken_at <= ? GROUP BY d.noc_id",
+            (taken_at,),
+        ).fetchall()
+    finally:
+        connection.close()
+    return taken_at, medals
+
+
+def store_timestamps(path: str = STORE_PATH) -> list:
+    """Times of every snapshot of the store, as stored, oldest first"""
+    if not os.path.exists(path):
+        return []
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return [row[0] for row in connection.execute("SELECT taken_at FROM snapshot ORDER BY taken_at")]
+    finally:
+        connection.close()
+
+
+def read_cache(url: str = URL, cache_dir: str = CACHE_PATH):
+    """(fetched_at, [(org, gold, silver, bronze), ...]) of the last body fetched by the scraper, None if any"""
+    _, body_file = cache_files(cache_dir, url)
+    if not os.path.exists(body_file):
+        return None
+    fetched_at = datetime.fromtimestamp(os.path.getmtime(body_file)).isoformat(sep=" ")
+    with open(body_file, "rb") as f:
+        medals = [
+            (row["organisation"]["code"] if "org" not in row else row["org"], row["gold"], row["silver"], row["bronze"])
+            for row in iter_medal_rows(iter(lambda: f.read(1 << 16), b""))
+        ]
+    return fetched_at, medals
+
+
+def read_csv(path: str):
+    """(file name, [(org, gold, silver, bronze), ...]) of a scraped or manual snapshot"""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    medals = [
+        (row["org"] if "org" in row else row["Country"].split(" ")[0], row["Gold"], row["Silver"], row["Bronze"])
+        for row in rows
+    ]
+    return os.path.basename(path), medals
+
+
+def rank_medals(medals: list, min_medals: int = MIN_MEDALS) -> list:
+    """
+    MJ, lexicographic and total ranks of a medal table
+
+    Parameters
+    ----------
+    medals : list
+       (org, gold, silver, bronze) of every country
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    Returns
+    -------
+       One dict per ranked country, sorted by MJ rank, ranks starting at 1
+    """
+    orgs = [str(row[0]) for row in medals]
+    counts = np.array([row[1:] for row in medals], dtype=np.int64).reshape(-1, 3)
+    total = counts.sum(axis=1)
+
+    # the table order of the scraper, that rank_lexicographically keeps for ties
+    kept = np.flatnonzero(total >= min_medals)
+    kept = kept[np.argsort(-total[kept], kind="stable")]
+    counts, total = counts[kept], total[kept]
+    if not len(kept):
+        return []
+
+    majority_grade, mj_rank, mj_order = majority_judgment_ranks(
+        np.column_stack([counts, total.max() - total])
+    )
+    lexico_rank = lexicographic_ranks(counts)
+    total_rank = total_medal_ranks(counts)
+    return [
+        {
+            "org": orgs[kept[i]],
+            "country": country_label(orgs[kept[i]]),
+            "gold": int(counts[i, 0]),
+            "silver": int(counts[i, 1]),
+            "bronze": int(counts[i, 2]),
+            "total": int(total[i]),
+            "rank_mj": int(mj_rank[i]) + 1,
+            "rank_lexico": int(lexico_rank[i]),
+            "rank_total": int(total_rank[i]),
+            "mention_majoritaire": GRADES[majority_grade[i]],
+        }
+        for i in mj_order
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Print the current MJ, lexicographic and total ranks as JSON")
+    parser.add_argument("--source", choices=["auto", "store", "cache", "csv"], default="auto",
+                        help="auto reads the store, then the HTTP cache")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--cache-dir", default=CACHE_PATH)
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--csv", default=None, help="snapshot to rank with --source csv")
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--indent", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.source == "csv":
+        if args.csv is None:
+            parser.error("--source csv needs --csv")
+        snapshot = read_csv(args.csv)
+    else:
+        snapshot = read_store(args.store) if args.source in ("auto", "store") else None
+        if snapshot is None and args.source in ("auto", "cache"):
+            snapshot = read_cache(args.url, args.cache_dir)
+    if snapshot is None:
+        print("No medal table in the store nor in the HTTP cache, run main.py or daemon.py first.",
+              file=sys.stderr)
+        return 1
+
+    taken_at, medals = snapshot
+    json.dump(
+        {"taken_at": taken_at, "min_medals": args.min_medals, "ranking": rank_medals(medals, args.min_medals)},
+        sys.stdout,
+        ensure_ascii=False,
+        indent=args.indent,
+    )
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
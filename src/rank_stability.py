@@ -0,0 +1,248 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import MIN_MEDALS
+from ranking_functions import majority_judgment_ranks
+
+PERTURBATIONS = ["bootstrap", "leave-one-out"]
+STABILITY_COLUMNS = ["Country", "Rank_MJ", "rank_median", "rank_low", "rank_high", "p_hold", "p_better", "p_worse"]
+
+
+def mj_ranks(medals: np.ndarray) -> np.ndarray:
+    """
+    Majority Judgment ranks of a batch of medal tables, as apply_majority_judgment ranks one table
+
+    Parameters
+    ----------
+    medals : np.ndarray
+       Gold, Silver and Bronze counts, of shape (n_countries, 3) or (n_tables, n_countries, 3)
+    Returns
+    -------
+       Ranks starting at 1, of shape (n_countries,) or (n_tables, n_countries)
+    """
+    # the chocolate medal fills every country up to the best total of its table
+    total = medals.sum(axis=-1)
+    chocolate = total.max(axis=-1, keepdims=True) - total
+    counts = np.concatenate([medals, chocolate[..., np.newaxis]], axis=-1)
+    _, rank, _ = majority_judgment_ranks(counts)
+    return rank + 1
+
+
+def _removed_medals(medals: np.ndarray) -> tuple:
+    """(country, medal colour) of every medal won, one perturbed table each"""
+    countries, colours = np.nonzero(medals > 0)
+    repeats = medals[countries, colours]
+    return np.repeat(countries, repeats), np.repeat(colours, repeats)
+
+
+def _perturbed_tables(medals: np.ndarray, perturbation: str, rng, start: int, size: int) -> np.ndarray:
+    if perturbation == "bootstrap":
+        # every country draws its medals again, with replacement, among the medals it won
+        total = medals.sum(axis=-1)
+        shares = medals / np.maximum(total, 1)[:, np.newaxis]
+        return rng.multinomial(total, shares, size=(size, len(medals)))
+    countries, colours = _removed_medals(medals)
+    tables = np.repeat(medals[np.newaxis], size, axis=0)
+    tables[np.arange(size), countries[start:start + size], colours[start:start + size]] -= 1
+    return tables
+
+
+def _rank_histogram_shard(
+    medals: np.ndarray,
+    perturbation: str,
+    start: int,
+    nb_tables: int,
+    seed: np.random.SeedSequence,
+    chunk_size: int,
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    nb_countries = len(medals)
+    histogram = np.zeros((nb_countries, nb_countries + 1), dtype=np.int64)
+    offsets = np.arange(nb_countries) * (nb_countries + 1)
+
+    # only the histogram of the ranks is kept, each chunk of perturbed tables is dropped once ranked
+    for chunk_start in range(start, start + nb_tables, chunk_size):
+        size = min(chunk_size, start + nb_tables - chunk_start)
+        rank = mj_ranks(_perturbed_tables(medals, perturbation, rng, chunk_start, size))
+        histogram += np.bincount(
+            (rank + offsets).ravel(), minlength=nb_countries * (nb_countries + 1)
+        ).reshape(nb_countries, nb_countries + 1)
+    return histogram
+
+
+def _quantile_ranks(cumulative: np.ndarray, level: float) -> np.ndarray:
+    # smallest rank whose cumulative probability reaches level
+    return np.argmax(cumulative >= level - 1e-12, axis=1)
+
+
+def rank_stability(
+    df: DataFrame,
+    perturbation: str = "bootstrap",
+    nb_replicates: int = 20_000,
+    min_medals: int = MIN_MEDALS,
+    confidence: float = 0.9,
+    seed: int = None,
+    max_workers: int = None,
+    chunk_size: int = 2_000,
+) -> DataFrame:
+    """
+    How fragile each Majority Judgment rank is to the medals near the median
+
+    Every perturbed medal table is ranked in batches and only the histogram of the ranks of each country
+    is kept, so the memory does not grow with the number of replicates.
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table with Country, Gold, Silver and Bronze columns
+    perturbation : str
+       "bootstrap": each country draws its medals again, with replacement, among the ones it won.
+       "leave-one-out": one table per medal won, without that medal.
+    nb_replicates : int
+       Number of bootstrap tables, leave-one-out ranks one table per medal won
+    min_medals : int
+       Minimum number of medals for a country to be ranked, the ranked countries stay the same in
+       every perturbed table
+    confidence : float
+       Probability of the rank intervals
+    seed : int
+       Seed of the random generator
+    max_workers : int
+       Number of processes, all the cores by default
+    chunk_size : int
+       Number of perturbed tables ranked at once by a process
+    Returns
+    -------
+       One row per ranked country, sorted by MJ rank: the rank of the table, the median rank and the
+       bounds of the rank interval of the perturbed tables, and the probability to hold, improve or
+       lose the rank of the table, no row when no country has min_medals
+    """
+    if perturbation not in PERTURBATIONS:
+        raise ValueError(f"Unknown perturbation {perturbation}, use one of {PERTURBATIONS}")
+    df = df[df["Total"] >= min_medals]
+    medals = df[["Gold", "Silver", "Bronze"]].to_numpy(dtype=np.int64)
+    nb_countries = len(medals)
+    if not nb_countries:
+        return pd.DataFrame(columns=STABILITY_COLUMNS)
+    if perturbation == "leave-one-out":
+        nb_replicates = len(_removed_medals(medals)[0])
+
+    max_workers = max_workers or os.cpu_count()
+    shards = [shard for shard in np.array_split(np.arange(nb_replicates), max_workers) if len(shard)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        histograms = executor.map(
+            _rank_histogram_shard,
+            *zip(*[
+                (medals, perturbation, int(shard[0]), len(shard), shard_seed, chunk_size)
+                for shard, shard_seed in zip(shards, seeds)
+            ]),
+        )
+        histogram = sum(histograms, np.zeros((nb_countries, nb_countries + 1), dtype=np.int64))
+
+    rank = mj_ranks(medals)
+    if not nb_replicates:
+        # no medal to leave out: the table is the only one, its ranks are certain
+        histogram[np.arange(nb_countries), rank] = 1
+    probabilities = histogram / max(1, nb_replicates)
+    cumulative = np.cumsum(probabilities, axis=1)
+    tail = (1 - confidence) / 2
+    stability = pd.DataFrame({
+        "Country": df["Country"].to_numpy(),
+        "Rank_MJ": rank,
+        "rank_median": _quantile_ranks(cumulative, 0.5),
+        "rank_low": _quantile_ranks(cumulative, tail),
+        "rank_high": _quantile_ranks(cumulative, 1 - tail),
+        "p_hold": probabilities[np.arange(nb_countries), rank],
+        "p_better": cumulative[np.arange(nb_countries), rank - 1],
+        "p_worse": 1 - cumulative[np.arange(nb_countries), rank],
+    })[STABILITY_COLUMNS]
+    return stability.sort_values("Rank_MJ", kind="stable", ignore_index=True)
+
+
+def add_rank_intervals(fig, stability: DataFrame, width: float = 0.2):
+    """
+    Draw the rank intervals as error bars in a panel on the right of a merit-profile figure
+
+    Parameters
+    ----------
+    fig : go.Figure
+       Figure of plot_merit_profiles_in_number, its countries being the ones of stability
+    stability : DataFrame
+       Result of rank_stability
+    width : float
+       Share of the figure width taken by the panel
+    Returns
+    -------
+       The figure, the merit profiles being narrowed to leave room for the panel
+    """
+    fig.update_layout(
+        xaxis=dict(domain=[0, 1 - width - 0.03]),
+        xaxis2=dict(
+            domain=[1 - width, 1],
+            anchor="y",
+            range=[stability["rank_high"].max() + 0.5, 0.5],
+            dtick=1 if len(stability) <= 15 else 5,
+            title="MJ rank",
+            showgrid=True,
+        ),
+    )
+    fig.add_scatter(
+        x=stability["Rank_MJ"],
+        y=stability["Country"],
+        xaxis="x2",
+        mode="markers",
+        marker=dict(color="black", size=8),
+        error_x=dict(
+            type="data",
+            symmetric=False,
+            array=stability["rank_high"] - stability["Rank_MJ"],
+            arrayminus=stability["Rank_MJ"] - stability["rank_low"],
+            thickness=2,
+            width=4,
+        ),
+        customdata=stability[["rank_low", "rank_high", "p_hold"]],
+        hovertemplate="%{y}: rank %{x}, between %{customdata[0]} and %{customdata[1]}<br>"
+                      "holds its rank %{customdata[2]:.0%} of the time<extra></extra>",
+        showlegend=False,
+    )
+    return fig
+
+
+if __name__ == "__main__":
+    from main import plot_merit_profiles
+    from pipeline import MedalSnapshot, rank_snapshot
+    from replay import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Rank intervals of the Majority Judgment ranking")
+    parser.add_argument("csv", help="medal table snapshot")
+    parser.add_argument("--perturbation", choices=PERTURBATIONS, default="bootstrap")
+    parser.add_argument("--replicates", type=int, default=20_000)
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--confidence", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="merit profiles with the rank intervals, .html or an image")
+    args = parser.parse_args()
+
+    table = load_snapshot(args.csv)
+    stability = rank_stability(
+        table, args.perturbation, args.replicates, args.min_medals, args.confidence, args.seed, args.workers,
+    )
+    print(stability.to_string(index=False))
+
+    if args.output:
+        result = rank_snapshot(MedalSnapshot(df=table, fin_enquete=os.path.basename(args.csv)), args.min_medals)
+        fig = plot_merit_profiles(
+            result.df_mj_ranked, result.table.source, result.table.fin_enquete, list(result.table.grades),
+        )
+        fig = add_rank_intervals(fig, stability)
+        if args.output.endswith(".html"):
+            fig.write_html(args.output)
+        else:
+            fig.write_image(args.output)
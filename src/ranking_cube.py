@@ -0,0 +1,123 @@
+import argparse
+
+import numpy as np
+from pandas import DataFrame
+
+from constants import GRADES
+from ranking_functions import majority_judgment_ranks, lexicographic_ranks, total_medal_ranks
+
+RANK_COLUMNS = {"mj": "Rank_MJ", "lexico": "Rank_Lexico", "total": "Rank_Total"}
+
+
+class RankingCube:
+    """
+    MJ, lexicographic and total rankings of every sport x gender slice of one scrape
+
+    Parameters
+    ----------
+    table : DataFrame
+       One row per sport, gender and country, with the medal counts, the three ranks (starting at 1)
+       and the majority grade, as built by build_ranking_cube
+    """
+
+    def __init__(self, table: DataFrame):
+        self.table = table
+        self._slices = {key: df for key, df in table.groupby(["sport", "gender"], sort=False)}
+
+    def slices(self) -> list:
+        """(sport, gender) of every slice of the cube"""
+        return sorted(self._slices)
+
+    def ranking(self, sport: str = "GLO", gender: str = "TOT", method: str = "mj") -> DataFrame:
+        """
+        Ranking of one slice
+
+        Parameters
+        ----------
+        sport : str
+           Sport code, GLO for every sport
+        gender : str
+           M, W, X, or TOT for every gender
+        method : str
+           mj, lexico or total, the method the rows are sorted by
+        Returns
+        -------
+           The countries of the slice, sorted by their rank with the chosen method
+        """
+        if (sport, gender) not in self._slices:
+            raise KeyError(f"No medal for sport {sport} and gender {gender}")
+        return self._slices[(sport, gender)].sort_values(RANK_COLUMNS[method], kind="stable")
+
+    def country(self, org: str) -> DataFrame:
+        """Ranks of one country in every slice where it won a medal"""
+        return self.table[self.table["org"] == org]
+
+
+def build_ranking_cube(df: DataFrame, min_medals: int = 1) -> RankingCube:
+    """
+    Rank every sport x gender slice of a medal table in one batched pass
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table with its sport and gender breakdown, see scraper.scrap_medal_breakdown
+    min_medals : int
+       Minimum number of medals in a slice for a country to be ranked in that slice
+    Returns
+    -------
+       The RankingCube of the table
+    """
+    return RankingCube(rank_groups(df[df["Total"] >= min_medals], ["sport", "gender"]))
+
+
+def rank_groups(df: DataFrame, by: list) -> DataFrame:
+    """
+    Rank every group of rows of a medal table on its own, in one batched pass
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table with Gold, Silver and Bronze, the countries of each group already filtered
+    by : list
+       Columns of the groups, e.g. ["sport", "gender"] or ["competition"]
+    Returns
+    -------
+       A copy of df with Rank_MJ, Rank_Lexico, Rank_Total (starting at 1 in each group) and mention_majoritaire
+    """
+    df = df.reset_index(drop=True)
+    if df.empty:
+        return df.assign(Rank_MJ=[], Rank_Lexico=[], Rank_Total=[], mention_majoritaire=[])
+
+    # one padded (slice x country x medal) array, padding rows have no medal at all
+    slice_id = df.groupby(by, sort=False).ngroup().to_numpy()
+    position = df.groupby(slice_id).cumcount().to_numpy()
+    medals = np.zeros((slice_id.max() + 1, position.max() + 1, 3), dtype=np.int64)
+    medals[slice_id, position] = df[["Gold", "Silver", "Bronze"]].to_numpy()
+
+    # the chocolate medal fills every country up to the best total of its slice
+    total = medals.sum(axis=-1)
+    chocolate = total.max(axis=1, keepdims=True) - total
+    counts = np.concatenate([medals, chocolate[..., np.newaxis]], axis=-1)
+
+    majority_grade, mj_rank, _ = majority_judgment_ranks(counts)
+    df["Rank_MJ"] = mj_rank[slice_id, position] + 1
+    df["Rank_Lexico"] = lexicographic_ranks(medals)[slice_id, position]
+    df["Rank_Total"] = total_medal_ranks(medals)[slice_id, position]
+    df["mention_majoritaire"] = np.asarray(GRADES, dtype=object)[majority_grade[slice_id, position]]
+    return df
+
+
+if __name__ == "__main__":
+    from scraper import scrap_medal_breakdown
+
+    parser = argparse.ArgumentParser(description="Rank every sport x gender slice of the medal table")
+    parser.add_argument("--sport", default="GLO")
+    parser.add_argument("--gender", default="TOT")
+    parser.add_argument("--method", choices=sorted(RANK_COLUMNS), default="mj")
+    parser.add_argument("--min-medals", type=int, default=1)
+    args = parser.parse_args()
+
+    cube = build_ranking_cube(scrap_medal_breakdown(), args.min_medals)
+    columns = ["Country", "Gold", "Silver", "Bronze", "Total", "Rank_MJ", "Rank_Lexico", "Rank_Total",
+               "mention_majoritaire"]
+    print(cube.ranking(args.sport, args.gender, args.method)[columns].to_string(index=False))
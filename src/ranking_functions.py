@@ -1,21 +1,265 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
 import numpy as np
 
-from mjtracker.interface_mj import apply_mj
-from pandas import DataFrame
+from tracing import span
+
+# pandas is only needed by the DataFrame functions, the array functions run without importing it
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+# Upper bound on the number of tables sorted at once by majority_judgment_ranks
+_MAX_TABLES_PER_CHUNK = 1 << 14
 
 
 # Function to compute rank based on the number of medals
-def rank_by_total_medals(df) -> DataFrame:
-    df['Rank_Total'] = df['Total'].rank(method='min', ascending=False).astype(int)
-    return df.sort_values(by='Rank_Total')
+def rank_by_total_medals(df) -> "DataFrame":
+    with span("rank.total", rows=len(df)):
+        df['Rank_Total'] = df['Total'].rank(method='min', ascending=False).astype(int)
+        return df.sort_values(by='Rank_Total')
 
 
 # Function to compute rank based on lexicographic order (gold > silver > bronze)
-def rank_lexicographically(df) -> DataFrame:
-    df = df.sort_values(by=['Gold', 'Silver', 'Bronze'], ascending=False)
-    df["Rank_Lexico"] = np.linspace(1, len(df), len(df), dtype=int)
-    return df.sort_values(by='Rank_Lexico')
+def rank_lexicographically(df) -> "DataFrame":
+    with span("rank.lexico", rows=len(df)):
+        df = df.sort_values(by=['Gold', 'Silver', 'Bronze'], ascending=False)
+        df["Rank_Lexico"] = np.linspace(1, len(df), len(df), dtype=int)
+        return df.sort_values(by='Rank_Lexico')
+
+
+def _ranks_from_order(keys, order, ties: bool) -> np.ndarray:
+    # turn a best-first order into ranks starting at 1, equal keys sharing the best rank when ties is True
+    nb_candidates = keys.shape[-1]
+    positions = np.broadcast_to(np.arange(nb_candidates), keys.shape)
+    if ties:
+        sorted_keys = np.take_along_axis(keys, order, axis=-1)
+        new_group = np.ones(keys.shape, dtype=bool)
+        new_group[..., 1:] = sorted_keys[..., 1:] != sorted_keys[..., :-1]
+        positions = np.maximum.accumulate(np.where(new_group, positions, 0), axis=-1)
+    rank = np.empty(keys.shape, dtype=np.intp)
+    np.put_along_axis(rank, order, positions + 1, axis=-1)
+    return rank
+
+
+def total_medal_ranks(medals) -> np.ndarray:
+    """
+    Vectorized rank_by_total_medals
+
+    Parameters
+    ----------
+    medals : array-like of int
+       Gold, Silver and Bronze counts, of shape (..., n_countries, 3)
+    Returns
+    -------
+       Ranks starting at 1, of shape (..., n_countries), equal totals sharing the best rank
+    """
+    total = np.asarray(medals).sum(axis=-1)
+    order = np.argsort(-total, axis=-1, kind="stable")
+    return _ranks_from_order(total, order, ties=True)
+
+
+def lexicographic_ranks(medals) -> np.ndarray:
+    """
+    Vectorized rank_lexicographically: gold, then silver, then bronze, ties kept in input order
+
+    Parameters
+    ----------
+    medals : array-like of int
+       Gold, Silver and Bronze counts, of shape (..., n_countries, 3)
+    Returns
+    -------
+       Ranks from 1 to n_countries, of shape (..., n_countries)
+    """
+    medals = np.asarray(medals, dtype=np.int64)
+    base = int(medals.max(initial=0)) + 1
+    key = (medals[..., 0] * base + medals[..., 1]) * base + medals[..., 2]
+    order = np.argsort(-key, axis=-1, kind="stable")
+    return _ranks_from_order(key, order, ties=False)
+
+
+@lru_cache(maxsize=None)
+def _majority_value_steps(nb_votes: int) -> np.ndarray:
+    """
+    Step at which each position of the sorted ballots is picked as majority value
+
+    Majority Judgment breaks ties by removing the (lower) median ballot and taking the median of
+    what is left, again and again. When every candidate has the same number of ballots, the
+    positions visited only depend on that number, so they are computed once. The extra last item
+    (nb_votes) stands for "never".
+    """
+    remaining = list(range(nb_votes))
+    steps = np.full(nb_votes + 1, nb_votes, dtype=np.int64)
+    for step in range(nb_votes):
+        steps[remaining.pop((len(remaining) - 1) // 2)] = step
+    return steps
+
+
+def _count_array(counts) -> np.ndarray:
+    # signed integer counts, e.g. the int32 MedalTable.counts, are read without a copy, the others become int64
+    counts = np.asarray(counts)
+    if counts.dtype.kind != "i":
+        counts = counts.astype(np.int64)
+    return counts
+
+
+def majority_judgment_keys(counts: np.ndarray) -> np.ndarray:
+    """
+    Keys of shape (..., n_grades) whose lexicographic order is the Majority Judgment order
+
+    The sequence of majority values of a candidate starts at its majority grade, and only changes when
+    it crosses one of the n_grades - 1 boundaries between grades: going down when the lower side of the
+    sorted ballots reaches a worse grade, going up when the upper side reaches a better one. The key
+    holds the majority grade, then each crossing in step order, scored so that an earlier rise beats a
+    later one, which beats no change, which beats a later drop, which beats an earlier one.
+
+    Parameters
+    ----------
+    counts : array-like of int
+       Merit profiles of shape (..., n_candidates, n_grades), grades ordered from the best one to the
+       worst one. Every candidate must have the same number of ballots.
+    Returns
+    -------
+       Keys of shape (..., n_candidates, n_grades), the greater the better. The first item is the
+       majority grade counted from the worst grade.
+    """
+    counts = _count_array(counts)
+    nb_grades = counts.shape[-1]
+    nb_votes = int(counts[..., 0, :].sum(axis=-1).max(initial=0)) if counts.size else 0
+    steps = _majority_value_steps(nb_votes)
+
+    # boundaries between grades, as positions in the ballots sorted from the worst grade
+    bounds = np.cumsum(counts[..., ::-1], axis=-1)[..., :-1]
+    median = max(0, (nb_votes - 1) // 2)
+    majority_value = (bounds <= median).sum(axis=-1)
+
+    rising = bounds > median
+    crossing = np.where(rising, steps[bounds], steps[np.maximum(bounds - 1, 0)])
+    crossing = np.where(rising | (bounds > 0), crossing, nb_votes)
+    sign = np.where(rising, 1, -1)
+
+    event_order = np.argsort(crossing, axis=-1, kind="stable")
+    crossing = np.take_along_axis(crossing, event_order, axis=-1)
+    sign = np.take_along_axis(sign, event_order, axis=-1)
+    happens = crossing < nb_votes
+    value = majority_value[..., np.newaxis] + np.cumsum(np.where(happens, sign, 0), axis=-1)
+
+    no_change = (nb_votes + 1) * nb_grades
+    score = np.where(
+        sign > 0,
+        2 * no_change + (nb_votes - crossing) * nb_grades + value,
+        crossing * nb_grades + value,
+    )
+    score = np.where(happens, score, no_change)
+    return np.concatenate([majority_value[..., np.newaxis], score], axis=-1)
+
+
+def majority_judgment_ranks(counts) -> tuple:
+    """
+    Rank candidates with Majority Judgment from their merit profiles, in one vectorized pass
+
+    Parameters
+    ----------
+    counts : array-like of int
+       Merit profiles of shape (n_candidates, n_grades), or (n_tables, n_candidates, n_grades)
+       for a batch of independent tables. Grades are ordered from the best one to the worst one
+       (Gold, Silver, Bronze, Chocolate), as in apply_mj(..., reversed=True).
+       Within a table, every candidate must have the same number of ballots. Signed integer
+       arrays, e.g. int32, are ranked without being copied.
+    Returns
+    -------
+    majority_grade : np.ndarray
+       Index of the majority grade (lower median) of each candidate, 0 being the best grade
+    rank : np.ndarray
+       Rank of each candidate, starting at 0; candidates with identical profiles share a rank
+    order : np.ndarray
+       Candidate indices sorted from the winner to the last one (tie-break order)
+    """
+    counts = _count_array(counts)
+    if counts.ndim not in (2, 3):
+        raise ValueError(f"counts must have 2 or 3 dimensions, got shape {counts.shape}")
+    batched = counts.ndim == 3
+    if not batched:
+        counts = counts[np.newaxis]
+    if (counts < 0).any():
+        raise ValueError("counts must be non-negative")
+
+    nb_tables, nb_candidates, nb_grades = counts.shape
+    nb_votes = counts.sum(axis=-1)
+    if (nb_votes != nb_votes[:, :1]).any():
+        raise ValueError("All candidates of a table must have the same number of ballots")
+
+    majority_grade = np.zeros((nb_tables, nb_candidates), dtype=np.intp)
+    rank = np.zeros((nb_tables, nb_candidates), dtype=np.intp)
+    order = np.zeros((nb_tables, nb_candidates), dtype=np.intp)
+
+    # the steps of the majority values depend on the number of ballots, tables are grouped by it
+    table_votes = nb_votes[:, 0] if nb_candidates else np.zeros(nb_tables, dtype=np.int64)
+    with span("rank.mj", rows=nb_tables * nb_candidates, tables=nb_tables):
+        for votes in np.unique(table_votes):
+            tables = np.flatnonzero(table_votes == votes)
+            for start in range(0, len(tables), _MAX_TABLES_PER_CHUNK):
+                chunk = tables[start:start + _MAX_TABLES_PER_CHUNK]
+                # consecutive tables, e.g. the only table of a snapshot, are read through a view
+                consecutive = chunk[-1] - chunk[0] == len(chunk) - 1
+                keys = majority_judgment_keys(counts[chunk[0]:chunk[-1] + 1] if consecutive else counts[chunk])
+                majority_grade[chunk] = nb_grades - 1 - keys[..., 0]
+                order[chunk], rank[chunk] = _sort_keys(keys)
+
+    if not batched:
+        return majority_grade[0], rank[0], order[0]
+    return majority_grade, rank, order
+
+
+def _sort_keys(keys: np.ndarray) -> tuple:
+    """Best-first order and ranks from 0 (equal keys sharing a rank) of (tables, candidates, key) arrays"""
+    nb_tables, nb_candidates, key_size = keys.shape
+
+    # best candidates first, tables kept apart by their index
+    flat_keys = keys.reshape(-1, key_size)
+    table_index = np.repeat(np.arange(nb_tables), nb_candidates)
+    sort_keys = [-flat_keys[:, k] for k in range(key_size - 1, -1, -1)] + [table_index]
+    order = np.lexsort(sort_keys).reshape(nb_tables, nb_candidates) % max(1, nb_candidates)
+
+    sorted_keys = np.take_along_axis(keys, order[..., np.newaxis], axis=1)
+    new_group = np.ones((nb_tables, nb_candidates), dtype=bool)
+    new_group[:, 1:] = (sorted_keys[:, 1:] != sorted_keys[:, :-1]).any(axis=-1)
+    sorted_rank = np.maximum.accumulate(np.where(new_group, np.arange(nb_candidates), 0), axis=1)
+
+    rank = np.empty_like(sorted_rank)
+    np.put_along_axis(rank, order, sorted_rank, axis=1)
+    return order, rank
+
+
+def apply_majority_judgment(df_mj, use_mjtracker: bool = False) -> "DataFrame":
+    """
+    Add the Majority Judgment rank ("rang", starting at 0) and majority grade ("mention_majoritaire")
+
+    Parameters
+    ----------
+    df_mj : DataFrame
+       DataFrame built by create_mj_dataframe
+    use_mjtracker : bool
+       Rank with mjtracker.interface_mj.apply_mj instead of the built-in NumPy engine
+    Returns
+    -------
+       The DataFrame with the rank and the majority grade of each candidate
+    """
+    if use_mjtracker:
+        from mjtracker.interface_mj import apply_mj
+
+        with span("rank.apply_mj", rows=len(df_mj), engine="mjtracker"):
+            return apply_mj(df_mj, rolling_mj=False, official_lib=True, reversed=True)
 
+    df_mj = df_mj.copy()
+    df_mj["rang"] = 0
+    df_mj["mention_majoritaire"] = None
+    for _, df_survey in df_mj.groupby("id", sort=False):
+        nb_grades = int(df_survey["nombre_mentions"].iloc[0])
+        grades = [df_survey[f"mention_{i}"].iloc[0] for i in range(1, nb_grades + 1)]
+        counts = df_survey[[f"intention_mention_{i}" for i in range(1, nb_grades + 1)]].to_numpy(dtype=np.int64)
 
-def apply_majority_judgment(df_mj) -> DataFrame:
-    return apply_mj(df_mj, rolling_mj=False, official_lib=True, reversed=True)
\ No newline at end of file
+        majority_grade, rank, _ = majority_judgment_ranks(counts)
+        df_mj.loc[df_survey.index, "rang"] = rank
+        df_mj.loc[df_survey.index, "mention_majoritaire"] = np.asarray(grades, dtype=object)[majority_grade]
+    return df_mj
@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from constants import MIN_MEDALS
+from rank import STORE_PATH, rank_medals, read_store, store_timestamps
+
+OUTPATH = os.path.dirname(os.path.abspath(__file__)) + '/../figures'
+FIGURE_TYPES = {".png": "image/png", ".pdf": "application/pdf", ".svg": "image/svg+xml"}
+
+
+@dataclass(frozen=True)
+class Response:
+    """Encoded body of a response, computed once and served as is"""
+    body: bytes
+    etag: str
+    content_type: str = "application/json"
+
+
+def make_response(body: bytes, content_type: str = "application/json") -> Response:
+    return Response(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', content_type=content_type)
+
+
+def json_response(payload) -> Response:
+    return make_response(json.dumps(payload, ensure_ascii=False).encode())
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of responses"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+            return response
+
+    def put(self, key, response: Response):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RankingService:
+    """
+    Latest and historical rankings of the snapshot store, and the exported figures, as HTTP responses
+
+    The responses of the last snapshot are computed when it is ingested, so that serving them is a
+    dictionary lookup. Historical rankings and figures are computed on the first request and kept in
+    an LRU cache.
+
+    Parameters
+    ----------
+    store_path : str
+       SQLite file of the snapshot store
+    figures_dir : str
+       Directory of the figures written by main.py or daemon.py
+    min_medals : int
+       Minimum number of medals for a country to be ranked, when the request does not give one
+    cache_size : int
+       Number of responses kept in the LRU cache
+    """
+
+    def __init__(self, store_path: str = STORE_PATH, figures_dir: str = OUTPATH, min_medals: int = MIN_MEDALS,
+                 cache_size: int = 256):
+        self.store_path = store_path
+        self.figures_dir = figures_dir
+        self.min_medals = min_medals
+        self.cache = ResponseCache(cache_size)
+        self.taken_at = None
+        self._latest = {}
+        self._snapshots = json_response([])
+        self._stop = threading.Event()
+
+    def ingest(self) -> bool:
+        """Precompute the responses of the last snapshot of the store, returns True when it is a new one"""
+        timestamps = store_timestamps(self.store_path)
+        if not timestamps or timestamps[-1] == self.taken_at:
+            return False
+        self._snapshots = json_response(timestamps)
+        self._latest = {self.min_medals: self._ranking_response(timestamps[-1], self.min_medals)}
+        self.taken_at = timestamps[-1]
+        return True
+
+    def _ranking_response(self, taken_at: str, min_medals: int):
+        key = ("ranking", taken_at, min_medals)
+        response = self.cache.get(key)
+        if response is None:
+            snapshot = read_store(self.store_path, taken_at)
+            if snapshot is None:
+                return None
+            response = json_response(
+                {"taken_at": snapshot[0], "min_medals": min_medals, "ranking": rank_medals(snapshot[1], min_medals)}
+            )
+            self.cache.put(key, response)
+        return response
+
+    def ranking(self, taken_at: str = None, min_medals: int = None):
+        """Response of the ranking of one snapshot, the last one by default, None when there is no such snapshot"""
+        min_medals = self.min_medals if min_medals is None else min_medals
+        if taken_at is None or taken_at == self.taken_at:
+            if min_medals in self._latest:
+                return self._latest[min_medals]
+            taken_at = self.taken_at
+        if taken_at is None:
+            return None
+        return self._ranking_response(taken_at, min_medals)
+
+    def snapshots(self) -> Response:
+        return self._snapshots
+
+    def figure(self, name: str):
+        """Response of one exported figure, None when it does not exist"""
+        name = os.path.basename(name)
+        content_type = FIGURE_TYPES.get(os.path.splitext(name)[1])
+        path = os.path.join(self.figures_dir, name)
+        if content_type is None or not os.path.isfile(path):
+            return None
+        # the modification time is part of the key, so that a new export is served at once
+        key = ("figure", name, os.stat(path).st_mtime_ns)
+        response = self.cache.get(key)
+        if response is None:
+            with open(path, "rb") as f:
+                response = make_response(f.read(), content_type)
+            self.cache.put(key, response)
+        return response
+
+    def figures(self) -> Response:
+        names = sorted(
+            name for name in os.listdir(self.figures_dir) if os.path.splitext(name)[1] in FIGURE_TYPES
+        ) if os.path.isdir(self.figures_dir) else []
+        return json_response(names)
+
+    def watch(self, interval: float = 5.0) -> threading.Thread:
+        """Ingest every new snapshot of the store, from a background thread"""
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    if self.ingest():
+                        print(f"Ingested the snapshot of {self.taken_at}")
+                except Exception as err:
+                    # keep serving the last ingested snapshot
+                    print(f"Ingestion failed: {err}")
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def route(self, path: str):
+        """Response of a GET request, None for a 404"""
+        url = urlsplit(path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        query = parse_qs(url.query)
+        min_medals = int(query["min_medals"][0]) if "min_medals" in query else None
+
+        if parts == ["rankings"] or parts == ["rankings", "latest"]:
+            return self.ranking(query.get("at", [None])[0], min_medals)
+        if len(parts) == 2 and parts[0] == "rankings":
+            return self.ranking(parts[1], min_medals)
+        if parts == ["snapshots"]:
+            return self.snapshots()
+        if parts == ["figures"]:
+            return self.figures()
+        if len(parts) == 2 and parts[0] == "figures":
+            return self.figure(parts[1])
+        return None
+
+
+def make_handler(service: RankingService):
+    class RankingHandler(BaseHTTPRequestHandler):
+        # keep-alive connections, the benchmark client and most browsers reuse them
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, without TCP_NODELAY each response waits for a delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            try:
+                response = service.route(self.path)
+            except ValueError:
+                return self._send_error(400, b'{"error": "bad request"}')
+            if response is None:
+                return self._send_error(404, b'{"error": "not found"}')
+
+            if self.headers.get("If-None-Match") == response.etag:
+                self.send_response(304)
+                self.send_header("ETag", response.etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", response.content_type)
+            self.send_header("Content-Length", str(len(response.body)))
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(response.body)
+
+        def _send_error(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # one line per request would cost more than serving it
+            pass
+
+    return RankingHandler
+
+
+def serve(service: RankingService, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """Start the HTTP server of a service, call serve_forever() on the returned server"""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the rankings of the snapshot store over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--figures-dir", default=OUTPATH)
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--cache-size", type=int, default=256)
+    parser.add_argument("--watch-interval", type=float, default=5.0, help="seconds between two store checks")
+    args = parser.parse_args()
+
+    ranking_service = RankingService(args.store, args.figures_dir, args.min_medals, args.cache_size)
+    ranking_service.ingest()
+    ranking_service.watch(args.watch_interval)
+    http_server = serve(ranking_service, args.host, args.port)
+    print(f"Serving the rankings of {args.store} on http://{args.host}:{http_server.server_port}")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ranking_service.stop()
+        http_server.server_close()
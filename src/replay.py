@@ -0,0 +1,132 @@
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from noc_registry import REGISTRY
+from pipeline import MedalSnapshot, MIN_MEDALS, rank_snapshot
+
+PATH = os.path.dirname(os.path.abspath(__file__)) + '/../data'
+SNAPSHOT_GLOBS = ["medal_data_*.csv", "Cleaned_Manual_Olympic_Medal_Count*.csv"]
+# hour given to the snapshots only labelled "matin" (morning)
+MORNING_HOUR = 8
+
+TIMELINE_COLUMNS = [
+    "timestamp", "noc_id", "org", "Country", "Gold", "Silver", "Bronze", "Total",
+    "Rank_MJ", "Rank_Lexico", "Rank_Total", "mention_majoritaire",
+]
+
+
+def parse_snapshot_time(filename: str):
+    """
+    Read the timestamp of a snapshot from its file name
+
+    The data folder mixes "20240801_13h", "20240731_matin" and "2024-08-01 19:57:55.151029".
+    Returns None when the file name holds no timestamp.
+    """
+    name = os.path.basename(filename)
+    match = re.search(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?)", name)
+    if match:
+        return datetime.fromisoformat(match[1])
+    match = re.search(r"(\d{8})_(\d{2})h", name)
+    if match:
+        return datetime.strptime(match[1] + match[2], "%Y%m%d%H")
+    match = re.search(r"(\d{8})_matin", name)
+    if match:
+        return datetime.strptime(match[1], "%Y%m%d").replace(hour=MORNING_HOUR)
+    return None
+
+
+def discover_snapshots(data_dir: str = PATH) -> list:
+    """Sorted list of (timestamp, path) of every dated snapshot of the data folder"""
+    snapshots = []
+    for pattern in SNAPSHOT_GLOBS:
+        for path in glob.glob(os.path.join(glob.escape(data_dir), pattern)):
+            timestamp = parse_snapshot_time(path)
+            if timestamp is None:
+                print(f"Skipping {os.path.basename(path)}: no timestamp in the file name")
+                continue
+            snapshots.append((timestamp, path))
+    return sorted(snapshots)
+
+
+def load_snapshot(path: str) -> pd.DataFrame:
+    """Read a scraped or manual snapshot into the columns used by the rankings"""
+    df = pd.read_csv(path)
+    # manual snapshots only have the NOC code in "Country"
+    org = df["org"] if "org" in df.columns else df["Country"]
+    noc_ids = REGISTRY.ids(org)
+    df = pd.DataFrame({
+        "noc_id": noc_ids,
+        "org": REGISTRY.codes(noc_ids),
+        "Gold": df["Gold"].astype(int),
+        "Silver": df["Silver"].astype(int),
+        "Bronze": df["Bronze"].astype(int),
+    })
+    df["Country"] = REGISTRY.labels(noc_ids)
+    df["Total"] = df["Gold"] + df["Silver"] + df["Bronze"]
+    return df.sort_values(by=["Total"], ascending=False)
+
+
+def rank_snapshot_file(timestamp: datetime, path: str, min_medals: int = MIN_MEDALS) -> pd.DataFrame:
+    df = load_snapshot(path)
+    if (df["Total"] < min_medals).all():
+        return pd.DataFrame(columns=TIMELINE_COLUMNS)
+
+    result = rank_snapshot(MedalSnapshot(df=df, fin_enquete=timestamp.strftime("%Y-%m-%d %H:%M")), min_medals)
+    timeline = result.rank_comparison.copy()
+    timeline["timestamp"] = timestamp
+    return timeline[TIMELINE_COLUMNS]
+
+
+def replay(data_dir: str = PATH, min_medals: int = MIN_MEDALS, max_workers: int = None) -> pd.DataFrame:
+    """
+    Rank every historical snapshot of the data folder, in a process pool
+
+    Parameters
+    ----------
+    data_dir : str
+       Folder holding the snapshots
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    max_workers : int
+       Number of processes, all the cores by default
+    Returns
+    -------
+       Tidy DataFrame with one row per country and timestamp, holding the MJ, lexicographic and total
+       ranks and the majority grade
+    """
+    snapshots = discover_snapshots(data_dir)
+    if not snapshots:
+        return pd.DataFrame(columns=TIMELINE_COLUMNS)
+
+    timestamps, paths = zip(*snapshots)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        timelines = list(executor.map(rank_snapshot_file, timestamps, paths, [min_medals] * len(paths)))
+
+    timelines = [timeline for timeline in timelines if len(timeline)]
+    if not timelines:
+        return pd.DataFrame(columns=TIMELINE_COLUMNS)
+    timeline = pd.concat(timelines, ignore_index=True)
+    # codes unknown to the registry get their ids in each worker, they are given the ids of this process
+    timeline["noc_id"] = REGISTRY.ids(timeline["org"])
+    return timeline.sort_values(["timestamp", "Rank_MJ"], ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank every historical medal snapshot of the data folder")
+    parser.add_argument("--data-dir", default=PATH)
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--output", default=None, help="CSV file to write the timeline to")
+    args = parser.parse_args()
+
+    timeline = replay(args.data_dir, args.min_medals, args.workers)
+    if args.output:
+        timeline.to_csv(args.output, index=False)
+    else:
+        print(timeline.to_string(index=False))
@@ -1,25 +1,46 @@
-from wave import Error
+import hashlib
+from contextlib import contextmanager
+from functools import partial
 
+import numpy as np
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
-from flag_utils import country_acronym_to_flag
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from urllib3.util.request import ACCEPT_ENCODING
+from constants import URL
+from http_cache import CACHE_PATH, cache_files, read_cache_meta, write_cache_meta
+from medal_stream import (
+    OVERALL_GENDERS, OVERALL_SPORTS, COUNT_FIELDS, iter_medal_rows, medal_columns
+)
+from noc_registry import REGISTRY
+from snapshot_store import SnapshotStore, STORE_NAME
+import tracing
+from tracing import span
 import os
 
 PATH = os.path.dirname(os.path.abspath(__file__)) + '/../data'
+PARIS = ZoneInfo('Europe/Paris')
+USER_AGENT = 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:15.0) Gecko/20100101 Firefox/15.0.1'
+CHUNK_SIZE = 1 << 16
 
+_session = None
+
+
+def get_session() -> requests.Session:
+    # one session per process, so that the connection is kept alive between polls
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        # gzip and deflate, and br / zstd when urllib3 can decode them
+        _session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+    return _session
 
-def scrap_olympic_data():
-    # Step 1: Fetch the JSON data from the URL
-    url = "https://olympics.com/OG2024/data/CIS_MedalNOCs~lang=ENG~comp=OG2024.json"
-    session = requests.Session()
-    session.headers.update(
-        {'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:15.0) Gecko/20100101 Firefox/15.0.1'})
 
+@contextmanager
+def _request_errors():
     try:
-        response = session.get(url, timeout=80)
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx and 5xx)
-        data = response.json()       # Parse JSON if request was successful
+        yield
     except requests.exceptions.HTTPError as errh:
         raise RuntimeError("HTTP Error:", errh)
     except requests.exceptions.ConnectionError as errc:
@@ -29,45 +50,205 @@ def scrap_olympic_data():
     except requests.exceptions.RequestException as err:
         raise RuntimeError("Something went wrong with the request:", err)
 
-    # Step 2: Parse the JSON data
-    # The relevant part of the JSON is under the key 'medalNOC'
-    medal_data = data['medalNOC']
 
-    # Step 3: Create a DataFrame from the parsed data
-    df = pd.DataFrame(medal_data)
+def _conditional_headers(cache_dir: str, url: str) -> dict:
+    _, body_file = cache_files(cache_dir, url)
+    meta = read_cache_meta(cache_dir, url)
+    headers = {}
+    if os.path.exists(body_file):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+def _update_cache_meta(cache_dir: str, url: str, response: requests.Response):
+    meta = read_cache_meta(cache_dir, url)
+    meta.update(
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+    write_cache_meta(cache_dir, url, meta)
+
+
+def _default_slices(breakdown: bool, sports, genders):
+    # the overall (GLO, TOT) rows, or every row of the breakdown, unless slices are requested
+    if breakdown:
+        return sports, genders
+    return OVERALL_SPORTS if sports is None else sports, OVERALL_GENDERS if genders is None else genders
+
+
+def _copy_chunks(chunks, f, counter: list):
+    for chunk in chunks:
+        f.write(chunk)
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def fetch_medal_table(
+    url: str = URL, cache_dir: str = CACHE_PATH, breakdown: bool = False, sports=None, genders=None, session=None
+) -> pd.DataFrame:
+    """
+    Fetch the medal table, parsing the body while it is downloaded
+
+    The body is requested compressed and streamed: only the rows of the requested slices are
+    decoded into typed columns, while the whole body is written to the HTTP cache. A 304 Not
+    Modified answer streams the cached body the same way.
+
+    Parameters
+    ----------
+    url : str
+       URL of the CIS_MedalNOCs endpoint
+    cache_dir : str
+       Directory where the last body and its ETag / Last-Modified headers are kept
+    breakdown : bool
+       Keep every sport and gender row, with their "sport" and "gender" columns, see _medal_frame
+    sports : sequence of str
+       Sports to keep, e.g. ["GLO"] or ["ATH", "SWM"], GLO by default and every sport with breakdown
+    genders : sequence of str
+       Genders to keep, e.g. ["TOT"] or ["W", "M"], TOT by default and every gender with breakdown
+    session :
+       Object with the get method of requests.Session, e.g. a sources.PooledClient, get_session() by default
+    Returns
+    -------
+       The medal table sorted by total amount of medals
+    """
+    _, body_file = cache_files(cache_dir, url)
+    sports, genders = _default_slices(breakdown, sports, genders)
+    session = get_session() if session is None else session
+
+    with _request_errors():
+        with span("scrape.request", url=url) as request_span:
+            response = session.get(url, timeout=80, headers=_conditional_headers(cache_dir, url), stream=True)
+            request_span.set(status=response.status_code, encoding=response.headers.get("Content-Encoding"))
+        with response:
+            if response.status_code == 304:
+                with span("scrape.read_cache") as cache_span:
+                    if tracing.is_enabled():
+                        cache_span.set(bytes=os.path.getsize(body_file))
+                    return read_cached_medal_table(cache_dir, url, breakdown, sports, genders)
+            response.raise_for_status()  # Raise HTTPError for bad responses (4xx and 5xx)
+
+            os.makedirs(cache_dir, exist_ok=True)
+            received = [0]
+            with open(body_file + ".tmp", "wb") as f, span("scrape.stream_parse") as parse_span:
+                chunks = _copy_chunks(response.iter_content(CHUNK_SIZE), f, received)
+                df = _medal_frame(iter_medal_rows(chunks, sports, genders), breakdown)
+                # the rest of the document is not parsed, but it is cached
+                for _ in chunks:
+                    pass
+                parse_span.set(rows=len(df), bytes=received[0])
+
+    os.replace(body_file + ".tmp", body_file)
+    _update_cache_meta(cache_dir, url, response)
+    return df
+
+
+def read_cached_medal_table(
+    cache_dir: str = CACHE_PATH, url: str = URL, breakdown: bool = False, sports=None, genders=None
+) -> pd.DataFrame:
+    """The medal table of the last body fetched from a URL, streamed from the HTTP cache"""
+    _, body_file = cache_files(cache_dir, url)
+    sports, genders = _default_slices(breakdown, sports, genders)
+    with open(body_file, "rb") as f:
+        return _medal_frame(iter_medal_rows(iter(partial(f.read, CHUNK_SIZE), b""), sports, genders), breakdown)
+
+
+def _medal_frame(rows, breakdown: bool) -> pd.DataFrame:
+    # the typed columns are built from the kept rows only, without the wide frame of every field
+    columns = medal_columns(rows, breakdown)
+    counts = {field: np.frombuffer(columns.pop(field), dtype=np.int64) for field in COUNT_FIELDS}
+    df = pd.DataFrame(columns)
+    noc_ids = REGISTRY.ids(df["org"])
+    df["Country"] = REGISTRY.labels(noc_ids)
+    df["Gold"] = counts["gold"]
+    df["Silver"] = counts["silver"]
+    df["Bronze"] = counts["bronze"]
+    df["Total"] = counts["gold"] + counts["silver"] + counts["bronze"]
+    df["lexicographic_order"] = counts["sortRankTotal"]
+    df["noc_id"] = noc_ids
+
+    # reoganize columns by total amount of medals
+    return df.sort_values(by=["Total"], ascending=False)
+
+
+def scrap_medal_breakdown(url: str = URL, cache_dir: str = CACHE_PATH) -> pd.DataFrame:
+    """Medal table of every sport and gender, sharing the HTTP cache of scrap_olympic_data"""
+    return fetch_medal_table(url, cache_dir, breakdown=True)
+
+
+def medal_table_hash(df: pd.DataFrame) -> str:
+    """Hash of the medal counts per country, insensitive to row order and to the other columns"""
+    counts = df[["org", "Gold", "Silver", "Bronze"]].sort_values("org")
+    return hashlib.sha256(counts.to_csv(index=False).encode()).hexdigest()
+
+
+def scrap_olympic_data(
+    url: str = URL, cache_dir: str = CACHE_PATH, data_dir: str = PATH, only_if_changed: bool = False
+):
+    """
+    Scrap the medal table and save it as a CSV file in the data folder
+
+    Parameters
+    ----------
+    url : str
+       URL of the CIS_MedalNOCs endpoint
+    cache_dir : str
+       Directory of the HTTP cache
+    data_dir : str
+       Directory where the CSV file is written
+    only_if_changed : bool
+       When the medal counts are the same as the last saved ones, write nothing and return None
+       instead of the DataFrame
+    Returns
+    -------
+       The medal table (or None) and the time suffix
+    """
+    # Step 1: Fetch the JSON data from the URL
+    df = fetch_medal_table(url, cache_dir)
+
+    time_date_suffix_french_time = get_time_suffix()
+
+    content_hash = medal_table_hash(df)
+    meta = read_cache_meta(cache_dir, url)
+    if only_if_changed and meta.get("content_hash") == content_hash:
+        print("Medal table unchanged since the last CSV file.")
+        return None, time_date_suffix_french_time
 
-    print(df.head())
+    save_medal_data(df, time_date_suffix_french_time, data_dir)
+    meta["content_hash"] = content_hash
+    write_cache_meta(cache_dir, url, meta)
 
-    # Step 4: Normalize nested columns (if needed)
-    # 'organisation' column is nested, so we'll normalize it
-    organisation_df = pd.json_normalize(df['organisation'])
-    organisation_df.columns = [f'organisation.{col}' for col in organisation_df.columns]
-    df = df.drop(columns=['organisation']).join(organisation_df)
+    return df, time_date_suffix_french_time
 
-    print(df.head())
-    # keep gender == TOT
-    df = df[df["gender"] == "TOT"]
-    df = df[df["sport"] == "GLO"]
 
-    df["Country"] = df["org"].apply(lambda x: f"{x} {country_acronym_to_flag(x)}")
-    df["Gold"] = df["gold"]
-    df["Silver"] = df["silver"]
-    df["Bronze"] = df["bronze"]
-    df["Total"] = df["gold"] + df["silver"] + df["bronze"]
-    df["lexicographic_order"] = df["sortRankTotal"]
+def get_french_time() -> datetime:
+    # Paris wall-clock time, naive like the CSV suffixes and the store, whatever the time zone of the machine
+    return datetime.now(timezone.utc).astimezone(PARIS).replace(tzinfo=None)
 
-    # drop unnecessary columns
-    columns = ["gold", "silver", "bronze", "gender", "sport"]
-    df = df.drop(columns=columns)
 
-    # reoganize columns by total amount of medals
-    df = df.sort_values(by=["Total"], ascending=False)
+def get_time_suffix() -> str:
+    return get_french_time().strftime("%Y%m%d_%Hh")
 
-    # add 6 hours because I'm in Canada when coding this project
-    time_date_suffix_french_time = (datetime.now() + timedelta(hours=6)).strftime("%Y%m%d_%Hh")
 
-    df.to_csv(f"{PATH}/medal_data_{time_date_suffix_french_time}.csv", index=False)
+def save_medal_data(df: pd.DataFrame, suffix: str, data_dir: str = PATH, store_name: str = STORE_NAME):
+    # the CSV file is kept next to the snapshot store, set store_name to None to only write the CSV
+    # the NOC ids are those of this process, the CSV file only keeps the codes
+    # the store is written first, so that a failed append does not leave a CSV file behind
+    if store_name is not None:
+        taken_at = get_french_time()
+        with span("scrape.store_append", rows=len(df)), SnapshotStore(f"{data_dir}/{store_name}") as store:
+            latest = store.latest()
+            if latest is not None and taken_at <= latest[0]:
+                # the wall clock went back (end of summer time, clock adjusted): only the CSV file is written
+                print(f"Snapshot not added to the store, {taken_at} is not after its last one ({latest[0]}).")
+            elif store.append(df, taken_at):
+                print("Snapshot has been added to the store.")
 
+    csv_file = f"{data_dir}/medal_data_{suffix}.csv"
+    with span("scrape.save_csv", rows=len(df)) as csv_span:
+        df.drop(columns=["noc_id"], errors="ignore").to_csv(csv_file, index=False)
+        if tracing.is_enabled():
+            csv_span.set(bytes=os.path.getsize(csv_file))
     print("CSV file has been created successfully.")
-
-    return df, time_date_suffix_french_time
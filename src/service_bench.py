@@ -0,0 +1,118 @@
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+
+def _run_connection(host: str, port: int, paths: list, duration: float, conditional: bool, results: list):
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    etags = {}
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        headers = {"If-None-Match": etags[path]} if conditional and path in etags else {}
+        start = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    connection.close()
+    results.append((latencies, statuses))
+
+
+def _run_process(url: str, paths: list, connections: int, duration: float, conditional: bool):
+    parts = urlsplit(url)
+    results = []
+    threads = [
+        threading.Thread(target=_run_connection,
+                         args=(parts.hostname, parts.port or 80, paths, duration, conditional, results))
+        for _ in range(connections)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = [latency for result in results for latency in result[0]]
+    statuses = {}
+    for _, result_statuses in results:
+        for status, count in result_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return latencies, statuses
+
+
+def benchmark(url: str = "http://127.0.0.1:8000", paths: list = None, processes: int = 1, connections: int = 8,
+              duration: float = 5.0, conditional: bool = False) -> dict:
+    """
+    Load test the ranking service with keep-alive connections
+
+    Parameters
+    ----------
+    url : str
+       Base URL of the service
+    paths : list
+       Paths requested in turn by every connection, the latest ranking by default
+    processes : int
+       Number of client processes, each one running its own connections
+    connections : int
+       Number of keep-alive connections per process
+    duration : float
+       Seconds of load
+    conditional : bool
+       Send If-None-Match with the last ETag received, to measure 304 responses
+    Returns
+    -------
+       Number of requests, requests per second, latency percentiles in milliseconds and status counts
+    """
+    paths = paths or ["/rankings/latest"]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        runs = list(executor.map(
+            _run_process, *zip(*[(url, paths, connections, duration, conditional)] * processes)
+        ))
+    latencies = sorted(latency for run in runs for latency in run[0])
+    statuses = {}
+    for _, run_statuses in runs:
+        for status, count in run_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    if not latencies:
+        return {"requests": 0, "requests_per_second": 0.0, "statuses": statuses}
+
+    def percentile(q):
+        return 1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / duration,
+        "latency_ms": {
+            "mean": 1000 * statistics.fmean(latencies),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": 1000 * latencies[-1],
+        },
+        "statuses": statuses,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a running ranking_service.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", action="append", dest="paths", help="path to request, repeatable")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--connections", type=int, default=8, help="keep-alive connections per process")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--conditional", action="store_true", help="revalidate with If-None-Match")
+    args = parser.parse_args()
+
+    report = benchmark(args.url, args.paths, args.processes, args.connections, args.duration, args.conditional)
+    print(f"{report['requests']} requests, {report['requests_per_second']:.0f} req/s, statuses {report['statuses']}")
+    if "latency_ms" in report:
+        print(", ".join(f"{name} {value:.2f} ms" for name, value in report["latency_ms"].items()))
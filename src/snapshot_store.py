@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from constants import STORE_NAME
+from noc_registry import REGISTRY
+
+PATH = os.path.dirname(os.path.abspath(__file__)) + '/../data'
+STORE_PATH = f'{PATH}/{STORE_NAME}'
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+MEDALS = ["Gold", "Silver", "Bronze"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS noc (
+    noc_id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL UNIQUE,
+    description TEXT,
+    long_description TEXT
+);
+CREATE TABLE IF NOT EXISTS snapshot (
+    snapshot_id INTEGER PRIMARY KEY,
+    taken_at TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS medal_delta (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshot(snapshot_id),
+    noc_id INTEGER NOT NULL REFERENCES noc(noc_id),
+    gold INTEGER NOT NULL,
+    silver INTEGER NOT NULL,
+    bronze INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, noc_id)
+);
+"""
+
+
+def medal_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """Gold, Silver and Bronze per NOC code, from a scraped, replayed or stored medal table"""
+    org = df["org"] if "org" in df.columns else df["Country"].str.split(" ").str[0]
+    counts = df[MEDALS].astype(int).set_axis(org.astype(str).to_numpy())
+    return counts.groupby(level=0).sum().sort_index()
+
+
+def _counts_hash(counts: pd.DataFrame) -> str:
+    return hashlib.sha256(counts.to_csv().encode()).hexdigest()
+
+
+class SnapshotStore:
+    """
+    Append-only SQLite store of medal table snapshots
+
+    NOC metadata is stored once. Each snapshot only stores the medal counts that changed since the
+    previous one, and a snapshot identical to the previous one is not stored at all.
+
+    Parameters
+    ----------
+    path : str
+       SQLite file of the store
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def latest(self):
+        """(taken_at, content_hash) of the last snapshot, None when the store is empty"""
+        row = self.connection.execute(
+            "SELECT taken_at, content_hash FROM snapshot ORDER BY taken_at DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        return datetime.strptime(row[0], TIME_FORMAT), row[1]
+
+    def timestamps(self) -> list:
+        rows = self.connection.execute("SELECT taken_at FROM snapshot ORDER BY taken_at").fetchall()
+        return [datetime.strptime(row[0], TIME_FORMAT) for row in rows]
+
+    def _upsert_nocs(self, df: pd.DataFrame) -> dict:
+        codes = medal_counts(df).index
+        metadata = {}
+        if "organisation.code" in df.columns:
+            for _, row in df.drop_duplicates("organisation.code").iterrows():
+                metadata[row["organisation.code"]] = (
+                    row.get("organisation.description"), row.get("organisation.longDescription")
+                )
+        self.connection.executemany(
+            "INSERT INTO noc (code, description, long_description) VALUES (?, ?, ?) "
+            "ON CONFLICT(code) DO UPDATE SET "
+            "description = COALESCE(excluded.description, description), "
+            "long_description = COALESCE(excluded.long_description, long_description)",
+            [(code, *metadata.get(code, (None, None))) for code in codes],
+        )
+        return dict(self.connection.execute("SELECT code, noc_id FROM noc").fetchall())
+
+    def append(self, df: pd.DataFrame, taken_at: datetime) -> bool:
+        """
+        Store a medal table taken at a given time
+
+        Parameters
+        ----------
+        df : DataFrame
+           Medal table with org (or Country), Gold, Silver and Bronze columns
+        taken_at : datetime
+           Time of the snapshot, later than every stored one
+        Returns
+        -------
+           False when the medal counts are the same as the last stored ones and nothing was written,
+           e.g. when the table only gained a row without medals
+        """
+        counts = medal_counts(df)
+        content_hash = _counts_hash(counts)
+        latest = self.latest()
+        if latest is not None:
+            if latest[1] == content_hash:
+                return False
+            if taken_at <= latest[0]:
+                raise ValueError(f"The store is append-only: {taken_at} is not after {latest[0]}")
+            previous = medal_counts(self.as_of(latest[0]))
+        else:
+            previous = pd.DataFrame(columns=MEDALS, dtype=int)
+
+        delta = counts.sub(previous, fill_value=0).fillna(0).astype(int)
+        delta = delta[(delta != 0).any(axis=1)]
+        if delta.empty:
+            # a snapshot without any delta would be missing from range()
+            return False
+
+        with self.connection:
+            noc_ids = self._upsert_nocs(df)
+            snapshot_id = self.connection.execute(
+                "INSERT INTO snapshot (taken_at, content_hash) VALUES (?, ?)",
+                (taken_at.strftime(TIME_FORMAT), content_hash),
+            ).lastrowid
+            self.connection.executemany(
+                "INSERT INTO medal_delta (snapshot_id, noc_id, gold, silver, bronze) VALUES (?, ?, ?, ?, ?)",
+                [(snapshot_id, noc_ids[code], *map(int, row)) for code, row in zip(delta.index, delta.to_numpy())],
+            )
+        return True
+
+    def as_of(self, taken_at: datetime) -> pd.DataFrame:
+        """Medal table as it was at a given time, in the columns of the scraped tables"""
+        return self._state("<=", taken_at)
+
+    def _state(self, comparison: str, taken_at: datetime) -> pd.DataFrame:
+        df = pd.read_sql_query(
+            "SELECT n.code AS org, n.description AS 'organisation.description', "
+            "n.long_description AS 'organisation.longDescription', "
+            "SUM(d.gold) AS Gold, SUM(d.silver) AS Silver, SUM(d.bronze) AS Bronze "
+            "FROM medal_delta d JOIN snapshot s USING (snapshot_id) JOIN noc n USING (noc_id) "
+            f"WHERE s.taken_at {comparison} ? GROUP BY d.noc_id",
+            self.connection,
+            params=(taken_at.strftime(TIME_FORMAT),),
+        )
+        return _to_medal_table(df)
+
+    def range(self, start: datetime, end: datetime) -> pd.DataFrame:
+        """
+        Medal tables of every snapshot taken between two times, both included
+
+        Returns
+        -------
+           Tidy DataFrame with a timestamp column and one row per NOC with medals at that time
+        """
+        baseline = medal_counts(self._state("<", start))
+        deltas = pd.read_sql_query(
+            "SELECT s.taken_at AS timestamp, n.code AS org, d.gold AS Gold, d.silver AS Silver, d.bronze AS Bronze "
+            "FROM medal_delta d JOIN snapshot s USING (snapshot_id) JOIN noc n USING (noc_id) "
+            "WHERE s.taken_at >= ? AND s.taken_at <= ?",
+            self.connection,
+            params=(start.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT)),
+        )
+        if deltas.empty:
+            return pd.DataFrame(columns=["timestamp", "noc_id", "org", "Country", *MEDALS, "Total"])
+
+        # one row per snapshot, one column per (medal, NOC), then accumulated from the baseline
+        wide = deltas.pivot_table(index="timestamp", columns="org", values=MEDALS, aggfunc="sum", fill_value=0)
+        wide = wide.sort_index().cumsum()
+        codes = wide.columns.get_level_values("org").union(baseline.index).unique()
+        wide = wide.reindex(columns=pd.MultiIndex.from_product([MEDALS, codes], names=[None, "org"]), fill_value=0)
+        for medal in MEDALS:
+            wide[medal] = wide[medal] + baseline[medal].reindex(codes, fill_value=0).to_numpy()
+
+        tidy = wide.stack("org", future_stack=True).reset_index()
+        tidy["timestamp"] = pd.to_datetime(tidy["timestamp"], format=TIME_FORMAT)
+        tidy = _to_medal_table(tidy)
+        return tidy.sort_values(["timestamp", "Total"], ascending=[True, False], ignore_index=True)
+
+
+def _to_medal_table(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df[MEDALS] = df[MEDALS].astype(int)
+    df["Total"] = df["Gold"] + df["Silver"] + df["Bronze"]
+    df = df[df["Total"] > 0]
+    noc_ids = REGISTRY.ids(df["org"])
+    df.insert(df.columns.get_loc("org"), "noc_id", noc_ids)
+    df.insert(df.columns.get_loc("org") + 1, "Country", REGISTRY.labels(noc_ids))
+    return df.sort_values(by=["Total"], ascending=False, ignore_index=True)
+
+
+def import_csv_snapshots(store: SnapshotStore, data_dir: str = PATH) -> int:
+    """Append every dated CSV snapshot of the data folder to the store, returns the number stored"""
+    from replay import discover_snapshots
+
+    latest = store.latest()
+    stored = 0
+    for taken_at, path in discover_snapshots(data_dir):
+        if latest is not None and taken_at <= latest[0]:
+            continue
+        stored += store.append(pd.read_csv(path), taken_at)
+    return stored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the CSV snapshots of the data folder into the store")
+    parser.add_argument("--data-dir", default=PATH)
+    parser.add_argument("--store", default=STORE_PATH)
+    args = parser.parse_args()
+
+    with SnapshotStore(args.store) as snapshot_store:
+        print(f"{import_csv_snapshots(snapshot_store, args.data_dir)} snapshots stored in {args.store}")
@@ -0,0 +1,268 @@
+"""
+Medal tables of many competitions, fetched concurrently and ranked in one batch
+
+Every source (a CIS_MedalNOCs endpoint of olympics.com, a recorded CSV file, or any object with
+code, name and fetch(client, cache_dir)) is normalized into the same medal-table schema. The HTTP
+sources share one PooledClient: a pooled, keep-alive requests.Session with retries and a rate limit
+per host. Point --base-url to fixture_server.py to run everything against recorded payloads.
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+import requests
+from pandas import DataFrame
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit
+
+from constants import MIN_MEDALS
+from http_cache import CACHE_PATH, cache_files
+from noc_registry import with_noc_ids
+from ranking_cube import rank_groups
+from replay import load_snapshot
+from scraper import USER_AGENT, fetch_medal_table
+from tracing import span
+
+BASE_URL = "https://olympics.com"
+CIS_PATH = "/{edition}/data/CIS_MedalNOCs~lang=ENG~comp={code}.json"
+MEDAL_TABLE_COLUMNS = ["competition", "noc_id", "org", "Country", "Gold", "Silver", "Bronze", "Total"]
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PooledClient:
+    """
+    One keep-alive connection pool shared by every fetch, with retries and a rate limit per host
+
+    Parameters
+    ----------
+    pool_size : int
+       Connections kept open per host, fetches beyond it wait for a free connection
+    retries : int
+       Retries of a request after a connection error or a 429 / 5xx answer
+    backoff : float
+       Backoff factor of the retries, in seconds, Retry-After headers are respected
+    rate : float
+       Maximum number of requests per second to one host, None for no limit
+    host_rates : dict
+       Rate of some hosts, overriding rate
+    """
+
+    def __init__(self, pool_size: int = 8, retries: int = 3, backoff: float = 0.5, rate: float = 2.0,
+                 host_rates: dict = None):
+        self.rate = rate
+        self.host_rates = host_rates or {}
+        self._next_request = {}
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING})
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _wait_turn(self, host: str):
+        rate = self.host_rates.get(host, self.rate)
+        if not rate:
+            return
+        # each request books the next free slot of its host, then sleeps until it
+        with self._lock:
+            now = time.monotonic()
+            turn = max(now, self._next_request.get(host, now))
+            self._next_request[host] = turn + 1 / rate
+        time.sleep(turn - now)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """requests.Session.get, once the rate limit of the host allows it"""
+        self._wait_turn(urlsplit(url).netloc)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def normalize_medal_table(df: DataFrame, competition: str) -> DataFrame:
+    """The medal-table schema shared by every source: competition, NOC id, org, Country and the medal counts"""
+    df = with_noc_ids(df).assign(competition=competition)
+    df = df[MEDAL_TABLE_COLUMNS].astype({"Gold": "int64", "Silver": "int64", "Bronze": "int64"})
+    df["Total"] = df["Gold"] + df["Silver"] + df["Bronze"]
+    return df.sort_values(by="Total", ascending=False, kind="stable").reset_index(drop=True)
+
+
+@dataclass(frozen=True)
+class CISSource:
+    """Medal table of a CIS_MedalNOCs endpoint, e.g. CISSource("OG2024", "Paris 2024 Olympic Games")"""
+    code: str
+    name: str
+    base_url: str = BASE_URL
+    edition: str = None
+
+    @property
+    def url(self) -> str:
+        return self.base_url.rstrip("/") + CIS_PATH.format(edition=self.edition or self.code, code=self.code)
+
+    def fetch(self, client: PooledClient, cache_dir: str = CACHE_PATH) -> DataFrame:
+        return normalize_medal_table(fetch_medal_table(self.url, cache_dir, session=client), self.code)
+
+
+@dataclass(frozen=True)
+class CSVSource:
+    """Medal table recorded as a CSV file, in the layout of the scraper or of the manual snapshots"""
+    code: str
+    name: str
+    path: str
+
+    def fetch(self, client: PooledClient = None, cache_dir: str = CACHE_PATH) -> DataFrame:
+        return normalize_medal_table(load_snapshot(self.path), self.code)
+
+
+# the competitions known to use the CIS_MedalNOCs endpoint, other Games can be added as CSVSource
+COMPETITIONS = {
+    "OG2024": CISSource("OG2024", "Paris 2024 Olympic Games"),
+    "PG2024": CISSource("PG2024", "Paris 2024 Paralympic Games"),
+}
+
+
+def fetch_competitions(sources: list, client: PooledClient = None, cache_dir: str = CACHE_PATH,
+                       max_workers: int = 8):
+    """
+    Fetch the medal tables of many competitions concurrently
+
+    Parameters
+    ----------
+    sources : list
+       CISSource, CSVSource or any object with code, name and fetch(client, cache_dir)
+    client : PooledClient
+       Client shared by every HTTP source, a new one is created and closed by default
+    cache_dir : str
+       Directory of the HTTP cache, shared with the scraper
+    max_workers : int
+       Number of fetches running at once
+    Returns
+    -------
+       ({code: medal table}, {code: exception}), a failed competition does not stop the others
+    """
+    owned = client is None
+    client = PooledClient(pool_size=max_workers) if owned else client
+
+    def fetch(source):
+        with span("sources.fetch", competition=source.code) as fetch_span:
+            df = source.fetch(client, cache_dir)
+            fetch_span.set(rows=len(df))
+            return df
+
+    tables, errors = {}, {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {source.code: executor.submit(fetch, source) for source in sources}
+            for code, future in futures.items():
+                try:
+                    tables[code] = future.result()
+                except Exception as err:
+                    errors[code] = err
+    finally:
+        if owned:
+            client.close()
+    return tables, errors
+
+
+def rank_competitions(tables: dict, min_medals: int = MIN_MEDALS) -> DataFrame:
+    """
+    MJ, lexicographic and total ranks of every competition, in one batched pass
+
+    Parameters
+    ----------
+    tables : dict
+       Normalized medal table of each competition, as returned by fetch_competitions
+    min_medals : int
+       Minimum number of medals for a country to be ranked in a competition
+    Returns
+    -------
+       The rows of every competition with Rank_MJ, Rank_Lexico, Rank_Total and mention_majoritaire
+    """
+    if not tables:
+        return rank_groups(pd.DataFrame(columns=MEDAL_TABLE_COLUMNS), ["competition"])
+    df = pd.concat(list(tables.values()), ignore_index=True)
+    with span("sources.rank", rows=len(df)):
+        return rank_groups(df[df["Total"] >= min_medals], ["competition"])
+
+
+def comparison_summary(ranked: DataFrame) -> DataFrame:
+    """Per competition: ranked countries, first country by each method, countries ranked differently"""
+    rows = []
+    for competition, df in ranked.groupby("competition", sort=False):
+        rows.append({
+            "competition": competition,
+            "countries": len(df),
+            "first_mj": df.loc[df["Rank_MJ"].idxmin(), "org"],
+            "first_lexico": df.loc[df["Rank_Lexico"].idxmin(), "org"],
+            "first_total": df.loc[df["Rank_Total"].idxmin(), "org"],
+            "mj_vs_lexico": int((df["Rank_MJ"] != df["Rank_Lexico"]).sum()),
+        })
+    return pd.DataFrame(rows)
+
+
+def record_payloads(sources: list, directory: str, cache_dir: str = CACHE_PATH):
+    """Copy the cached body of every HTTP source to directory/<code>.json, the payloads of fixture_server.py"""
+    os.makedirs(directory, exist_ok=True)
+    for source in sources:
+        if hasattr(source, "url"):
+            _, body_file = cache_files(cache_dir, source.url)
+            if os.path.exists(body_file):
+                shutil.copyfile(body_file, os.path.join(directory, f"{source.code}.json"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare MJ and lexicographic rankings across competitions")
+    parser.add_argument("competitions", nargs="*", default=sorted(COMPETITIONS),
+                        help="CIS competition codes, e.g. OG2024 PG2024")
+    parser.add_argument("--csv", nargs=2, action="append", default=[], metavar=("CODE", "PATH"),
+                        help="add a competition recorded as a CSV file, repeatable")
+    parser.add_argument("--base-url", default=BASE_URL, help="e.g. the URL of fixture_server.py")
+    parser.add_argument("--cache-dir", default=CACHE_PATH)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second to one host, 0 for no limit")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--record", default=None, help="copy the fetched payloads to this directory")
+    parser.add_argument("--details", action="store_true", help="print the ranking of every competition")
+    args = parser.parse_args()
+
+    sources = [
+        CISSource(code, COMPETITIONS[code].name if code in COMPETITIONS else code, args.base_url)
+        for code in args.competitions
+    ] + [CSVSource(code, code, path) for code, path in args.csv]
+
+    with PooledClient(pool_size=args.workers, retries=args.retries, rate=args.rate or None) as pooled_client:
+        medal_tables, failures = fetch_competitions(sources, pooled_client, args.cache_dir, args.workers)
+    for failed, error in failures.items():
+        print(f"{failed}: {error}")
+    if args.record:
+        record_payloads(sources, args.record, args.cache_dir)
+
+    ranking = rank_competitions(medal_tables, args.min_medals)
+    print(comparison_summary(ranking).to_string(index=False))
+    if args.details:
+        columns = ["competition", "Country", "Gold", "Silver", "Bronze", "Total", "Rank_MJ", "Rank_Lexico",
+                   "Rank_Total", "mention_majoritaire"]
+        print(ranking.sort_values(["competition", "Rank_MJ"])[columns].to_string(index=False))
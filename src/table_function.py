@@ -1,74 +1,265 @@
+import argparse
+import html
+
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
+from pandas import DataFrame
+
+from constants import GOLD_MEDAL, SILVER_MEDAL, BRONZE_MEDAL, MIN_MEDALS
+from noc_registry import with_noc_ids
+from tracing import span
+
+TITLE = 'Comparison of Olympic Ranking Systems'
+METHOD_COLUMNS = {"lexico": "Rank_Lexico", "mj": "Rank_MJ", "total": "Rank_Total"}
+HEADERS = [
+    "Rank",
+    f"Lexicographic<br>{GOLD_MEDAL}>{SILVER_MEDAL}>{BRONZE_MEDAL}",
+    "Majority Judgment",
+    f"Total Medals<br>{GOLD_MEDAL}+{SILVER_MEDAL}+{BRONZE_MEDAL}",
+]
+COLUMN_WIDTHS = [40, 160, 160, 160]
+UP, DOWN, NEW = "▲", "▼", "new"
+
+# Define colors
+HEADER_COLOR = '#1f77b4'
+ROW_EVEN_COLOR = '#f2f2f2'
+ROW_ODD_COLOR = 'white'
+UP_COLOR = '#2ca02c'
+DOWN_COLOR = '#d62728'
+
+HEADER_HEIGHT = 40
+ROW_HEIGHT = 30
+TITLE_HEIGHT = 80
+
+
+def rank_changes(rank_comparison: DataFrame, previous: DataFrame, method: str) -> pd.Series:
+    """
+    Change of rank of every country since a previous snapshot, e.g. "▲2", "▼1", "new" or ""
+
+    Parameters
+    ----------
+    rank_comparison : DataFrame
+       Output of pipeline.create_rank_comparison
+    previous : DataFrame
+       The same for the previous snapshot, None for no change at all
+    method : str
+       lexico, mj or total
+    """
+    if previous is None:
+        return pd.Series("", index=rank_comparison.index)
+    column = METHOD_COLUMNS[method]
+    rank_before = with_noc_ids(previous).set_index("noc_id")[column]
+    before = with_noc_ids(rank_comparison)["noc_id"].map(rank_before).to_numpy(dtype=float)
+    gain = before - rank_comparison[column].to_numpy()
+    steps = np.abs(np.nan_to_num(gain)).astype(np.int64).astype(str).astype(object)
+    changes = np.where(gain > 0, UP + steps, np.where(gain < 0, DOWN + steps, ""))
+    changes = np.where(np.isnan(before), NEW, changes)
+    return pd.Series(changes, index=rank_comparison.index, dtype=object)
+
+
+def comparison_rows(rank_comparison: DataFrame, previous: DataFrame = None) -> DataFrame:
+    """
+    The rows of the comparison table, every column formatted in one vectorized pass
+
+    Row i holds the i-th country of each ranking method, with its medals (lexicographic), its
+    majority grade (Majority Judgment) or its total of medals, and its rank change when a previous
+    snapshot is given.
+
+    Parameters
+    ----------
+    rank_comparison : DataFrame
+       Output of pipeline.create_rank_comparison
+    previous : DataFrame
+       Output of pipeline.create_rank_comparison for the previous snapshot
+    Returns
+    -------
+       DataFrame with Rank, then the label and the change of each method (lexico, mj, total)
+    """
+    with span("table.rows", rows=len(rank_comparison), previous=previous is not None):
+        labels = {
+            "lexico": (
+                rank_comparison["Country"].astype(str) + "      "
+                + rank_comparison["Gold"].astype(str) + f" {GOLD_MEDAL} "
+                + rank_comparison["Silver"].astype(str) + f" {SILVER_MEDAL} "
+                + rank_comparison["Bronze"].astype(str) + f" {BRONZE_MEDAL} "
+            ),
+            "mj": (
+                rank_comparison["Country"].astype(str) + "      "
+                + rank_comparison["mention_majoritaire"].astype(str)
+            ),
+            "total": (
+                rank_comparison["Country"].astype(str) + "      "
+                + rank_comparison["Total"].astype(str) + f" {GOLD_MEDAL}{SILVER_MEDAL}{BRONZE_MEDAL}"
+            ),
+        }
+        rows = {"Rank": np.arange(1, len(rank_comparison) + 1)}
+        for method, column in METHOD_COLUMNS.items():
+            order = np.argsort(rank_comparison[column].to_numpy(), kind="stable")
+            rows[method] = labels[method].to_numpy()[order]
+            rows[f"{method}_change"] = rank_changes(rank_comparison, previous, method).to_numpy()[order]
+        return pd.DataFrame(rows)
+
+
+def _cells(rows: DataFrame) -> list:
+    cells = [rows["Rank"]]
+    for method in ["lexico", "mj", "total"]:
+        change = rows[f"{method}_change"]
+        cells.append(rows[method].where(change == "", rows[method] + "  " + change))
+    return cells
+
+
+def _table_figure(rows: DataFrame, title: str) -> go.Figure:
+    with span("table.figure", rows=len(rows)):
+        # Create a Plotly table with enhanced formatting
+        fig = go.Figure(data=[go.Table(
+            columnwidth=COLUMN_WIDTHS,
+            header=dict(values=[f"<b>{header}</b>" for header in HEADERS],
+                        fill_color=HEADER_COLOR,
+                        align='center',
+                        font=dict(color='white', size=12),
+                        height=HEADER_HEIGHT),
+            cells=dict(values=_cells(rows),
+                       fill_color=[[ROW_ODD_COLOR, ROW_EVEN_COLOR] * 4],
+                       align=['center', 'center', 'center', 'center'],
+                       font=dict(color='black', size=12),
+                       height=ROW_HEIGHT),
+        )])
+
+        fig.update_layout(
+            title_text=title,
+            title_font_size=22,
+            title_x=0.5,
+            paper_bgcolor='white'
+        )
+        return fig
 
-GOLD_MEDAL = "\U0001F947"
-SILVER_MEDAL = "\U0001F948"
-BRONZE_MEDAL = "\U0001F949"
-CHOCOLATE = "\U0001F36B"
-
-
-def create_ranking_comparison_table(rank_comparison):
-    # Create three separate dataframes for each ranking method
-    df_lexico = rank_comparison[['Country', 'Rank_Lexico', 'Gold', 'Silver', 'Bronze']].sort_values('Rank_Lexico')
-    df_total = rank_comparison[['Country', 'Rank_Total', 'Total']].sort_values('Rank_Total')
-    df_mj = rank_comparison[['Country', 'Rank_MJ', 'mention_majoritaire']].sort_values('Rank_MJ')
-
-    countries_lexico = (
-            df_lexico["Country"].values + "      "
-            + df_lexico["Gold"].apply(lambda x: str(x)) + " "
-            + GOLD_MEDAL + " "
-            + df_lexico["Silver"].apply(lambda x: str(x)) + " "
-            + SILVER_MEDAL + " "
-            + df_lexico["Gold"].apply(lambda x: str(x)) + " "
-            + BRONZE_MEDAL + " "
+
+def create_ranking_comparison_table(rank_comparison, previous=None):
+    """
+    Plotly table of the lexicographic, Majority Judgment and total medal rankings
+
+    Parameters
+    ----------
+    rank_comparison : DataFrame
+       Output of pipeline.create_rank_comparison
+    previous : DataFrame
+       Output of pipeline.create_rank_comparison for the previous snapshot, to show the rank changes
+    """
+    return _table_figure(comparison_rows(rank_comparison, previous), TITLE)
+
+
+def create_ranking_comparison_pages(rank_comparison, page_size: int = 30, previous=None) -> list:
+    """
+    The comparison table split into figures of page_size rows, each one as tall as its rows
+
+    The rows are formatted once, then sliced, so that the full medal table stays fast and readable.
+    """
+    rows = comparison_rows(rank_comparison, previous)
+    nb_pages = max(1, -(-len(rows) // page_size))
+    pages = []
+    for page in range(nb_pages):
+        page_rows = rows.iloc[page * page_size:(page + 1) * page_size]
+        title = TITLE if nb_pages == 1 else f"{TITLE} ({page + 1}/{nb_pages})"
+        fig = _table_figure(page_rows, title)
+        fig.update_layout(height=TITLE_HEIGHT + HEADER_HEIGHT + ROW_HEIGHT * len(page_rows) + 40)
+        pages.append(fig)
+    return pages
+
+
+def _change_class(change: pd.Series) -> np.ndarray:
+    return np.where(change.str.startswith(UP), "up", np.where(change.str.startswith(DOWN), "down", "new"))
+
+
+def comparison_table_html(rank_comparison, previous=None, title: str = TITLE) -> str:
+    """The comparison table as a standalone HTML page, without Plotly"""
+    rows = comparison_rows(rank_comparison, previous)
+    columns = [rows["Rank"].astype(str)]
+    for method in ["lexico", "mj", "total"]:
+        text = rows[method].map(html.escape)
+        change = rows[f"{method}_change"]
+        badge = '<span class="' + pd.Series(_change_class(change), index=rows.index) + '">' + change + '</span>'
+        columns.append(text.where(change == "", text + " " + badge))
+    body = ("<tr><td>" + columns[0] + "</td><td>" + columns[1] + "</td><td>" + columns[2] + "</td><td>"
+            + columns[3] + "</td></tr>")
+    header = "".join(f"<th>{header}</th>" for header in HEADERS)
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f"<title>{html.escape(title)}</title>"
+        "<style>"
+        "body{font-family:sans-serif}table{border-collapse:collapse;margin:auto}"
+        f"th{{background:{HEADER_COLOR};color:white;padding:8px 16px}}"
+        "td{text-align:center;padding:6px 16px;white-space:nowrap}"
+        f"tr:nth-child(even) td{{background:{ROW_EVEN_COLOR}}}"
+        f".up{{color:{UP_COLOR}}}.down{{color:{DOWN_COLOR}}}.new{{color:gray;font-size:smaller}}"
+        "</style></head><body>"
+        f'<h2 style="text-align:center">{html.escape(title)}</h2>'
+        f"<table><thead><tr>{header}</tr></thead><tbody>\n"
+        + "\n".join(body)
+        + "\n</tbody></table></body></html>\n"
     )
 
-    countries_total = (
-            df_total["Country"].values + "      "
-            + df_total["Total"].apply(lambda x: str(x)) + " "
-            + GOLD_MEDAL + SILVER_MEDAL + BRONZE_MEDAL
+
+def comparison_table_svg(rank_comparison, previous=None, title: str = TITLE) -> str:
+    """The comparison table as a standalone SVG image, without Plotly"""
+    rows = comparison_rows(rank_comparison, previous)
+    scale = 2
+    widths = [scale * width for width in COLUMN_WIDTHS]
+    centers = np.cumsum([0] + widths[:-1]) + np.array(widths) / 2
+    width, height = sum(widths), TITLE_HEIGHT + HEADER_HEIGHT + ROW_HEIGHT * len(rows)
+    top = TITLE_HEIGHT + HEADER_HEIGHT
+
+    header = "".join(
+        f'<text x="{x:.0f}" y="{TITLE_HEIGHT + 25}" fill="white" font-weight="bold">'
+        f'{html.escape(text.replace("<br>", " "))}</text>'
+        for x, text in zip(centers, HEADERS)
     )
-    countries_mj = (
-            df_mj["Country"].values + "      "
-            + df_mj["mention_majoritaire"].apply(lambda x: str(x))
+    y = top + ROW_HEIGHT * np.arange(len(rows))
+    stripes = ''.join(
+        f'<rect x="0" y="{row_y}" width="{width}" height="{ROW_HEIGHT}" fill="{ROW_EVEN_COLOR}"/>' for row_y in y[1::2]
     )
-
-    # Define colors
-    header_color = '#1f77b4'
-    row_even_color = '#f2f2f2'
-    row_odd_color = 'white'
-
-    # Create a Plotly table with enhanced formatting
-    fig = go.Figure(data=[go.Table(
-        columnwidth=[40, 160, 160, 160],
-        header=dict(values=[
-            "<b>Rank</b>",
-            f"<b>Lexicographic<br>{GOLD_MEDAL}>{SILVER_MEDAL}>{BRONZE_MEDAL}</b>",
-            "<b>Majority Judgment</b>",
-            f"<b>Total Medals<br>{GOLD_MEDAL}+{SILVER_MEDAL}+{BRONZE_MEDAL}</b>",
-        ],
-                    fill_color=header_color,
-                    align='center',
-                    font=dict(color='white', size=12),
-                    height=40),
-        cells=dict(values=[
-            [i for i in range(1, len(rank_comparison) + 1)],
-            countries_lexico,
-            countries_mj,
-            countries_total,
-            ],
-                   fill_color=[[row_odd_color, row_even_color]*4],
-                   align=['center', 'center', 'center', 'center'],
-                   font=dict(color='black', size=12),
-                   height=30),
-    )])
-
-    fig.update_layout(
-        title_text='Comparison of Olympic Ranking Systems',
-        title_font_size=22,
-        title_x=0.5,
-        # margin=dict(l=20, r=20, t=60, b=20),
-        # height=max(600, 100 + 30 * max_rows),  # Adjust height based on number of rows
-        paper_bgcolor='white'
+    text_y = pd.Series(y + 20, index=rows.index).astype(str)
+    cells = '<text x="' + f"{centers[0]:.0f}" + '" y="' + text_y + '">' + rows["Rank"].astype(str) + '</text>'
+    for center, method in zip(centers[1:], ["lexico", "mj", "total"]):
+        change = rows[f"{method}_change"]
+        color = pd.Series(np.where(change.str.startswith(UP), UP_COLOR,
+                                   np.where(change.str.startswith(DOWN), DOWN_COLOR, "gray")), index=rows.index)
+        tspan = (' <tspan fill="' + color + '">' + change + '</tspan>').where(change != "", "")
+        cells = cells + f'<text x="{center:.0f}" y="' + text_y + '">' + rows[method].map(html.escape) + tspan + '</text>'
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="12" text-anchor="middle">'
+        f'<rect width="{width}" height="{height}" fill="white"/>'
+        f'<text x="{width / 2:.0f}" y="{TITLE_HEIGHT / 2 + 8:.0f}" font-size="22">{html.escape(title)}</text>'
+        f'<rect x="0" y="{TITLE_HEIGHT}" width="{width}" height="{HEADER_HEIGHT}" fill="{HEADER_COLOR}"/>'
+        + header + stripes + "".join(cells) + "</svg>\n"
     )
 
-    return fig
+
+if __name__ == "__main__":
+    from pipeline import MedalSnapshot, rank_snapshot
+    from replay import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Export the ranking comparison table of a medal snapshot")
+    parser.add_argument("csv", help="medal table snapshot")
+    parser.add_argument("--previous", default=None, help="previous snapshot, to show the rank changes")
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS, help="1 for every medal-winning NOC")
+    parser.add_argument("--format", choices=["html", "svg", "png", "pdf"], default="html")
+    parser.add_argument("--page-size", type=int, default=30, help="rows per page of the png and pdf exports")
+    parser.add_argument("--output", required=True, help="output file, pages get a _<n> suffix")
+    args = parser.parse_args()
+
+    def rank_file(path):
+        return rank_snapshot(MedalSnapshot(df=load_snapshot(path), fin_enquete=None), args.min_medals).rank_comparison
+
+    current = rank_file(args.csv)
+    before = rank_file(args.previous) if args.previous else None
+    if args.format in ("html", "svg"):
+        export = comparison_table_html if args.format == "html" else comparison_table_svg
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(export(current, before))
+    else:
+        figures = create_ranking_comparison_pages(current, args.page_size, before)
+        stem = args.output.rsplit(".", 1)[0]
+        for number, figure in enumerate(figures, start=1):
+            figure.write_image(args.output if len(figures) == 1 else f"{stem}_{number}.{args.format}")
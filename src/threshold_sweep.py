@@ -0,0 +1,126 @@
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import GRADES
+from noc_registry import with_noc_ids
+from ranking_functions import majority_judgment_ranks, total_medal_ranks
+
+METHODS = ["mj", "lexico", "total"]
+
+
+@dataclass(frozen=True)
+class ThresholdSweep:
+    """
+    Ranks of every country for every minimum number of medals
+
+    ranks[method][t, c] is the rank (starting at 1) of country c when only the countries with at least
+    thresholds[t] medals are ranked, 0 when the country is left out.
+    """
+    thresholds: np.ndarray
+    countries: np.ndarray
+    noc_ids: np.ndarray
+    orgs: np.ndarray
+    medals: np.ndarray
+    majority_grade: np.ndarray
+    ranks: dict
+
+    def ranking(self, min_medals: int) -> DataFrame:
+        """The countries ranked with one threshold, in the columns of pipeline.create_rank_comparison"""
+        if min_medals not in self.thresholds:
+            raise KeyError(f"No sweep result for min_medals={min_medals}")
+        t = min_medals - int(self.thresholds[0])
+        ranked = self.ranks["mj"][t] > 0
+        medals = self.medals[ranked]
+        df = pd.DataFrame({
+            "noc_id": self.noc_ids[ranked],
+            "mention_majoritaire": np.asarray(GRADES, dtype=object)[self.majority_grade[ranked]],
+            "org": self.orgs[ranked],
+            "Country": self.countries[ranked],
+            "Rank_Total": self.ranks["total"][t, ranked],
+            "Rank_Lexico": self.ranks["lexico"][t, ranked],
+            "Total": medals.sum(axis=1),
+            "Gold": medals[:, 0],
+            "Silver": medals[:, 1],
+            "Bronze": medals[:, 2],
+            "Rank_MJ": self.ranks["mj"][t, ranked],
+        })
+        return df.sort_values("Rank_MJ", kind="stable", ignore_index=True)
+
+    def to_frame(self, method: str = "mj") -> DataFrame:
+        """(threshold x country) rank matrix of one method"""
+        return pd.DataFrame(self.ranks[method], index=pd.Index(self.thresholds, name="min_medals"),
+                            columns=self.countries)
+
+
+def sweep_thresholds(df: DataFrame) -> ThresholdSweep:
+    """
+    Rank a medal table with every minimum number of medals, from 1 to the best total, in one pass
+
+    The chocolate grade fills every country up to the best total, and the country with the best total
+    is ranked whatever the threshold, so every merit profile is the same for all thresholds. The three
+    orders are computed once on every country, and each threshold only keeps the countries above it.
+
+    Parameters
+    ----------
+    df : DataFrame
+       Medal table with Country (or org), Gold, Silver and Bronze columns, in the order
+       rank_lexicographically keeps for ties
+    Returns
+    -------
+       The ThresholdSweep of the table
+    """
+    df = with_noc_ids(df[df[["Gold", "Silver", "Bronze"]].sum(axis=1) > 0])
+    medals = df[["Gold", "Silver", "Bronze"]].to_numpy(dtype=np.int64)
+    total = medals.sum(axis=1)
+    nb_countries = len(medals)
+    thresholds = np.arange(1, int(total.max(initial=0)) + 1)
+    # kept[t, position]: the country at this position of an order is ranked with threshold t
+    kept = total[np.newaxis, :] >= thresholds[:, np.newaxis]
+
+    counts = np.column_stack([medals, total.max(initial=0) - total])
+    majority_grade, mj_rank, mj_order = majority_judgment_ranks(counts)
+    # countries sharing an MJ rank share the rank of the first one of their group
+    kept_before = np.cumsum(kept[:, mj_order], axis=1) - kept[:, mj_order]
+    ranks = {"mj": kept_before[:, mj_rank] + 1}
+
+    base = int(medals.max(initial=0)) + 1
+    lexico_key = (medals[:, 0] * base + medals[:, 1]) * base + medals[:, 2]
+    lexico_order = np.argsort(-lexico_key, kind="stable")
+    lexico_rank = np.empty(nb_countries, dtype=np.intp)
+    lexico_rank[lexico_order] = np.arange(nb_countries)
+    ranks["lexico"] = np.cumsum(kept[:, lexico_order], axis=1)[:, lexico_rank]
+
+    # countries below a threshold have fewer medals than every ranked one, they never change a total rank
+    ranks["total"] = np.broadcast_to(total_medal_ranks(medals), kept.shape)
+
+    ranks = {method: np.where(kept, rank, 0).astype(np.int32) for method, rank in ranks.items()}
+    return ThresholdSweep(
+        thresholds=thresholds,
+        countries=df["Country"].to_numpy(),
+        noc_ids=df["noc_id"].to_numpy(),
+        orgs=df["org"].to_numpy(),
+        medals=medals,
+        majority_grade=majority_grade,
+        ranks=ranks,
+    )
+
+
+if __name__ == "__main__":
+    from replay import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Rank the medal table with every minimum number of medals")
+    parser.add_argument("csv", help="medal table snapshot")
+    parser.add_argument("--min-medals", type=int, default=None, help="print the ranking of one threshold")
+    parser.add_argument("--method", choices=METHODS, default="mj")
+    args = parser.parse_args()
+
+    sweep = sweep_thresholds(load_snapshot(args.csv))
+    if args.min_medals is not None:
+        print(sweep.ranking(args.min_medals).to_string(index=False))
+    else:
+        matrix = sweep.to_frame(args.method)
+        print(matrix.loc[:, (matrix > 0).any()].to_string())
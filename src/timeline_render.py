@@ -0,0 +1,316 @@
+"""
+Animated timeline of the Majority Judgment merit profiles through the Games
+
+Every snapshot is ranked and drawn with plot_merit_profiles_in_number, but a medal table that did
+not change since an earlier snapshot reuses the frame of that snapshot. The frames are rendered as
+images in a process pool, each worker keeping one warm Kaleido renderer, and cached on disk by
+medal table, so that a new run only renders the new tables. They are then assembled into a GIF
+(Pillow), an MP4 (imageio and ffmpeg, when installed) or an interactive Plotly animation.
+
+    python timeline_render.py --output ../figures/mj_timeline.html
+    python timeline_render.py --output ../figures/mj_timeline.gif --workers 4
+"""
+import argparse
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime
+
+import plotly.graph_objects as go
+
+from constants import MIN_MEDALS
+from export_engine import ExportEngine
+from main import plot_merit_profiles
+from pipeline import MedalSnapshot, rank_snapshot
+from replay import PATH, discover_snapshots, load_snapshot
+from scraper import medal_table_hash
+
+OUTPATH = os.path.dirname(os.path.abspath(__file__)) + '/../figures'
+FRAMES_PATH = f'{OUTPATH}/.timeline_frames'
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+@dataclass(frozen=True)
+class TimelineFrame:
+    """One snapshot of the timeline, frames of identical medal tables share their figure"""
+    timestamp: datetime
+    content_hash: str
+    figure: go.Figure
+
+
+def build_frames(snapshots: list, min_medals: int = MIN_MEDALS) -> list:
+    """
+    Rank and draw every snapshot, once per distinct medal table
+
+    Parameters
+    ----------
+    snapshots : list
+       (timestamp, medal table) of every snapshot, oldest first
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    Returns
+    -------
+       One TimelineFrame per snapshot whose table has a ranked country; an unchanged table keeps
+       the figure, and so the date, of its first snapshot
+    """
+    figures = {}
+    frames = []
+    for timestamp, df in snapshots:
+        if (df["Total"] < min_medals).all():
+            continue
+        content_hash = f"{medal_table_hash(df)[:16]}_{min_medals}"
+        if content_hash not in figures:
+            date = timestamp.strftime(TIME_FORMAT)
+            result = rank_snapshot(MedalSnapshot(df=df, fin_enquete=date), min_medals)
+            fig = plot_merit_profiles(result.df_mj_ranked, result.table.source, date, list(result.table.grades))
+            figures[content_hash] = fig
+        frames.append(TimelineFrame(timestamp, content_hash, figures[content_hash]))
+    return frames
+
+
+def load_snapshots(data_dir: str = PATH) -> list:
+    """(timestamp, medal table) of every dated snapshot of the data folder, oldest first"""
+    return [(timestamp, load_snapshot(path)) for timestamp, path in discover_snapshots(data_dir)]
+
+
+_engine = None
+
+
+def _start_renderer():
+    # one warm renderer per worker, for all the frames it renders
+    global _engine
+    _engine = ExportEngine(n=1, manifest_path=None)
+    _engine.start()
+    atexit.register(_engine.stop)
+
+
+def _render_batch(jobs: list) -> list:
+    figures = {basename: figure for basename, figure, _ in jobs}
+    fmt = jobs[0][2]
+    _engine.export(figures, formats=(fmt,))
+    return [f"{basename}.{fmt}" for basename in figures]
+
+
+def render_frames(frames: list, frames_dir: str = FRAMES_PATH, fmt: str = "png", workers: int = None,
+                  batch_size: int = 8) -> list:
+    """
+    Render the image of every distinct frame in a process pool, skipping the ones already on disk
+
+    Parameters
+    ----------
+    frames : list
+       TimelineFrame of every snapshot, see build_frames
+    frames_dir : str
+       Directory of the rendered frames, named after their medal table
+    fmt : str
+       Image format of the frames
+    workers : int
+       Number of rendering processes, all the cores by default
+    batch_size : int
+       Frames sent to a worker at once
+    Returns
+    -------
+       Path of the image of every frame, in the order of the frames
+    """
+    os.makedirs(frames_dir, exist_ok=True)
+    basenames = {frame.content_hash: os.path.join(frames_dir, frame.content_hash) for frame in frames}
+    missing = {}
+    for frame in frames:
+        if frame.content_hash not in missing and not os.path.exists(f"{basenames[frame.content_hash]}.{fmt}"):
+            missing[frame.content_hash] = (basenames[frame.content_hash], frame.figure, fmt)
+
+    jobs = list(missing.values())
+    if jobs:
+        batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+        # a renderer that cannot start raises in the initializer of its worker, which breaks the pool
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_start_renderer) as executor:
+                for written in executor.map(_render_batch, batches):
+                    print(f"Rendered {len(written)} frames")
+        except BrokenProcessPool as err:
+            raise BrokenProcessPool("A frame renderer could not start or died, see the worker error above") from err
+    return [f"{basenames[frame.content_hash]}.{fmt}" for frame in frames]
+
+
+def _merge_repeats(paths: list, frame_seconds: float):
+    # consecutive identical frames become one longer frame
+    merged, durations = [], []
+    for path in paths:
+        if merged and merged[-1] == path:
+            durations[-1] += frame_seconds
+        else:
+            merged.append(path)
+            durations.append(frame_seconds)
+    return merged, durations
+
+
+def write_gif(paths: list, output: str, frame_seconds: float = 0.5, hold_last: float = 3.0):
+    """Animated GIF of the frame images, the last frame being held for hold_last seconds"""
+    from PIL import Image
+
+    merged, durations = _merge_repeats(paths, frame_seconds)
+    durations[-1] += hold_last
+    images = [Image.open(path).convert("RGB").quantize(colors=256) for path in merged]
+    images[0].save(output, save_all=True, append_images=images[1:], loop=0, optimize=True,
+                   duration=[int(1000 * duration) for duration in durations])
+
+
+def write_mp4(paths: list, output: str, frame_seconds: float = 0.5, hold_last: float = 3.0):
+    """MP4 video of the frame images, with imageio and its ffmpeg plugin"""
+    try:
+        import imageio.v2 as imageio
+    except ImportError:
+        raise RuntimeError("The MP4 export needs imageio and imageio-ffmpeg, or use a .gif or .html output")
+
+    fps = 1 / frame_seconds
+    with imageio.get_writer(output, fps=fps, macro_block_size=1) as writer:
+        for path in paths + [paths[-1]] * round(hold_last * fps):
+            writer.append_data(imageio.imread(path))
+
+
+def _animation_frame(figure: go.Figure, max_countries: int) -> tuple:
+    # bars get numeric positions and the country as id, so that plotly slides them between frames
+    yaxis = figure.layout.yaxis
+    nb_countries = len(yaxis.categoryarray)
+    position = {country: i for i, country in enumerate(yaxis.categoryarray)}
+    data = []
+    for trace in figure.data:
+        countries = list(trace.y)
+        data.append(go.Bar(
+            x=trace.x,
+            y=[position[country] for country in countries],
+            ids=countries,
+            name=trace.name,
+            marker_color=trace.marker.color,
+            orientation="h",
+            width=0.5,
+            text=trace.x,
+            textangle=0,
+            textposition="auto",
+            cliponaxis=False,
+            hovertemplate="%{id}: %{x}<extra>" + trace.name + "</extra>",
+        ))
+    layout = {
+        "title": figure.layout.title,
+        "yaxis": {"tickvals": list(range(nb_countries)), "ticktext": yaxis.ticktext,
+                  "range": [-0.5, max_countries - 0.5]},
+        "shapes": figure.layout.shapes,
+    }
+    return data, layout
+
+
+def animated_figure(frames: list, transition_ms: int = 600, frame_ms: int = 900) -> go.Figure:
+    """
+    Interactive Plotly animation of the merit profiles, with a slider and a play button
+
+    Parameters
+    ----------
+    frames : list
+       TimelineFrame of every snapshot, see build_frames; consecutive identical frames are dropped
+    transition_ms : int
+       Duration of the transition of the bars between two frames
+    frame_ms : int
+       Duration of a frame, transition included
+    """
+    distinct = [frame for i, frame in enumerate(frames) if i == 0 or frame.content_hash != frames[i - 1].content_hash]
+    max_countries = max(len(frame.figure.layout.yaxis.categoryarray) for frame in distinct)
+    max_votes = max(sum(trace.x for trace in frame.figure.data).max() for frame in distinct)
+
+    plotly_frames = []
+    for frame in distinct:
+        data, frame_layout = _animation_frame(frame.figure, max_countries)
+        plotly_frames.append(go.Frame(data=data, layout=frame_layout, name=frame.timestamp.strftime(TIME_FORMAT)))
+
+    first = distinct[0].figure.layout
+    fig = go.Figure(data=plotly_frames[0].data, frames=plotly_frames)
+    fig.update_layout(
+        plotly_frames[0].layout,
+        barmode="stack",
+        width=first.width,
+        height=max(first.height, 120 + 28 * max_countries),
+        font_family="arial",
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        title_x=0.5,
+        legend=dict(orientation="h", xanchor="center", x=0.5, y=-0.05),
+        xaxis=dict(range=[0, max_votes * 1.02], title=""),
+        yaxis=dict(automargin=True, ticksuffix="   ", tickmode="array"),
+        updatemenus=[dict(
+            type="buttons",
+            direction="left",
+            x=0.0, y=1.12, xanchor="left",
+            buttons=[
+                dict(label="Play", method="animate", args=[None, {
+                    "frame": {"duration": frame_ms, "redraw": True},
+                    "transition": {"duration": transition_ms, "easing": "cubic-in-out"},
+                    "fromcurrent": True,
+                }]),
+                dict(label="Pause", method="animate", args=[[None], {
+                    "frame": {"duration": 0, "redraw": False}, "mode": "immediate",
+                }]),
+            ],
+        )],
+        sliders=[dict(
+            active=0,
+            x=0.1, len=0.9, y=-0.12,
+            currentvalue={"prefix": "Snapshot: "},
+            steps=[dict(label=frame.name, method="animate", args=[[frame.name], {
+                "frame": {"duration": transition_ms, "redraw": True},
+                "transition": {"duration": transition_ms, "easing": "cubic-in-out"},
+                "mode": "immediate",
+            }]) for frame in plotly_frames],
+        )],
+    )
+    return fig
+
+
+def render_timeline(output: str, snapshots: list = None, min_medals: int = MIN_MEDALS, workers: int = None,
+                    frames_dir: str = FRAMES_PATH, frame_seconds: float = 0.5) -> str:
+    """
+    Render the timeline of the snapshots to an .html, .gif or .mp4 file
+
+    Parameters
+    ----------
+    output : str
+       Output file, its extension chooses the format
+    snapshots : list
+       (timestamp, medal table) of every snapshot, those of the data folder by default
+    min_medals : int
+       Minimum number of medals for a country to be ranked
+    workers : int
+       Number of rendering processes of the .gif and .mp4 outputs
+    frames_dir : str
+       Directory where the frame images are cached
+    frame_seconds : float
+       Duration of a snapshot in the .gif and .mp4 outputs
+    """
+    snapshots = load_snapshots() if snapshots is None else snapshots
+    frames = build_frames(snapshots, min_medals)
+    if not frames:
+        raise ValueError(f"No snapshot has a country with at least {min_medals} medals")
+    print(f"{len(frames)} snapshots, {len({frame.content_hash for frame in frames})} distinct medal tables")
+
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".html":
+        animated_figure(frames, frame_ms=int(1000 * frame_seconds) + 600).write_html(output, auto_play=False)
+    elif extension in (".gif", ".mp4"):
+        paths = render_frames(frames, frames_dir, "png", workers)
+        (write_gif if extension == ".gif" else write_mp4)(paths, output, frame_seconds)
+    else:
+        raise ValueError(f"Unknown timeline format {extension}, use .html, .gif or .mp4")
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the MJ merit profiles of every snapshot as an animation")
+    parser.add_argument("--data-dir", default=PATH)
+    parser.add_argument("--output", default=f"{OUTPATH}/mj_timeline.html", help=".html, .gif or .mp4")
+    parser.add_argument("--min-medals", type=int, default=MIN_MEDALS)
+    parser.add_argument("--workers", type=int, default=None, help="rendering processes, all cores by default")
+    parser.add_argument("--frames-dir", default=FRAMES_PATH)
+    parser.add_argument("--frame-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"Timeline written to {render_timeline(args.output, load_snapshots(args.data_dir), args.min_medals, args.workers, args.frames_dir, args.frame_seconds)}")
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# tracing is off unless MJ_TRACE is set or enable() is called
+_enabled = os.environ.get("MJ_TRACE", "") not in ("", "0")
+# the last spans, for the run report, and the totals of every stage since the start, for the metrics
+_spans = deque(maxlen=10000)
+_stages = {}
+_lock = threading.Lock()
+_local = threading.local()
+_started_at = datetime.now()
+
+
+class Span:
+    """Duration and attributes (rows, bytes, ...) of one stage, nested in the stage that runs it"""
+
+    __slots__ = ("name", "parent", "start", "duration", "attributes", "thread")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.start = None
+        self.duration = None
+        self.thread = None
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self) -> "Span":
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        self.thread = threading.current_thread().name
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self.start
+        _local.stack.pop()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        with _lock:
+            _spans.append(self)
+            stage = _stages.get(self.name)
+            if stage is None:
+                stage = _stages[self.name] = {
+                    "count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "rows": 0, "bytes": 0, "errors": 0
+                }
+            stage["count"] += 1
+            stage["total_seconds"] += self.duration
+            stage["max_seconds"] = max(stage["max_seconds"], self.duration)
+            stage["rows"] += int(self.attributes.get("rows", 0))
+            stage["bytes"] += int(self.attributes.get("bytes", 0))
+            stage["errors"] += exc_type is not None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "thread": self.thread,
+            "start": self.start,
+            "duration_seconds": self.duration,
+            **self.attributes,
+        }
+
+
+class _NoopSpan:
+    """What span() returns when tracing is off: entering, leaving and setting attributes do nothing"""
+
+    __slots__ = ()
+
+    def set(self, **attributes) -> "_NoopSpan":
+        return self
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attributes):
+    """
+    Time a stage of the pipeline
+
+    Parameters
+    ----------
+    name : str
+       Name of the stage, dotted by module, e.g. "scrape.fetch"
+    attributes :
+       Attributes of the span, rows and bytes are summed up in the reports
+    Returns
+    -------
+       A context manager, whose set(rows=..., bytes=...) adds attributes once they are known
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Forget every recorded span, e.g. between two polls of the daemon"""
+    global _started_at
+    with _lock:
+        _spans.clear()
+        _stages.clear()
+        _started_at = datetime.now()
+
+
+def recorded_spans() -> list:
+    """The last recorded spans, oldest first"""
+    with _lock:
+        return list(_spans)
+
+
+def stage_summary() -> dict:
+    """Number of runs, total and max duration, rows, bytes and errors of every stage"""
+    with _lock:
+        return {name: dict(stage) for name, stage in _stages.items()}
+
+
+def run_report() -> dict:
+    """JSON-serializable report of the run: the last spans, then the summary of every stage"""
+    return {
+        "started_at": _started_at.isoformat(),
+        "spans": [recorded.to_dict() for recorded in recorded_spans()],
+        "stages": stage_summary(),
+    }
+
+
+def write_report(path: str):
+    with open(path, "w") as f:
+        json.dump(run_report(), f, indent=2, default=str)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(prefix: str = "mj") -> str:
+    """The stage summary in the Prometheus text exposition format"""
+    stages = sorted(stage_summary().items())
+    # the durations are one summary family, with its _sum and _count samples
+    lines = [
+        f"# HELP {prefix}_stage_duration_seconds Time spent in the stage",
+        f"# TYPE {prefix}_stage_duration_seconds summary",
+    ]
+    for name, stage in stages:
+        lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{_label(name)}"}} {stage["total_seconds"]}')
+        lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{_label(name)}"}} {stage["count"]}')
+
+    metrics = [
+        ("stage_max_duration_seconds", "gauge", "Longest run of the stage", "max_seconds"),
+        ("stage_rows_total", "counter", "Rows handled by the stage", "rows"),
+        ("stage_bytes_total", "counter", "Bytes read or written by the stage", "bytes"),
+        ("stage_errors_total", "counter", "Runs of the stage that raised", "errors"),
+    ]
+    for metric, metric_type, description, field in metrics:
+        lines.append(f"# HELP {prefix}_{metric} {description}")
+        lines.append(f"# TYPE {prefix}_{metric} {metric_type}")
+        for name, stage in stages:
+            lines.append(f'{prefix}_{metric}{{stage="{_label(name)}"}} {stage[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, prefix: str = "mj"):
+    # written then renamed, so that a textfile collector never reads half a file
+    with open(path + ".tmp", "w") as f:
+        f.write(prometheus_text(prefix))
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+import pytest
+
+# the modules of src/ import each other without a package prefix
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+# (gold, silver, bronze) of every NOC of the recorded competitions
+MEDALS = {
+    "OG2024": {"USA": (40, 44, 42), "CHN": (40, 27, 24), "JPN": (20, 12, 13), "FRA": (16, 26, 22), "NZL": (10, 7, 3)},
+    "PG2024": {"CHN": (94, 76, 50), "GBR": (49, 44, 31), "USA": (36, 42, 27), "FRA": (19, 28, 28)},
+}
+
+
+def cis_payload(medals: dict) -> dict:
+    """CIS_MedalNOCs document of a medal table: the overall row and one sport row of every NOC"""
+    rows = []
+    for sort_rank, (org, (gold, silver, bronze)) in enumerate(medals.items(), start=1):
+        organisation = {"code": org, "description": org, "longDescription": org}
+        rows.append({
+            "gender": "TOT", "sport": "GLO", "org": org, "organisation": organisation, "gold": gold,
+            "silver": silver, "bronze": bronze, "total": gold + silver + bronze, "sortRankTotal": sort_rank,
+        })
+        rows.append({
+            "gender": "W", "sport": "ATH", "org": org, "organisation": organisation, "gold": 1, "silver": 0,
+            "bronze": 0, "total": 1, "sortRankTotal": sort_rank,
+        })
+    return {"medalStandings": {"competitionCode": "test"}, "medalNOC": rows}
+
+
+@pytest.fixture
+def payload_dir(tmp_path):
+    """Directory of the <code>.json payloads of fixture_server.py, one per competition of MEDALS"""
+    directory = tmp_path / "fixtures"
+    directory.mkdir()
+    for code, medals in MEDALS.items():
+        (directory / f"{code}.json").write_text(json.dumps(cis_payload(medals)))
+    return directory
+
+
+@pytest.fixture
+def traced():
+    """Record the spans of the test, then turn tracing off again"""
+    import tracing
+
+    tracing.enable()
+    tracing.reset()
+    yield tracing
+    tracing.disable()
+    tracing.reset()
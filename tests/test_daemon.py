@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from conftest import MEDALS
+from daemon import MedalDaemon
+from fixture_server import serve_fixtures
+
+
+@pytest.fixture
+def failing_server(payload_dir):
+    # every payload is answered by two 503 before being served
+    server = serve_fixtures(str(payload_dir), fail_first=2)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def cis_url(base_url: str, code: str) -> str:
+    return f"{base_url}/{code}/data/CIS_MedalNOCs~lang=ENG~comp={code}.json"
+
+
+def test_ranking_is_kept_through_failures(failing_server, tmp_path):
+    changes = []
+    daemon = MedalDaemon(
+        interval=1.0, jitter=0.0, max_backoff=30.0, min_medals=1, url=cis_url(failing_server, "OG2024"),
+        cache_dir=str(tmp_path / "cache"), data_dir=None, on_change=changes.append,
+    )
+
+    assert not asyncio.run(daemon.poll_once())
+    assert not asyncio.run(daemon.poll_once())
+    assert daemon.failures == 2 and daemon.state is None
+    assert daemon.next_delay() == 4.0
+
+    assert asyncio.run(daemon.poll_once())
+    assert daemon.failures == 0 and daemon.last_error is None
+    assert changes == [daemon.state]
+    assert set(daemon.state.snapshot.df["org"]) == set(MEDALS["OG2024"])
+    assert len(daemon.state.rank_comparison) == len(MEDALS["OG2024"])
+    ranked = daemon.state
+
+    # the same table is not ranked again
+    assert not asyncio.run(daemon.poll_once())
+    assert daemon.state is ranked and len(changes) == 1
+
+    # the source goes away: the failures pile up, the last ranking stays
+    daemon.url = cis_url(failing_server, "XX2024")
+    for failures in range(1, 4):
+        assert not asyncio.run(daemon.poll_once())
+        assert daemon.failures == failures
+    assert daemon.last_error is not None
+    assert daemon.state is ranked and len(changes) == 1
+
+
+def test_backoff_is_clamped():
+    daemon = MedalDaemon(interval=300.0, jitter=0.0, max_backoff=3600.0, data_dir=None, on_change=print)
+    delays = []
+    for failures in (0, 1, 3, 4, 100, 5000):
+        daemon.failures = failures
+        delays.append(daemon.next_delay())
+    assert delays == [300.0, 600.0, 2400.0, 3600.0, 3600.0, 3600.0]
+
+    daemon.jitter = 0.1
+    daemon.failures = 10 ** 6
+    assert all(3240.0 <= daemon.next_delay() <= 3960.0 for _ in range(100))
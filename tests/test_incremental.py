@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental import IncrementalRanker
+from ranking_functions import lexicographic_ranks, majority_judgment_ranks, total_medal_ranks
+
+
+def medal_table(rng, nb_countries: int) -> pd.DataFrame:
+    medals = rng.integers(0, 4, size=(nb_countries, 3))
+    df = pd.DataFrame(medals, columns=["Gold", "Silver", "Bronze"])
+    df.insert(0, "org", [f"C{i:02d}" for i in range(nb_countries)])
+    df["Country"] = df["org"]
+    df["Total"] = medals.sum(axis=1)
+    return df
+
+
+def full_ranks(ranker: IncrementalRanker) -> dict:
+    """Ranks of every method recomputed from scratch, by index of the ranker"""
+    total = ranker.medals.sum(axis=1)
+    ranked = np.flatnonzero(total >= ranker.min_medals)
+    if not len(ranked):
+        return {"mj": {}, "lexico": {}, "total": {}}
+    medals = ranker.medals[ranked]
+    counts = np.column_stack([medals, total[ranked].max() - total[ranked]])
+    _, mj, _ = majority_judgment_ranks(counts)
+    return {
+        "mj": {i: int(rank) + 1 for i, rank in zip(ranked, mj)},
+        "lexico": {i: int(rank) for i, rank in zip(ranked, lexicographic_ranks(medals))},
+        "total": {i: int(rank) for i, rank in zip(ranked, total_medal_ranks(medals))},
+    }
+
+
+@pytest.mark.parametrize("min_medals", [0, 1, 4])
+def test_apply_matches_full_recompute(min_medals):
+    rng = np.random.default_rng(min_medals)
+    ranker = IncrementalRanker(medal_table(rng, 12), min_medals)
+    before = full_ranks(ranker)
+    assert {method: ranker._ranks[method] for method in before} == before
+
+    orgs = list(ranker.orgs) + ["NEW", "OLD"]
+    for _ in range(150):
+        deltas = {}
+        for org in rng.choice(orgs, size=rng.integers(1, 4)):
+            current = ranker.medals[ranker.index[org]] if org in ranker.index else np.zeros(3, dtype=int)
+            deltas[org] = np.maximum(rng.integers(-1, 2, size=3), -current)
+        changes = ranker.apply(deltas)
+
+        after = full_ranks(ranker)
+        assert {method: ranker._ranks[method] for method in after} == after
+        expected = {
+            (ranker.orgs[i], method, before[method].get(i), after[method].get(i))
+            for method in after
+            for i in set(before[method]) | set(after[method])
+            if before[method].get(i) != after[method].get(i)
+        }
+        assert {(c.org, c.method, c.old_rank, c.new_rank) for c in changes} == expected
+        before = after
+
+
+def test_unseen_country_without_threshold():
+    ranker = IncrementalRanker(medal_table(np.random.default_rng(0), 3), min_medals=0)
+    changes = ranker.apply({"XYZ": (0, 0, 1)})
+    assert ("XYZ", "total") in {(change.org, change.method) for change in changes}
+    assert "XYZ" in set(ranker.ranking()["org"])
@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+import pytest
+import requests
+
+from conftest import MEDALS, cis_payload
+from fixture_server import serve_fixtures
+from medal_stream import iter_array_items, iter_medal_rows
+
+
+@pytest.fixture
+def body() -> bytes:
+    payload = cis_payload(MEDALS["OG2024"])
+    # text to decode across the chunks: escapes, multi-byte characters and numbers split in two
+    payload["medalNOC"][0]["organisation"]["longDescription"] = 'Équipe "olympique" \\ 日本 🥇'
+    payload["medalNOC"].append({"sport": "GLO", "gender": "TOT", "org": "ROC", "gold": 123456789, "silver": 1.5e3,
+                                "bronze": -0, "sortRankTotal": None, "organisation": {"code": "ROC"}})
+    payload["after"] = {"medalNOC": []}
+    return json.dumps(payload, ensure_ascii=False, indent=1).encode()
+
+
+def chunked(data: bytes, sizes) -> list:
+    chunks, start = [], 0
+    for size in sizes:
+        if start >= len(data):
+            break
+        chunks.append(data[start:start + size])
+        start += size
+    return chunks + ([data[start:]] if start < len(data) else [])
+
+
+def test_one_byte_chunks(body):
+    expected = json.loads(body)["medalNOC"]
+    assert list(iter_array_items(chunked(body, [1] * len(body)))) == expected
+    assert list(iter_medal_rows(chunked(body, [1] * len(body)), None, None)) == expected
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_chunks(body, seed):
+    rng = np.random.default_rng(seed)
+    expected = [row for row in json.loads(body)["medalNOC"] if row["sport"] == "GLO" and row["gender"] == "TOT"]
+    chunks = chunked(body, rng.integers(1, 64, size=len(body)))
+    assert list(iter_medal_rows(chunks)) == expected
+
+
+def test_gzip_body(payload_dir, body):
+    (payload_dir / "OG2024.json").write_bytes(body)
+    server = serve_fixtures(str(payload_dir))
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/OG2024/data/CIS_MedalNOCs~lang=ENG~comp=OG2024.json"
+        with requests.get(url, headers={"Accept-Encoding": "gzip"}, stream=True) as response:
+            assert response.headers["Content-Encoding"] == "gzip"
+            rows = list(iter_medal_rows(response.iter_content(7), None, None))
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert rows == json.loads(body)["medalNOC"]
+
+
+# cut in the key, in a row, in a number and right after the last row
+@pytest.mark.parametrize("marker, offset", [('"medalNOC"', 4), ('"silver": 44', 4), ("123456", 4), ("\n ],", 0)])
+def test_truncated_body(body, marker, offset):
+    truncated = body[:body.index(marker.encode()) + offset]
+    with pytest.raises(ValueError):
+        list(iter_array_items(chunked(truncated, [5] * len(truncated))))
+
+
+def test_missing_array():
+    with pytest.raises(ValueError, match="medalNOC"):
+        list(iter_array_items([b'{"medals": []}']))
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+DATA = os.path.join(SRC, "..", "data")
+
+
+def run_in_src(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], cwd=SRC, capture_output=True, text=True)
+
+
+def test_rank_modules_do_not_import_plotly():
+    result = run_in_src(
+        "import sys\n"
+        "import rank, ranking_functions, pipeline\n"
+        "assert 'plotly' not in sys.modules, 'plotly imported on the rank path'\n"
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_rank_command_does_not_import_plotly():
+    snapshot = os.path.join(DATA, "Cleaned_Manual_Olympic_Medal_Count20240801_12h.csv")
+    result = run_in_src(
+        "import sys\n"
+        "import rank\n"
+        f"assert rank.main(['--source', 'csv', '--csv', {snapshot!r}]) == 0\n"
+        "heavy = [name for name in ('plotly', 'pandas', 'requests') if name in sys.modules]\n"
+        "assert not heavy, f'imported on the rank path: {heavy}'\n"
+    )
+    assert result.returncode == 0, result.stderr
+    assert '"ranking"' in result.stdout
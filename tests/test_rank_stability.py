@@ -0,0 +1,34 @@
+import pandas as pd
+
+from rank_stability import STABILITY_COLUMNS, rank_stability
+
+
+def medal_table(medals: dict) -> pd.DataFrame:
+    df = pd.DataFrame([(org, *counts) for org, counts in medals.items()], columns=["Country", "Gold", "Silver", "Bronze"])
+    df["Total"] = df["Gold"] + df["Silver"] + df["Bronze"]
+    return df
+
+
+def test_no_country_ranked():
+    df = medal_table({"FRA": (1, 0, 0), "NZL": (0, 1, 0)})
+    for perturbation in ("bootstrap", "leave-one-out"):
+        stability = rank_stability(df, perturbation, nb_replicates=10, min_medals=2, max_workers=1)
+        assert stability.empty
+        assert list(stability.columns) == STABILITY_COLUMNS
+
+
+def test_no_medal_to_leave_out():
+    stability = rank_stability(medal_table({"FRA": (0, 0, 0), "NZL": (0, 0, 0)}), "leave-one-out", min_medals=0,
+                               max_workers=1)
+    assert list(stability["Rank_MJ"]) == [1, 1]
+    assert list(stability["rank_low"]) == list(stability["rank_high"]) == [1, 1]
+    assert list(stability["p_hold"]) == [1.0, 1.0]
+
+
+def test_leave_one_out_probabilities():
+    df = medal_table({"USA": (3, 0, 0), "FRA": (1, 1, 0), "NZL": (0, 0, 1)})
+    stability = rank_stability(df, "leave-one-out", min_medals=1, max_workers=1)
+    assert list(stability["Country"]) == ["USA", "FRA", "NZL"]
+    assert list(stability["Rank_MJ"]) == [1, 2, 3]
+    total = stability[["p_hold", "p_better", "p_worse"]].sum(axis=1)
+    assert ((total - 1).abs() < 1e-9).all()
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from ranking_functions import majority_judgment_keys, majority_judgment_ranks
+
+
+def majority_values(profile) -> list:
+    """Majority grades of a merit profile, removing the median ballot one at a time, 0 being the best grade"""
+    # ballots sorted from the worst grade, the lower median is the worse one of an even count
+    ballots = sorted(np.repeat(np.arange(len(profile)), profile), reverse=True)
+    values = []
+    while ballots:
+        values.append(ballots.pop((len(ballots) - 1) // 2))
+    return values
+
+
+def compare(profile_a, profile_b) -> int:
+    """1 when a beats b with Majority Judgment, -1 when b beats a, 0 for a tie"""
+    for value_a, value_b in zip(majority_values(profile_a), majority_values(profile_b)):
+        if value_a != value_b:
+            return 1 if value_a < value_b else -1
+    return 0
+
+
+def medal_profiles(rng, nb_countries: int, max_medals: int) -> np.ndarray:
+    # few distinct counts so that ties are frequent, some countries without any medal
+    medals = rng.integers(0, max_medals + 1, size=(nb_countries, 3))
+    medals[rng.random(nb_countries) < 0.2] = 0
+    medals[rng.random(nb_countries) < 0.2] = medals[0]
+    total = medals.sum(axis=1)
+    return np.column_stack([medals, total.max() - total])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_ranks_match_pairwise_comparisons(seed):
+    rng = np.random.default_rng(seed)
+    counts = medal_profiles(rng, int(rng.integers(1, 25)), int(rng.integers(1, 6)))
+    majority_grade, rank, order = majority_judgment_ranks(counts)
+
+    wins = np.array([[compare(a, b) for b in counts] for a in counts])
+    assert list(majority_grade) == [majority_values(profile)[0] if profile.sum() else 0 for profile in counts]
+    # the rank is the number of candidates beating it, tied candidates share it
+    assert list(rank) == list((wins == -1).sum(axis=1))
+    assert all(compare(counts[a], counts[b]) >= 0 for a, b in zip(order, order[1:]))
+
+    keys = [tuple(key.tolist()) for key in majority_judgment_keys(counts)]
+    for a in range(len(counts)):
+        for b in range(len(counts)):
+            assert (keys[a] > keys[b]) - (keys[a] < keys[b]) == wins[a, b]
+
+
+def test_batched_tables_match_single_tables():
+    rng = np.random.default_rng(0)
+    tables = np.stack([medal_profiles(rng, 12, 3) for _ in range(30)])
+    # the tables do not all have the same number of ballots
+    tables[:, :, 3] += rng.integers(0, 3, size=(30, 1))
+    majority_grade, rank, _ = majority_judgment_ranks(tables)
+    for t, counts in enumerate(tables):
+        expected_grade, expected_rank, _ = majority_judgment_ranks(counts)
+        assert list(majority_grade[t]) == list(expected_grade)
+        assert list(rank[t]) == list(expected_rank)
+
+
+def test_all_zero_table():
+    majority_grade, rank, order = majority_judgment_ranks(np.zeros((4, 4), dtype=int))
+    assert list(rank) == [0, 0, 0, 0]
+    assert sorted(order) == [0, 1, 2, 3]
+    assert majority_grade.shape == (4,)
+
+
+def test_int32_counts_are_not_copied(monkeypatch):
+    import ranking_functions
+
+    counts = medal_profiles(np.random.default_rng(0), 10, 4).astype(np.int32)
+    seen = []
+
+    def keys(table):
+        seen.append(table)
+        return majority_judgment_keys(table)
+
+    monkeypatch.setattr(ranking_functions, "majority_judgment_keys", keys)
+    _, rank, _ = majority_judgment_ranks(counts)
+    assert np.shares_memory(seen[0], counts)
+    assert list(rank) == list(majority_judgment_ranks(counts.astype(np.int64))[1])
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import scraper
+from conftest import MEDALS
+from fixture_server import serve_fixtures
+from scraper import read_cached_medal_table, save_medal_data, scrap_olympic_data
+from snapshot_store import STORE_NAME, SnapshotStore
+
+
+@pytest.fixture
+def og2024_url(payload_dir):
+    server = serve_fixtures(str(payload_dir))
+    yield f"http://127.0.0.1:{server.server_port}/OG2024/data/CIS_MedalNOCs~lang=ENG~comp=OG2024.json"
+    server.shutdown()
+    server.server_close()
+
+
+def request_statuses(tracing) -> list:
+    return [span.attributes["status"] for span in tracing.recorded_spans() if span.name == "scrape.request"]
+
+
+def medal_counts(df) -> dict:
+    return {row.org: (row.Gold, row.Silver, row.Bronze) for row in df.itertuples()}
+
+
+def test_etag_revalidation_and_unchanged_table(og2024_url, tmp_path, traced):
+    cache_dir, data_dir = str(tmp_path / "cache"), tmp_path / "data"
+    data_dir.mkdir()
+
+    df, _ = scrap_olympic_data(og2024_url, cache_dir, str(data_dir), only_if_changed=True)
+    assert medal_counts(df) == MEDALS["OG2024"]
+    assert list(df["Total"]) == sorted(df["Total"], reverse=True)
+    assert len(list(data_dir.glob("medal_data_*.csv"))) == 1
+
+    # the ETag is sent back: 304, the table is read again from the cache and nothing new is written
+    df, _ = scrap_olympic_data(og2024_url, cache_dir, str(data_dir), only_if_changed=True)
+    assert df is None
+    assert request_statuses(traced) == [200, 304]
+    assert "scrape.read_cache" in {span.name for span in traced.recorded_spans()}
+    assert len(list(data_dir.glob("medal_data_*.csv"))) == 1
+
+    cached = read_cached_medal_table(cache_dir, og2024_url)
+    assert medal_counts(cached) == MEDALS["OG2024"]
+
+
+def test_changed_payload_is_fetched_again(og2024_url, payload_dir, tmp_path, traced):
+    cache_dir, data_dir = str(tmp_path / "cache"), tmp_path / "data"
+    data_dir.mkdir()
+    scrap_olympic_data(og2024_url, cache_dir, str(data_dir), only_if_changed=True)
+
+    medals = dict(MEDALS["OG2024"], FRA=(17, 26, 22))
+    payload = json.loads((payload_dir / "OG2024.json").read_text())
+    for row in payload["medalNOC"]:
+        if row["org"] == "FRA" and row["sport"] == "GLO":
+            row["gold"] = 17
+    (payload_dir / "OG2024.json").write_text(json.dumps(payload))
+
+    df, _ = scrap_olympic_data(og2024_url, cache_dir, str(data_dir), only_if_changed=True)
+    assert request_statuses(traced) == [200, 200]
+    assert medal_counts(df) == medals
+    assert medal_counts(read_cached_medal_table(cache_dir, og2024_url)) == medals
+
+
+def test_clock_going_back_does_not_stop_the_csv(tmp_path, monkeypatch):
+    df = pd.DataFrame([(org, *medals) for org, medals in MEDALS["OG2024"].items()],
+                      columns=["org", "Gold", "Silver", "Bronze"])
+    with SnapshotStore(str(tmp_path / STORE_NAME)) as store:
+        store.append(df.assign(Gold=0), datetime(2024, 10, 27, 2, 30))
+
+    # end of summer time in Paris: 02:30 comes again
+    monkeypatch.setattr(scraper, "get_french_time", lambda: datetime(2024, 10, 27, 2, 10))
+    save_medal_data(df, "20241027_02h", str(tmp_path))
+
+    assert (tmp_path / "medal_data_20241027_02h.csv").exists()
+    with SnapshotStore(str(tmp_path / STORE_NAME)) as store:
+        assert store.timestamps() == [datetime(2024, 10, 27, 2, 30)]
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from conftest import MEDALS
+from fixture_server import serve_fixtures
+from sources import (
+    MEDAL_TABLE_COLUMNS, CISSource, CSVSource, PooledClient, comparison_summary, fetch_competitions,
+    rank_competitions,
+)
+
+
+@pytest.fixture
+def base_url(payload_dir):
+    # every payload is answered by two 503 before being served, the client retries them
+    server = serve_fixtures(str(payload_dir), fail_first=2)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manual_csv(tmp_path):
+    # layout of the manual snapshots, the NOC code in Country and no Total
+    path = tmp_path / "manual.csv"
+    pd.DataFrame(
+        [(org, *medals) for org, medals in MEDALS["OG2024"].items()], columns=["Country", "Gold", "Silver", "Bronze"],
+    ).sample(frac=1, random_state=0).to_csv(path, index=False)
+    return str(path)
+
+
+def test_fetch_competitions(base_url, manual_csv, tmp_path):
+    sources = [
+        CISSource("OG2024", "Paris 2024 Olympic Games", base_url),
+        CISSource("PG2024", "Paris 2024 Paralympic Games", base_url),
+        CISSource("XX2024", "Missing competition", base_url),
+        CSVSource("CSV2024", "Recorded", manual_csv),
+    ]
+    with PooledClient(pool_size=4, retries=3, backoff=0.0, rate=None) as client:
+        tables, errors = fetch_competitions(sources, client, str(tmp_path / "cache"), max_workers=4)
+
+    # the 503 answers were retried, the missing competition failed alone
+    assert set(tables) == {"OG2024", "PG2024", "CSV2024"}
+    assert set(errors) == {"XX2024"}
+    assert isinstance(errors["XX2024"], RuntimeError)
+
+    for code, df in tables.items():
+        assert list(df.columns) == MEDAL_TABLE_COLUMNS
+        assert (df["competition"] == code).all()
+        assert list(df["Total"]) == sorted(df["Total"], reverse=True)
+        assert all(df[column].dtype == "int64" for column in ["Gold", "Silver", "Bronze", "Total"])
+        medals = MEDALS["OG2024" if code == "CSV2024" else code]
+        assert {row.org: (row.Gold, row.Silver, row.Bronze) for row in df.itertuples()} == medals
+
+    # the CSV and the CIS payload of the same table give the same rows
+    columns = [column for column in MEDAL_TABLE_COLUMNS if column != "competition"]
+    pd.testing.assert_frame_equal(
+        tables["CSV2024"][columns].sort_values("org", ignore_index=True),
+        tables["OG2024"][columns].sort_values("org", ignore_index=True),
+    )
+
+    summary = comparison_summary(rank_competitions(tables, min_medals=1)).set_index("competition")
+    assert summary.loc["OG2024"].equals(summary.loc["CSV2024"])
+    assert summary.loc["PG2024", "first_lexico"] == "CHN"
@@ -0,0 +1,65 @@
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from timeline_render import _merge_repeats, build_frames, render_frames
+
+
+def medal_table(gold_fra: int) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "org": ["USA", "CHN", "FRA", "NZL"],
+        "Gold": [10, 9, gold_fra, 0],
+        "Silver": [8, 7, 5, 1],
+        "Bronze": [6, 5, 4, 0],
+    })
+    df["Country"] = df["org"]
+    df["Total"] = df["Gold"] + df["Silver"] + df["Bronze"]
+    return df
+
+
+def test_build_frames_reuses_unchanged_tables():
+    times = [datetime(2024, 8, day, 12) for day in (1, 2, 3, 4)]
+    snapshots = [
+        (times[0], medal_table(3)),
+        (times[1], medal_table(3).sample(frac=1, random_state=0)),  # same counts, other row order
+        (times[2], medal_table(4)),
+        (times[3], medal_table(3)),
+    ]
+    frames = build_frames(snapshots, min_medals=5)
+
+    assert [frame.timestamp for frame in frames] == times
+    assert frames[0].content_hash == frames[1].content_hash == frames[3].content_hash
+    assert frames[2].content_hash != frames[0].content_hash
+    # one figure per distinct table, with the date of its first snapshot
+    assert frames[1].figure is frames[0].figure
+    assert frames[3].figure is frames[0].figure
+    assert "2024-08-01" in frames[3].figure.layout.title.text
+    # NZL is below min_medals
+    assert len(frames[0].figure.layout.yaxis.categoryarray) == 3
+
+
+def test_build_frames_skips_snapshots_without_ranked_country():
+    frames = build_frames([(datetime(2024, 8, 1), medal_table(3))], min_medals=100)
+    assert frames == []
+
+
+def test_merge_repeats():
+    merged, durations = _merge_repeats(["a", "a", "b", "a", "a", "a"], 0.5)
+    assert merged == ["a", "b", "a"]
+    assert durations == [1.0, 0.5, 1.5]
+    assert _merge_repeats([], 0.5) == ([], [])
+
+
+def test_render_frames_fails_fast_without_renderer(tmp_path, monkeypatch):
+    import export_engine
+
+    def no_chrome():
+        raise RuntimeError("no Chrome")
+
+    monkeypatch.setattr(export_engine, "_check_chrome", no_chrome)
+    frames = build_frames([(datetime(2024, 8, 1), medal_table(3))], min_medals=5)
+    # the initializer of the worker raises, which must break the pool instead of hanging it
+    with pytest.raises(BrokenProcessPool):
+        render_frames(frames, str(tmp_path), workers=1)